@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, unquote
+
+from storage import DATA_DIR, DATE_DIR_RE, iter_data_files, load_records
+from topic_index import video_terms, resolve_query
+from channels import channel_key
+from summary_schema import PUBLIC_FIELDS
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+
+# Hot responses kept in memory, keyed by path + query and the corpus version.
+CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "512"))
+
+# data/ is checked for new or rewritten files at most this often.
+RELOAD_SECONDS = float(os.getenv("API_RELOAD_SECONDS", "2"))
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+_corpus = {"version": 0, "files": {}, "checked": 0.0}
+_corpus_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _score(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _file_stat(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _api_rows(file_path):
+    """Summary rows (no transcripts) for one data file, with channel and date filled in."""
+    date_key = os.path.basename(os.path.dirname(file_path))
+    default_channel = os.path.splitext(os.path.basename(file_path))[0].split("_")[0]
+    rows = []
+    for video in load_records(file_path):
+        row = {k: video[k] for k in PUBLIC_FIELDS if k in video}
+        row["channel"] = channel_key(video.get("channel_handle") or default_channel)
+        row["date"] = video.get("sort_date") or video.get("sort_data") or date_key
+        row["terms"] = sorted(video_terms(video))
+        rows.append(row)
+    return rows
+
+
+def _build_views(files):
+    """In-memory lookups over every loaded row, newest first."""
+    videos = sorted((row for entry in files.values() for row in entry["rows"]),
+                    key=lambda v: (v["date"], v.get("published_at") or ""), reverse=True)
+    views = {"videos": videos, "by_id": {}, "by_date": defaultdict(list),
+             "by_channel": defaultdict(list), "by_topic": defaultdict(list)}
+    for row in videos:
+        if row.get("video_id"):
+            views["by_id"][row["video_id"]] = row
+        views["by_date"][row["date"]].append(row)
+        views["by_channel"][row["channel"].lower()].append(row)
+        for term in row["terms"]:
+            views["by_topic"][term].append(row)
+    return views
+
+
+def refresh_corpus(data_dir=DATA_DIR, force=False):
+    """
+    Re-reads only data files whose mtime or size changed. Bumps the corpus
+    version (which invalidates cached responses) when anything changed.
+    Called on requests, rate-limited to once per RELOAD_SECONDS.
+    """
+    now = time.monotonic()
+    if not force and now - _corpus["checked"] < RELOAD_SECONDS:
+        return _corpus
+    with _corpus_lock:
+        if not force and now - _corpus["checked"] < RELOAD_SECONDS:
+            return _corpus
+        files = dict(_corpus["files"])
+        current = {path: _file_stat(path) for path in iter_data_files(data_dir)}
+        changed = [path for path, stat in current.items() if path not in files or files[path]["stat"] != stat]
+        removed = [path for path in files if path not in current]
+        for path in removed:
+            del files[path]
+        for path in changed:
+            try:
+                files[path] = {"stat": current[path], "rows": _api_rows(path)}
+            except Exception as e:
+                print(f"  Error reading {path}: {e}")
+                files.pop(path, None)
+
+        if changed or removed or "views" not in _corpus:
+            _corpus.update(files=files, views=_build_views(files), version=_corpus["version"] + 1)
+            with _cache_lock:
+                _cache.clear()
+            print(f"Corpus v{_corpus['version']}: {len(_corpus['views']['videos'])} videos "
+                  f"({len(changed)} changed, {len(removed)} removed files).")
+        _corpus["checked"] = time.monotonic()
+    return _corpus
+
+
+def _count_param(params, name, default):
+    """A non-negative integer query parameter; ValueError (400) otherwise."""
+    value = int(params.get(name, default))
+    if value < 0:
+        raise ValueError(f"{name} must not be negative")
+    return value
+
+
+def _score_param(params, name):
+    """An optional numeric query parameter; ValueError (400) when it is not a number."""
+    if not params.get(name):
+        return None
+    value = _score(params[name])
+    if value is None:
+        raise ValueError(f"{name} must be a number")
+    return value
+
+
+def _public(row):
+    return {k: v for k, v in row.items() if k != "terms"}
+
+
+def _sentiment_filter(rows, params):
+    sentiment = params.get("sentiment")
+    min_score = _score_param(params, "min_score")
+    max_score = _score_param(params, "max_score")
+    if sentiment:
+        rows = [r for r in rows if str(r.get("crypto_sentiment", "")).lower() == sentiment.lower()]
+    if min_score is not None or max_score is not None:
+        scored = [(r, _score(r.get("sentiment_score"))) for r in rows]
+        rows = [r for r, s in scored if s is not None
+                and (min_score is None or s >= min_score) and (max_score is None or s <= max_score)]
+    return rows
+
+
+def query_videos(views, params):
+    """
+    /videos filters: date, start, end, channel, topic, sentiment, min_score,
+    max_score, limit, offset. The narrowest lookup is used first.
+    """
+    if params.get("topic"):
+        rows = views["by_topic"].get(resolve_query(params["topic"]), [])
+    elif params.get("channel"):
+        rows = views["by_channel"].get(params["channel"].lower(), [])
+    elif params.get("date"):
+        rows = views["by_date"].get(params["date"], [])
+    else:
+        rows = views["videos"]
+
+    if params.get("channel"):
+        rows = [r for r in rows if r["channel"].lower() == params["channel"].lower()]
+    if params.get("date"):
+        rows = [r for r in rows if r["date"] == params["date"]]
+    if params.get("start"):
+        rows = [r for r in rows if r["date"] >= params["start"]]
+    if params.get("end"):
+        rows = [r for r in rows if r["date"] <= params["end"]]
+    rows = _sentiment_filter(rows, params)
+
+    offset = _count_param(params, "offset", 0)
+    limit = min(_count_param(params, "limit", DEFAULT_LIMIT), MAX_LIMIT)
+    return {"total": len(rows), "offset": offset, "videos": [_public(r) for r in rows[offset:offset + limit]]}
+
+
+def daily_digest(views, date):
+    """Everything for one day: sentiment mix, top topics and the videos per channel."""
+    rows = views["by_date"].get(date, [])
+    scores = [s for s in (_score(r.get("sentiment_score")) for r in rows) if s is not None]
+    topics = Counter(term for r in rows for term in r["terms"])
+    by_channel = defaultdict(list)
+    for row in rows:
+        by_channel[row["channel"]].append(_public(row))
+    return {
+        "date": date,
+        "videos": len(rows),
+        "mean_sentiment": round(sum(scores) / len(scores), 1) if scores else None,
+        "sentiment": dict(Counter(r.get("crypto_sentiment") for r in rows if r.get("crypto_sentiment"))),
+        "top_topics": topics.most_common(10),
+        "channels": dict(sorted(by_channel.items())),
+    }
+
+
+def route(path, params, views):
+    """Returns (status, payload) for a GET request."""
+    parts = [unquote(p) for p in path.strip("/").split("/") if p]
+    if parts == ["health"]:
+        return 200, {"ok": True}
+    if parts == ["videos"]:
+        return 200, query_videos(views, params)
+    if len(parts) == 2 and parts[0] == "videos":
+        row = views["by_id"].get(parts[1])
+        return (200, _public(row)) if row else (404, {"error": "unknown video"})
+    if parts == ["dates"]:
+        return 200, {"dates": sorted(views["by_date"], reverse=True)}
+    if parts == ["channels"]:
+        return 200, {"channels": {c: len(rows) for c, rows in sorted(views["by_channel"].items())}}
+    if parts == ["topics"]:
+        top = sorted(views["by_topic"].items(), key=lambda kv: -len(kv[1]))[:min(_count_param(params, "limit", 100), MAX_LIMIT)]
+        return 200, {"topics": [[term, len(rows)] for term, rows in top]}
+    if len(parts) == 2 and parts[0] == "digest":
+        date = parts[1] if parts[1] != "latest" else max(views["by_date"], default="")
+        if parts[1] != "latest" and not DATE_DIR_RE.match(date):
+            raise ValueError("date must be YYYY-MM-DD or latest")
+        if date not in views["by_date"]:
+            return 404, {"error": "no videos on that date"}
+        return 200, daily_digest(views, date)
+    return 404, {"error": "not found"}
+
+
+def _cached_response(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _store_response(key, response):
+    with _cache_lock:
+        _cache[key] = response
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def handle_get(target, data_dir=DATA_DIR):
+    """Returns (status, body bytes, etag) for a request target like /videos?topic=eth."""
+    corpus = refresh_corpus(data_dir)
+    key = (corpus["version"], target)
+    response = _cached_response(key)
+    if response is None:
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            status, payload = route(url.path, params, corpus["views"])
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            print(f"Error handling {target}: {e!r}")
+            status, payload = 500, {"error": "internal error"}
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        response = (status, body, etag)
+        if status == 200:
+            _store_response(key, response)
+    return response
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    data_dir = DATA_DIR
+
+    def do_GET(self):
+        started = time.perf_counter()
+        status, body, etag = handle_get(self.path, self.data_dir)
+        if status == 200 and etag in self.headers.get("If-None-Match", ""):
+            status, body = 304, b""
+
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if body:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Server-Timing", f"app;dur={(time.perf_counter() - started) * 1000:.2f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_api(host=API_HOST, port=API_PORT, data_dir=DATA_DIR):
+    ApiHandler.data_dir = data_dir
+    refresh_corpus(data_dir, force=True)
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    print(f"Serving the read-only API on http://{host}:{port}/ (videos, dates, channels, topics, digest/<date>)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read-only HTTP query API over data/.")
+    parser.add_argument("--host", type=str, default=API_HOST, help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Port to listen on.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    serve_api(args.host, args.port, args.dir)
+
+
+if __name__ == "__main__":
+    main()
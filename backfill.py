@@ -0,0 +1,189 @@
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from storage import DATA_DIR, iter_data_files, load_records, save_json
+from preprocess import clean_transcript, estimate_tokens, preprocess_transcript, PROMPT_CHAR_LIMIT
+from summary_schema import repair_video
+from topic_index import update_index
+from transcript_quality import stored_check, transcript_for_prompt
+
+CHECKPOINT_DIR = "checkpoints"
+
+# Concurrent OpenAI calls shared by all work units.
+NETWORK_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+
+
+def work_units(start, end, channels=None, data_dir=DATA_DIR):
+    """
+    One unit per (date, channel) data file between start and end (inclusive,
+    YYYY-MM-DD). channels filters on the file's channel name.
+    """
+    wanted = {c.lower() for c in channels} if channels else None
+    units = []
+    for file_path in iter_data_files(data_dir):
+        date_key = os.path.basename(os.path.dirname(file_path))
+        if date_key < start or date_key > end:
+            continue
+        channel = os.path.splitext(os.path.basename(file_path))[0]
+        if wanted and channel.lower() not in wanted and channel.split("_")[0].lower() not in wanted:
+            continue
+        units.append({"id": f"{date_key}/{channel}", "date": date_key, "channel": channel, "path": file_path})
+    return units
+
+
+def job_id(start, end, channels, force):
+    key = json.dumps([start, end, sorted(c.lower() for c in channels or []), force])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                pass
+    return {"done": {}}
+
+
+def save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def cpu_stage(path, force=False):
+    """
+    Runs in a worker process: parses one data file, repairs its summaries
+    locally, finds the videos that need a (new) summary and builds their
+    preprocessed prompt text. The records and prompts are handed to
+    network_stage, so the file is parsed and cleaned only once.
+    """
+    from summarize_transcripts import needs_summary
+
+    records = load_records(path)
+    raw_tokens = clean_tokens = repairs = 0
+    needs, prompts = [], []
+    for i, video in enumerate(records):
+        if not force:
+            repairs += repair_video(video)[0]
+        transcript = video.get("transcript") or ""
+        raw_tokens += estimate_tokens(transcript[:PROMPT_CHAR_LIMIT])
+        clean_tokens += estimate_tokens(clean_transcript(transcript)[:PROMPT_CHAR_LIMIT])
+        if transcript and needs_summary(video, force):
+            needs.append(i)
+            prompts.append(preprocess_transcript(transcript_for_prompt(transcript, stored_check(video)), report=False)[0])
+    return {"videos": len(records), "needs": needs, "prompts": prompts, "records": records,
+            "repairs": repairs, "raw_tokens": raw_tokens, "clean_tokens": clean_tokens}
+
+
+def network_stage(path, records, needs, prompts, repairs):
+    """
+    Summarizes the videos that still need it from the prompts cpu_stage
+    prepared, and rewrites the file with the (locally repaired) records.
+    Runs in a thread.
+    """
+    from summarize_transcripts import summarize_transcript
+
+    updated = 0
+    for i, prompt_text in zip(needs, prompts):
+        video = records[i]
+        summary_data = summarize_transcript(video.get("title", "Unknown"), prompt_text, preprocessed=True)
+        if summary_data:
+            video.update(summary_data)
+            updated += 1
+        else:
+            print(f"    Failed to get summary for {video.get('title')}")
+    if updated or repairs:
+        save_json(path, records)
+    return updated
+
+
+async def run_unit(unit, process_pool, network_slots, force, dry_run):
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(process_pool, cpu_stage, unit["path"], force)
+    records, prompts = result.pop("records"), result.pop("prompts")
+    result["summarized"] = 0
+    if result["needs"] and not dry_run:
+        async with network_slots:
+            result["summarized"] = await asyncio.to_thread(network_stage, unit["path"], records, result["needs"],
+                                                           prompts, result["repairs"])
+    elif result["repairs"] and not dry_run:
+        await asyncio.to_thread(network_stage, unit["path"], records, [], [], result["repairs"])
+    return unit, result
+
+
+async def run_backfill(units, checkpoint, checkpoint_path, workers, force, dry_run):
+    network_slots = asyncio.Semaphore(NETWORK_CONCURRENCY)
+    totals = {"units": 0, "videos": 0, "needs": 0, "repairs": 0, "summarized": 0, "raw_tokens": 0, "clean_tokens": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as process_pool:
+        tasks = [asyncio.create_task(run_unit(u, process_pool, network_slots, force, dry_run)) for u in units]
+        for task in asyncio.as_completed(tasks):
+            try:
+                unit, result = await task
+            except Exception as e:
+                print(f"  Unit failed: {e}")
+                continue
+
+            totals["units"] += 1
+            for key in ("videos", "repairs", "summarized", "raw_tokens", "clean_tokens"):
+                totals[key] += result[key]
+            totals["needs"] += len(result["needs"])
+
+            # A unit only counts as done once every video in it has a summary.
+            if dry_run or len(result["needs"]) == result["summarized"]:
+                checkpoint["done"][unit["id"]] = datetime.now().isoformat(timespec="seconds")
+                if not dry_run:
+                    save_checkpoint(checkpoint_path, checkpoint)
+            print(f"  [{totals['units']}/{len(units)}] {unit['id']}: {result['videos']} videos, "
+                  f"{result['repairs']} repaired locally, {len(result['needs'])} to summarize, {result['summarized']} summarized")
+
+        # Index building reuses the same worker processes.
+        update_index(map_fn=process_pool.map)
+
+    return totals
+
+
+def backfill(start, end, channels=None, force=False, workers=None, dry_run=False, restart=False):
+    units = work_units(start, end, channels)
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f"backfill-{job_id(start, end, channels, force)}.json")
+    checkpoint = {"done": {}} if restart else load_checkpoint(checkpoint_path)
+    checkpoint.update({"start": start, "end": end, "channels": channels or [], "force": force})
+
+    pending = [u for u in units if u["id"] not in checkpoint["done"]]
+    print(f"Backfill {start}..{end}: {len(units)} work units, {len(units) - len(pending)} already done "
+          f"(checkpoint {checkpoint_path}).")
+    if not pending:
+        return
+
+    totals = asyncio.run(run_backfill(pending, checkpoint, checkpoint_path, workers, force, dry_run))
+    print(f"\nProcessed {totals['units']} units, {totals['videos']} videos.")
+    print(f"Summaries repaired locally: {totals['repairs']}.")
+    print(f"Videos needing a summary: {totals['needs']}, summarized: {totals['summarized']}.")
+    print(f"Prompt tokens after preprocessing: {totals['raw_tokens']} -> {totals['clean_tokens']}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprocess a historical date range of data/.")
+    parser.add_argument("--start", type=str, required=True, help="First day (YYYY-MM-DD).")
+    parser.add_argument("--end", type=str, default=datetime.now().strftime("%Y-%m-%d"), help="Last day (YYYY-MM-DD).")
+    parser.add_argument("--channel", action="append", help="Only this channel (repeatable).")
+    parser.add_argument("--force", action="store_true", help="Re-summarize every video, not just missing/bad ones.")
+    parser.add_argument("--workers", type=int, help="Worker processes for parsing/preprocessing/indexing.")
+    parser.add_argument("--dry-run", action="store_true", help="Only run the local stages, no OpenAI calls.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of a previous run.")
+
+    args = parser.parse_args(argv)
+    backfill(args.start, args.end, args.channel, args.force, args.workers, args.dry_run, args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+# Startup benchmarks: wall time of a fresh interpreter running each CLI command.
+# Commands must work offline and without API keys.
+STARTUP_COMMANDS = {
+    "report": ["cli.py", "report"],
+    "index": ["cli.py", "index", "topics"],
+    "summarize": ["cli.py", "summarize", "--dir", "{empty_dir}"],
+    "dashboard": ["cli.py", "dashboard", "--out", "{tmp_dir}/site"],
+    "scrape --help": ["cli.py", "scrape", "--help"],
+}
+
+# Import cost of the heavy dependencies, for comparison.
+IMPORTS = ["openai", "googleapiclient.discovery", "yt_dlp", "apify_client"]
+
+
+def _time_run(argv, repeat):
+    """Median wall time, or None (after printing its stderr) when the command fails."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+        timings.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            error = result.stderr.decode("utf-8", "replace").strip().splitlines()
+            print(f"  {' '.join(argv)} failed (exit {result.returncode}): {error[-1] if error else 'no output'}")
+            return None
+    return statistics.median(timings)
+
+
+def bench_startup(repeat=5):
+    """Returns {name: median seconds, or None if it failed} for every startup command and heavy import."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        empty_dir = os.path.join(tmp_dir, "empty")
+        os.makedirs(empty_dir)
+        for name, argv in STARTUP_COMMANDS.items():
+            argv = [a.format(empty_dir=empty_dir, tmp_dir=tmp_dir) for a in argv]
+            results[f"cli {name}"] = _time_run(argv, repeat)
+
+    results["python (baseline)"] = _time_run(["-c", "pass"], repeat)
+    for module in IMPORTS:
+        results[f"import {module}"] = _time_run(["-c", f"import {module}"], repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks.")
+    parser.add_argument("suite", choices=["startup"], nargs="?", default="startup")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported).")
+    parser.add_argument("--json", type=str, help="Also write the results to this JSON file.")
+
+    args = parser.parse_args(argv)
+    results = bench_startup(args.repeat)
+
+    print(f"{'benchmark':<36}{'median ms':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<36}{seconds * 1000:>10.0f}" if seconds is not None else f"{name:<36}{'failed':>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"suite": args.suite, "results_ms": {k: round(v * 1000, 1) if v is not None else None
+                                                           for k, v in results.items()}}, f, indent=4)
+
+    if any(seconds is None for seconds in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
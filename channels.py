@@ -0,0 +1,281 @@
+import os
+import math
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from storage import DATA_DIR, DATE_DIR_RE, load_records
+
+# Single source of truth for the channels every entry point scrapes.
+REGISTRY_FILE = "channels.json"
+STATE_FILE = os.path.join("data", "channel_state.json")
+
+DEFAULT_LANGUAGE = "en"
+DEFAULT_MIN_DURATION_MINUTES = 5
+DEFAULT_PRIORITY = 3
+
+# Minimum hours between two polls of a channel, by priority (1 = highest).
+POLL_INTERVAL_HOURS = {1: 0, 2: 12, 3: 24, 4: 72, 5: 168}
+
+# Upper bound on channels checked per run (0 = no limit). The most overdue
+# channels go first, so a large registry no longer fans out linearly.
+MAX_CHANNELS_PER_RUN = int(os.getenv("MAX_CHANNELS_PER_RUN", "0"))
+
+# Adaptive polling: skip a due channel when the chance that it uploaded since
+# the last poll (estimated from its stored published_at history) is too low.
+ADAPTIVE_POLLING = os.getenv("ADAPTIVE_POLLING", "1") != "0"
+MIN_UPLOAD_PROBABILITY = float(os.getenv("MIN_UPLOAD_PROBABILITY", "0.25"))
+MAX_SKIP_HOURS = 96
+UPLOAD_HISTORY_DAYS = 60
+
+# Prior for channels with little history: one upload per week.
+PRIOR_UPLOADS = 1.0
+PRIOR_HOURS = 168.0
+
+# YouTube Data API cost of one channel check (search.list), plus the one-off
+# channel ID lookup for unresolved channels.
+SEARCH_QUOTA_UNITS = 100
+
+
+def load_channels(path=REGISTRY_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        channels = json.load(f)
+    for channel in channels:
+        channel.setdefault("id", None)
+        channel.setdefault("name", channel["handle"])
+        channel.setdefault("language", DEFAULT_LANGUAGE)
+        channel.setdefault("min_duration_minutes", DEFAULT_MIN_DURATION_MINUTES)
+        channel.setdefault("priority", DEFAULT_PRIORITY)
+    return channels
+
+
+def save_channels(channels, path=REGISTRY_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        f.write(",\n".join("    " + json.dumps(c, ensure_ascii=False) for c in channels))
+        f.write("\n]\n")
+
+
+def channel_url(channel):
+    return f"https://www.youtube.com/@{channel['handle']}"
+
+
+def file_prefix(channel):
+    """Prefix of the per-video files written by get_yt_data."""
+    return channel.get("file_prefix") or channel["handle"].lower()
+
+
+def channel_aliases(channels):
+    """
+    {lowercase name: handle} for every name a channel's data uses: the
+    handle, the legacy file prefix and the file-stem part before "_".
+    """
+    aliases = {}
+    for channel in channels:
+        for name in (channel["handle"], file_prefix(channel), channel["handle"].split("_")[0]):
+            aliases.setdefault(name.lower(), channel["handle"])
+    return aliases
+
+
+_registry_aliases = None
+
+
+def channel_key(name):
+    """
+    The registry handle for a stored channel name (channel_handle or file
+    stem), so "alessio" and "alessiorastani" count as one channel. Names
+    outside the registry are returned unchanged.
+    """
+    global _registry_aliases
+    if _registry_aliases is None:
+        try:
+            _registry_aliases = channel_aliases(load_channels())
+        except (OSError, ValueError):
+            _registry_aliases = {}
+    return _registry_aliases.get(str(name).lower(), name)
+
+
+def resolve_channel_id(youtube, channel, channels=None):
+    """
+    Returns the channel ID, looking it up with a (100 quota unit) search only
+    the first time and storing it in the registry afterwards.
+    """
+    if channel.get("id"):
+        return channel["id"]
+
+    try:
+        request = youtube.search().list(part="snippet", q=channel["handle"], type="channel", maxResults=1)
+        response = request.execute()
+        items = response.get("items", [])
+    except Exception as e:
+        print(f"Error getting channel ID for {channel_url(channel)}: {e}")
+        return None
+    if not items:
+        return None
+
+    channel["id"] = items[0]["snippet"]["channelId"]
+    registry = channels if channels is not None else load_channels()
+    for entry in registry:
+        if entry["handle"] == channel["handle"]:
+            entry["id"] = channel["id"]
+    save_channels(registry)
+    print(f"Resolved channel ID for {channel['handle']}: {channel['id']}")
+    return channel["id"]
+
+
+def load_poll_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return {}
+    return {}
+
+
+def save_poll_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=4, sort_keys=True)
+
+
+def mark_polled(state, channel, now=None):
+    now = now or datetime.now(timezone.utc)
+    state.setdefault(channel["handle"], {})["last_polled"] = now.isoformat()
+
+
+def hours_since_poll(state, channel, now=None):
+    now = now or datetime.now(timezone.utc)
+    last = state.get(channel["handle"], {}).get("last_polled")
+    if not last:
+        return None
+    return (now - datetime.fromisoformat(last)).total_seconds() / 3600
+
+
+def upload_history(channels, data_dir=DATA_DIR, days=UPLOAD_HISTORY_DAYS, now=None):
+    """Returns {handle: [published_at datetimes]} from the last `days` of data/."""
+    now = now or datetime.now(timezone.utc)
+    first_day = (now - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    names = channel_aliases(channels)
+
+    uploads = defaultdict(dict)
+    if not os.path.exists(data_dir):
+        return {}
+    for date_key in sorted(os.listdir(data_dir)):
+        folder_path = os.path.join(data_dir, date_key)
+        if not DATE_DIR_RE.match(date_key) or date_key < first_day or not os.path.isdir(folder_path):
+            continue
+        for filename in os.listdir(folder_path):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                records = load_records(os.path.join(folder_path, filename))
+            except Exception:
+                continue
+            stem = filename[:-len(".json")]
+            for video in records:
+                handle = names.get(str(video.get("channel_handle") or stem).lower())
+                if not handle:
+                    continue
+                try:
+                    published = datetime.fromisoformat(str(video["published_at"]).replace("Z", "+00:00"))
+                except (KeyError, ValueError):
+                    continue
+                if published.tzinfo is None:
+                    published = published.replace(tzinfo=timezone.utc)
+                uploads[handle][video.get("video_id") or published.isoformat()] = published
+    return {handle: sorted(items.values()) for handle, items in uploads.items()}
+
+
+def upload_rate_per_hour(uploads, now=None, days=UPLOAD_HISTORY_DAYS):
+    """Smoothed uploads per hour over the observed part of the history window."""
+    now = now or datetime.now(timezone.utc)
+    window_hours = days * 24.0
+    if uploads:
+        window_hours = min(window_hours, max((now - uploads[0]).total_seconds() / 3600, 24.0))
+    return (len(uploads) + PRIOR_UPLOADS) / (window_hours + PRIOR_HOURS)
+
+
+def lookback_hours(state, channel, default_hours, now=None):
+    """
+    Search window for a channel: the default, or longer when the channel was
+    skipped for a while, so skipped runs never lose videos.
+    """
+    elapsed = hours_since_poll(state, channel, now)
+    if elapsed is None:
+        return default_hours
+    return max(default_hours, math.ceil(elapsed) + 6)
+
+
+def plan_polls(channels=None, state=None, now=None, adaptive=ADAPTIVE_POLLING, data_dir=DATA_DIR, min_interval_hours=0):
+    """
+    One entry per channel with the poll decision and its inputs: priority
+    interval, upload rate, probability of a new upload and quota cost.
+    """
+    channels = channels if channels is not None else load_channels()
+    state = state if state is not None else load_poll_state()
+    now = now or datetime.now(timezone.utc)
+    history = upload_history(channels, data_dir, now=now) if adaptive else {}
+
+    plan = []
+    for channel in channels:
+        interval = POLL_INTERVAL_HOURS.get(channel["priority"], POLL_INTERVAL_HOURS[DEFAULT_PRIORITY])
+        interval = max(interval, min_interval_hours)
+        elapsed = hours_since_poll(state, channel, now)
+        rate = upload_rate_per_hour(history.get(channel["handle"], []), now)
+        probability = 1.0 if elapsed is None else 1 - math.exp(-rate * elapsed)
+        quota = SEARCH_QUOTA_UNITS + (0 if channel.get("id") else SEARCH_QUOTA_UNITS)
+
+        if elapsed is None:
+            due, reason, overdue = True, "never polled", float("inf")
+        elif elapsed < interval:
+            due, reason, overdue = False, "priority interval", 0
+        elif adaptive and probability < MIN_UPLOAD_PROBABILITY and elapsed < MAX_SKIP_HOURS:
+            due, reason, overdue = False, "unlikely upload", 0
+        else:
+            due, reason = True, "due"
+            overdue = elapsed / interval if interval else float("inf")
+
+        plan.append({
+            "channel": channel,
+            "due": due,
+            "reason": reason,
+            "overdue": overdue,
+            "hours_since_poll": elapsed,
+            "uploads_per_day": rate * 24,
+            "probability": probability,
+            "quota_units": quota,
+        })
+    return plan
+
+
+def print_poll_report(plan):
+    print("\n--- Poll plan ---")
+    print(f"{'channel':<24}{'uploads/day':>12}{'P(new)':>8}{'quota':>7}  decision")
+    for entry in plan:
+        decision = "poll" if entry["due"] else f"skip ({entry['reason']})"
+        print(f"{entry['channel']['handle']:<24}{entry['uploads_per_day']:>12.2f}{entry['probability']:>8.2f}"
+              f"{entry['quota_units'] if entry['due'] else 0:>7}  {decision}")
+    spent = sum(e["quota_units"] for e in plan if e["due"])
+    saved = sum(e["quota_units"] for e in plan if not e["due"])
+    print(f"Quota: {spent} units planned, {saved} units saved by skipping.\n")
+
+
+def due_channels(channels=None, state=None, now=None, limit=MAX_CHANNELS_PER_RUN, adaptive=ADAPTIVE_POLLING, report=True,
+                 min_interval_hours=0):
+    """
+    Channels to poll in this run, highest priority and most overdue first.
+    A channel is due when its priority's poll interval has elapsed and, with
+    adaptive polling, a new upload is likely enough.
+    """
+    plan = plan_polls(channels, state, now, adaptive, min_interval_hours=min_interval_hours)
+    due = [e for e in plan if e["due"]]
+    due.sort(key=lambda e: (e["channel"]["priority"], -e["overdue"], -e["probability"], e["channel"]["handle"]))
+    if limit:
+        for entry in due[limit:]:
+            entry["due"], entry["reason"] = False, "run limit"
+        due = due[:limit]
+    if report:
+        print_poll_report(plan)
+    return [e["channel"] for e in due]
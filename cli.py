@@ -0,0 +1,133 @@
+import os
+import sys
+import argparse
+import importlib
+
+# Entry points for `cli.py scrape --source ...`. Modules are only imported
+# when the command runs, so e.g. `report` never loads openai or yt_dlp.
+SCRAPERS = {
+    "yt": "get_yt_data",
+    "v3": "get_data_v3",
+    "apify": "get_data_with_apify",
+    "ytapify": "ytapify",
+    "legacy": "get_data",
+}
+
+# Scrapers whose main(argv) takes extra options such as --resume / --run-id.
+SCRAPER_OPTIONS = {"v3"}
+
+# Subcommands that hand their remaining arguments to a module's main(argv).
+DELEGATED = {
+    "summarize": "summarize_transcripts",
+    "index": "topic_index",
+    "serve": "daemon",
+    "dashboard": "dashboard",
+    "storage": "storage",
+    "preprocess": "preprocess",
+    "backfill": "backfill",
+    "dedup": "dedup",
+    "repair": "summary_schema",
+    "languages": "languages",
+    "correlate": "correlation",
+    "api": "api",
+    "export": "export",
+    "quality": "transcript_quality",
+    "rollups": "rollups",
+    "llm": "llm",
+    "integrity": "integrity",
+}
+
+
+def cmd_scrape(args):
+    scraper = importlib.import_module(SCRAPERS[args.source])
+    if args.source in SCRAPER_OPTIONS:
+        scraper.main(args.rest)
+    elif args.rest:
+        sys.exit(f"cli.py scrape: --source {args.source} takes no extra arguments: {' '.join(args.rest)}")
+    else:
+        scraper.main()
+
+
+def cmd_fix(args):
+    from get_data_with_apify import check_and_fix_summaries
+    check_and_fix_summaries(days_back=args.days)
+
+
+def cmd_report(args):
+    from channels import plan_polls, print_poll_report
+    from storage import iter_data_files, load_records
+
+    print_poll_report(plan_polls())
+
+    videos = summarized = files = 0
+    days = set()
+    for file_path in iter_data_files():
+        files += 1
+        try:
+            records = load_records(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        days.add(os.path.basename(os.path.dirname(file_path)))
+        videos += len(records)
+        summarized += sum(1 for v in records if v.get("summary_en") or v.get("summary_hu"))
+
+    print(f"Data: {len(days)} days, {files} files, {videos} videos ({summarized} summarized).")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Daily crypto YouTube news pipeline.",
+                                     epilog="--profile (anywhere) writes cProfile, flamegraph stacks and "
+                                            "allocation reports to reports/<run>/.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scrape = subparsers.add_parser("scrape", help="Fetch new videos, transcripts and summaries.")
+    scrape.add_argument("--source", choices=sorted(SCRAPERS), default="yt", help="Which scraper to run.")
+    scrape.set_defaults(func=cmd_scrape)
+
+    fix = subparsers.add_parser("fix", help="Summarize stored videos that are missing a summary.")
+    fix.add_argument("--days", type=int, default=3, help="How many days back to check.")
+    fix.set_defaults(func=cmd_fix)
+
+    report = subparsers.add_parser("report", help="Poll plan and data overview.")
+    report.set_defaults(func=cmd_report)
+
+    for name, module in DELEGATED.items():
+        sub = subparsers.add_parser(name, help=f"Run {module}.py (see `cli.py {name} -h`).", add_help=False)
+        sub.add_argument("rest", nargs=argparse.REMAINDER)
+        sub.set_defaults(module=module)
+
+    return parser
+
+
+def run(args, unknown, parser):
+    if getattr(args, "module", None):
+        importlib.import_module(args.module).main(unknown + args.rest)
+        return
+    if args.command == "scrape":
+        args.rest, unknown = unknown, []
+    if unknown:
+        parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+    args.func(args)
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # --profile is accepted anywhere on the command line, for every command.
+    profile = "--profile" in argv
+    if profile:
+        argv.remove("--profile")
+    parser = build_parser()
+    args, unknown = parser.parse_known_args(argv)
+
+    if not profile:
+        run(args, unknown, parser)
+        return
+    from profiling import profiled
+    name = args.source if args.command == "scrape" else args.command
+    with profiled(name):
+        run(args, unknown, parser)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Lazily created API clients.
+
+openai, googleapiclient, yt_dlp and apify_client each take a noticeable
+part of a second to import, so they are only imported (and the clients only
+built) the first time a command actually needs them.
+"""
+
+_openai_clients = {}
+_youtube_clients = {}
+_apify_clients = {}
+
+
+def openai_client(api_key):
+    if api_key not in _openai_clients:
+        from openai import OpenAI
+        _openai_clients[api_key] = OpenAI(api_key=api_key)
+    return _openai_clients[api_key]
+
+
+def youtube_client(api_key):
+    """YouTube Data API client; the discovery document is built once per key."""
+    if api_key not in _youtube_clients:
+        from googleapiclient.discovery import build
+        _youtube_clients[api_key] = build("youtube", "v3", developerKey=api_key)
+    return _youtube_clients[api_key]
+
+
+def apify_client(token):
+    if token not in _apify_clients:
+        from apify_client import ApifyClient
+        _apify_clients[token] = ApifyClient(token)
+    return _apify_clients[token]
@@ -0,0 +1,295 @@
+import os
+import csv
+import time
+import argparse
+
+import numpy as np
+
+from storage import DATA_DIR
+from topic_index import load_index, update_index
+from channels import channel_key
+
+# Local daily OHLC files: prices/<ASSET>.csv or prices/<ASSET>.parquet with a
+# date (or timestamp) column and a close column.
+PRICES_DIR = "prices"
+
+DEFAULT_LAGS = list(range(0, 8))
+DEFAULT_WINDOWS = [30, 90]
+
+# Scores within NEUTRAL_BAND of 50 are not counted as a directional call.
+NEUTRAL_BAND = 5
+
+# Channels need this many scored days (per lag) to get a row in the report.
+MIN_OBSERVATIONS = 20
+
+
+def _parse_day(value):
+    value = str(value).strip()
+    if value.isdigit():
+        # Unix timestamp in seconds or milliseconds.
+        seconds = int(value) / (1000 if len(value) > 10 else 1)
+        return np.datetime64(int(seconds), "s").astype("datetime64[D]")
+    return np.datetime64(value[:10], "D")
+
+
+def _find_column(names, *candidates):
+    lowered = {name.lower().strip(): name for name in names}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"none of the columns {candidates} found in {list(names)}")
+
+
+def load_prices(asset, prices_dir=PRICES_DIR):
+    """
+    Daily closes for an asset as (days datetime64[D], close float64), sorted,
+    one value per day (the last row wins).
+    """
+    csv_path = os.path.join(prices_dir, f"{asset}.csv")
+    parquet_path = os.path.join(prices_dir, f"{asset}.parquet")
+
+    if os.path.exists(csv_path):
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.DictReader(f)
+            date_col = _find_column(reader.fieldnames, "date", "timestamp", "time", "day")
+            close_col = _find_column(reader.fieldnames, "close", "adj close", "adj_close", "price")
+            rows = [(row[date_col], row[close_col]) for row in reader if row[close_col] not in ("", None)]
+        days = np.array([_parse_day(d) for d, _ in rows], dtype="datetime64[D]")
+        close = np.array([float(c) for _, c in rows], dtype=np.float64)
+    elif os.path.exists(parquet_path):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise Exception("Reading Parquet needs pandas and pyarrow (pip install pandas pyarrow)")
+        frame = pd.read_parquet(parquet_path)
+        if frame.index.name:
+            frame = frame.reset_index()
+        date_col = _find_column(frame.columns, "date", "timestamp", "time", "day")
+        close_col = _find_column(frame.columns, "close", "adj close", "adj_close", "price")
+        days = pd.to_datetime(frame[date_col]).to_numpy().astype("datetime64[D]")
+        close = frame[close_col].to_numpy(dtype=np.float64)
+    else:
+        raise FileNotFoundError(f"No price file for {asset} in {prices_dir}/ (expected {asset}.csv or {asset}.parquet)")
+
+    order = np.argsort(days, kind="stable")
+    days, close = days[order], close[order]
+    last = np.append(days[1:] != days[:-1], True)
+    return days[last], close[last]
+
+
+def load_sentiment(data_dir=DATA_DIR):
+    """
+    One (day, channel, score) entry per scored video, read from the topic
+    index instead of the data files. Returns (days, channel_codes, scores, channels).
+    """
+    update_index(data_dir)
+    seen = {}
+    for postings in load_index()["postings"].values():
+        for date, channel, video_id, score in postings:
+            if score is not None:
+                seen[video_id or (date, channel, score)] = (date, channel_key(channel.lower()), score)
+
+    entries = sorted(seen.values())
+    channels = sorted({channel for _, channel, _ in entries})
+    codes = {channel: i for i, channel in enumerate(channels)}
+    days = np.array([date for date, _, _ in entries], dtype="datetime64[D]")
+    channel_codes = np.array([codes[channel] for _, channel, _ in entries], dtype=np.int64)
+    scores = np.array([score for _, _, score in entries], dtype=np.float64)
+    return days, channel_codes, scores, channels
+
+
+def sentiment_matrix(days, channel_codes, scores, n_channels, start, n_days):
+    """
+    Daily mean score per channel, shape (n_channels + 1, n_days), NaN where a
+    channel published nothing. The last row is the all-channel index.
+    """
+    offsets = (days - start).astype(np.int64)
+    inside = (offsets >= 0) & (offsets < n_days)
+    offsets, channel_codes, scores = offsets[inside], channel_codes[inside], scores[inside]
+
+    sums = np.zeros((n_channels + 1, n_days))
+    counts = np.zeros((n_channels + 1, n_days))
+    np.add.at(sums, (channel_codes, offsets), scores)
+    np.add.at(counts, (channel_codes, offsets), 1)
+    sums[-1] = sums[:-1].sum(axis=0)
+    counts[-1] = counts[:-1].sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def forward_returns(close, lags):
+    """
+    R[l, t] = log return of day t + lag[l] (close[t+lag] / close[t+lag-1]),
+    so sentiment on day t is compared with the move lag days later.
+    Lag 0 is the same-day move. NaN outside the price history.
+    """
+    daily = np.full(close.shape, np.nan)
+    daily[1:] = np.log(close[1:] / close[:-1])
+    index = np.arange(close.size)[None, :] + np.asarray(lags)[:, None]
+    valid = index < close.size
+    return np.where(valid, daily[np.minimum(index, close.size - 1)], np.nan)
+
+
+def _masked_pearson(x, y, axis=-1):
+    """Pearson correlation over `axis`, ignoring positions where x or y is NaN."""
+    mask = ~(np.isnan(x) | np.isnan(y))
+    n = mask.sum(axis=axis)
+    x0 = np.where(mask, x, 0.0)
+    y0 = np.where(mask, y, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = x0.sum(axis=axis) / n
+        my = y0.sum(axis=axis) / n
+        cov = (x0 * y0).sum(axis=axis) / n - mx * my
+        vx = (x0 * x0).sum(axis=axis) / n - mx * mx
+        vy = (y0 * y0).sum(axis=axis) / n - my * my
+        return cov / np.sqrt(vx * vy), n
+
+
+def lagged_correlations(S, R):
+    """corr[c, l] between channel c's sentiment and the lag-l return, plus observation counts."""
+    return _masked_pearson(S[:, None, :], R[None, :, :])
+
+
+def rolling_ic(S, R, window):
+    """
+    Rolling information coefficient: Pearson correlation over a trailing
+    window of days, for every (channel, lag) at once via cumulative sums.
+    Returns an array of shape (channels, lags, days), NaN where the window
+    has fewer than window // 3 paired observations.
+    """
+    x = np.broadcast_to(S[:, None, :], (S.shape[0], R.shape[0], S.shape[1]))
+    y = np.broadcast_to(R[None, :, :], x.shape)
+    mask = ~(np.isnan(x) | np.isnan(y))
+    x0, y0 = np.where(mask, x, 0.0), np.where(mask, y, 0.0)
+
+    def window_sum(a):
+        c = np.cumsum(a, axis=-1)
+        c[..., window:] = c[..., window:] - c[..., :-window]
+        return c
+
+    n = window_sum(mask.astype(np.float64))
+    sx, sy = window_sum(x0), window_sum(y0)
+    sxx, syy, sxy = window_sum(x0 * x0), window_sum(y0 * y0), window_sum(x0 * y0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var = (sxx - sx * sx / n) * (syy - sy * sy / n)
+        ic = cov / np.sqrt(var)
+    return np.where(n >= max(window // 3, 3), ic, np.nan)
+
+
+def hit_rates(S, R, neutral_band=NEUTRAL_BAND):
+    """
+    Share of directional calls (score above / below 50 +- band) that matched
+    the sign of the lagged return. Shape (channels, lags), plus call counts.
+    """
+    direction = np.sign(S - 50)
+    direction[np.abs(S - 50) <= neutral_band] = np.nan
+    calls = ~np.isnan(direction)[:, None, :] & ~np.isnan(R)[None, :, :] & (R[None, :, :] != 0)
+    hits = calls & (direction[:, None, :] == np.sign(R)[None, :, :])
+    n = calls.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return hits.sum(axis=-1) / n, n
+
+
+def analyze(asset, lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS, prices_dir=PRICES_DIR, data_dir=DATA_DIR):
+    """Runs the whole sweep for one asset. Returns a dict of arrays and labels."""
+    price_days, close = load_prices(asset, prices_dir)
+    s_days, channel_codes, scores, channels = load_sentiment(data_dir)
+
+    # Calendar-day axis over the price history; crypto trades every day, so
+    # gaps in the file are forward-filled.
+    start = price_days[0]
+    n_days = int((price_days[-1] - start).astype(np.int64)) + 1
+    offsets = (price_days - start).astype(np.int64)
+    filled = np.full(n_days, np.nan)
+    filled[offsets] = close
+    last_seen = np.maximum.accumulate(np.where(np.isnan(filled), -1, np.arange(n_days)))
+    filled = filled[last_seen]
+
+    S = sentiment_matrix(s_days, channel_codes, scores, len(channels), start, n_days)
+    R = forward_returns(filled, lags)
+    corr, n = lagged_correlations(S, R)
+    hit, calls = hit_rates(S, R)
+
+    ic = {}
+    for window in windows:
+        series = rolling_ic(S, R, window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            count = (~np.isnan(series)).sum(axis=-1)
+            mean = np.where(count > 0, np.nansum(series, axis=-1) / np.maximum(count, 1), np.nan)
+            std = np.sqrt(np.where(count > 1, np.nansum((series - mean[..., None]) ** 2, axis=-1) / np.maximum(count - 1, 1), np.nan))
+            ir = mean / std
+        ic[window] = {"mean": mean, "ir": ir}
+
+    return {
+        "asset": asset,
+        "channels": channels + ["ALL"],
+        "lags": list(lags),
+        "corr": corr,
+        "n": n,
+        "hit_rate": hit,
+        "calls": calls,
+        "ic": ic,
+        "first_day": str(start),
+        "last_day": str(price_days[-1]),
+    }
+
+
+def print_report(result, min_observations=MIN_OBSERVATIONS):
+    lags = result["lags"]
+    print(f"\n{result['asset']}: sentiment vs. daily log return, {result['first_day']}..{result['last_day']}")
+
+    print("\nLagged correlation (rows: channel, columns: lag in days; n = scored days at lag 0)")
+    print(f"{'channel':<22}{'n':>5}" + "".join(f"{lag:>8}" for lag in lags))
+    for c, channel in enumerate(result["channels"]):
+        if result["n"][c, 0] < min_observations:
+            continue
+        print(f"{channel:<22}{result['n'][c, 0]:>5}" + "".join(f"{v:>8.3f}" for v in result["corr"][c]))
+
+    print("\nHit rate of directional calls")
+    print(f"{'channel':<22}{'calls':>5}" + "".join(f"{lag:>8}" for lag in lags))
+    for c, channel in enumerate(result["channels"]):
+        if result["calls"][c, 0] < min_observations:
+            continue
+        print(f"{channel:<22}{result['calls'][c, 0]:>5}" + "".join(f"{v:>8.1%}" for v in result["hit_rate"][c]))
+
+    for window, stats in result["ic"].items():
+        print(f"\nRolling {window}-day IC, all channels: mean / IR per lag")
+        print("  " + "  ".join(f"{lag}d {m:+.3f}/{ir:+.2f}" for lag, m, ir in zip(lags, stats["mean"][-1], stats["ir"][-1])))
+
+
+def _int_list(value):
+    items = []
+    for part in value.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            items.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            items.append(int(part))
+    return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Correlate the daily sentiment index with local OHLC prices.")
+    parser.add_argument("--asset", action="append", help="Asset file name in prices/ (repeatable, default BTC and ETH).")
+    parser.add_argument("--lags", type=_int_list, default=DEFAULT_LAGS, help="Lags in days, e.g. 0-7 or 1,3,7.")
+    parser.add_argument("--windows", type=_int_list, default=DEFAULT_WINDOWS, help="Rolling IC windows in days, e.g. 30,90.")
+    parser.add_argument("--prices", type=str, default=PRICES_DIR, help="Directory of OHLC files.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+    parser.add_argument("--min-obs", type=int, default=MIN_OBSERVATIONS, help="Hide channels with fewer scored days.")
+
+    args = parser.parse_args(argv)
+    for asset in args.asset or ["BTC", "ETH"]:
+        started = time.perf_counter()
+        try:
+            result = analyze(asset, args.lags, args.windows, args.prices, args.dir)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{asset}: {e}")
+            continue
+        print_report(result, args.min_obs)
+        print(f"\n({len(result['channels'])} channels x {len(args.lags)} lags x {len(args.windows)} windows "
+              f"in {time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
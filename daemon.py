@@ -0,0 +1,99 @@
+import os
+import time
+import signal
+import argparse
+import threading
+from datetime import datetime
+
+from channels import load_channels, load_poll_state, save_poll_state, due_channels
+from topic_index import update_index
+
+# How often the daemon wakes up to look for due channels.
+TICK_SECONDS = int(os.getenv("DAEMON_TICK_SECONDS", "300"))
+
+# Even priority-1 channels are not searched more often than this, so the
+# daemon stays inside the daily YouTube quota.
+MIN_POLL_HOURS = float(os.getenv("DAEMON_MIN_POLL_HOURS", "1"))
+
+
+def install_signal_handlers(stop):
+    def handle(signum, frame):
+        print(f"\nReceived signal {signum}, finishing the current channel and shutting down...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle)
+    signal.signal(signal.SIGINT, handle)
+
+
+def run_cycle(scraper, api, stop):
+    """
+    One scheduling pass. History and poll state are checkpointed after every
+    channel, so a restart resumes without re-summarizing finished videos.
+    """
+    channels = load_channels()
+    poll_state = load_poll_state()
+    processed_ids = scraper.load_history()
+
+    new_videos = 0
+    for channel in due_channels(channels, poll_state, min_interval_hours=MIN_POLL_HOURS):
+        if stop.is_set():
+            break
+        videos = scraper.process_channel(api, channel, channels, poll_state, processed_ids)
+        new_videos += len(videos)
+        save_poll_state(poll_state)
+        if videos:
+            scraper.save_history(processed_ids)
+
+    if new_videos:
+        update_index()
+    return new_videos
+
+
+def serve(tick_seconds=TICK_SECONDS, once=False):
+    """
+    Long-running scrape loop. Heavy imports, API clients and the YouTube
+    discovery document are created once and reused by every cycle.
+    """
+    import get_data_v3 as scraper
+
+    if not scraper.YOUTUBE_API_KEYS:
+        print("ERROR: YOUTUBE_API_KEY is missing!")
+        return
+
+    stop = threading.Event()
+    install_signal_handlers(stop)
+    api = scraper.new_api_state()
+    api_day = datetime.now().date()
+
+    print(f"Daemon started (tick {tick_seconds}s, min poll interval {MIN_POLL_HOURS}h).")
+    while not stop.is_set():
+        started = time.monotonic()
+        print(f"\n=== Cycle at {datetime.now().isoformat(timespec='seconds')} ===")
+        try:
+            new_videos = run_cycle(scraper, api, stop)
+            print(f"=== Cycle done: {new_videos} new videos in {time.monotonic() - started:.1f}s ===")
+        except Exception as e:
+            print(f"=== Cycle failed: {e} ===")
+
+        if once:
+            break
+        # Quota is per key per day; go back to the first key once the day changes.
+        if api["key_index"] and datetime.now().date() != api_day:
+            api.update(scraper.new_api_state())
+        api_day = datetime.now().date()
+        stop.wait(tick_seconds)
+
+    print("Daemon stopped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the scraper as a long-running daemon.")
+    parser.add_argument("--tick", type=int, default=TICK_SECONDS, help="Seconds between scheduling passes.")
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit.")
+
+    args = parser.parse_args(argv)
+    serve(args.tick, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import os
+import json
+import hashlib
+import argparse
+from collections import defaultdict
+
+from storage import DATA_DIR, iter_data_files, load_records, write_if_changed
+from channels import channel_key
+from summary_schema import PUBLIC_FIELDS
+
+SITE_DIR = "site"
+STATE_FILE = "build_state.json"
+
+INDEX_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Daily crypto YouTube digest</title>
+<style>
+body { font-family: sans-serif; margin: 0; display: flex; }
+nav { width: 260px; height: 100vh; overflow-y: auto; border-right: 1px solid #ddd; padding: 8px; box-sizing: border-box; }
+nav a { display: block; padding: 2px 4px; cursor: pointer; color: #225; text-decoration: none; }
+nav a:hover { background: #eef; }
+main { flex: 1; height: 100vh; overflow-y: auto; padding: 16px; box-sizing: border-box; }
+.video { border-bottom: 1px solid #eee; padding: 8px 0; }
+.Bullish { color: #080; } .Bearish { color: #b00; } .Neutral { color: #666; }
+select { margin-bottom: 8px; }
+</style>
+</head>
+<body>
+<nav>
+  <select id="lang"><option value="en">EN</option><option value="hu">HU</option></select>
+  <h3>Days</h3><div id="days"></div>
+  <h3>Channels</h3><div id="channels"></div>
+</nav>
+<main id="content">Loading...</main>
+<script>
+const cache = {};
+let manifest = null;
+let currentView = null;
+
+async function getJson(path) {
+  if (!cache[path]) cache[path] = fetch(path).then(r => r.json());
+  return cache[path];
+}
+
+function esc(s) {
+  return String(s == null ? "" : s).replace(/[&<>"]/g, c => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c]));
+}
+
+function renderVideo(v, channel) {
+  const lang = document.getElementById("lang").value;
+  const points = (v["key_points_" + lang] || []).map(p => "<li>" + esc(p) + "</li>").join("");
+  return '<div class="video"><b><a href="' + esc(v.url) + '">' + esc(v.title) + "</a></b>" +
+    (channel ? " &middot; " + esc(channel) : "") +
+    ' <span class="' + esc(v.crypto_sentiment) + '">' + esc(v.crypto_sentiment) + " " + esc(v.sentiment_score) + "</span>" +
+    "<p>" + esc(v["summary_" + lang]) + "</p><ul>" + points + "</ul></div>";
+}
+
+async function showDay(day) {
+  currentView = () => showDay(day);
+  const shard = await getJson("shards/day/" + day + ".json");
+  let html = "<h2>" + esc(day) + "</h2>";
+  for (const [channel, videos] of Object.entries(shard.channels)) {
+    html += videos.map(v => renderVideo(v, channel)).join("");
+  }
+  document.getElementById("content").innerHTML = html;
+}
+
+async function showChannel(channel) {
+  currentView = () => showChannel(channel);
+  const months = manifest.channels[channel].months.slice().reverse();
+  let html = "<h2>" + esc(channel) + "</h2>";
+  for (const month of months) {
+    const shard = await getJson("shards/channel/" + channel + "/" + month + ".json");
+    html += "<h3>" + esc(month) + "</h3>" + shard.videos.map(v => renderVideo(v)).join("");
+  }
+  document.getElementById("content").innerHTML = html;
+}
+
+async function init() {
+  manifest = await getJson("manifest.json");
+  const days = Object.keys(manifest.days).sort().reverse();
+  document.getElementById("days").innerHTML = days.map(d => {
+    const m = manifest.days[d];
+    const score = m.mean_sentiment == null ? "" : " (" + m.mean_sentiment.toFixed(0) + ")";
+    return '<a data-day="' + d + '">' + d + " &middot; " + m.videos + score + "</a>";
+  }).join("");
+  document.getElementById("channels").innerHTML = Object.keys(manifest.channels).sort().map(c =>
+    '<a data-channel="' + esc(c) + '">' + esc(c) + " &middot; " + manifest.channels[c].videos + "</a>").join("");
+  document.querySelector("nav").addEventListener("click", e => {
+    if (e.target.dataset.day) showDay(e.target.dataset.day);
+    if (e.target.dataset.channel) showChannel(e.target.dataset.channel);
+  });
+  document.getElementById("lang").addEventListener("change", () => currentView && currentView());
+  if (days.length) showDay(days[0]); else document.getElementById("content").innerHTML = "No data.";
+}
+
+init();
+</script>
+</body>
+</html>
+"""
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_if_changed(path, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+
+
+def _day_files(data_dir):
+    """Returns {date: [file_path, ...]} for the data tree."""
+    days = defaultdict(list)
+    for file_path in iter_data_files(data_dir):
+        days[os.path.basename(os.path.dirname(file_path))].append(file_path)
+    return days
+
+
+def _day_hash(file_paths):
+    digest = hashlib.sha1()
+    for file_path in sorted(file_paths):
+        digest.update(os.path.basename(file_path).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _summary_row(video):
+    return {k: video[k] for k in PUBLIC_FIELDS if k in video}
+
+
+def _day_videos(file_paths):
+    """Returns {channel: [summary rows]} for one day."""
+    channels = defaultdict(list)
+    for file_path in sorted(file_paths):
+        default_channel = os.path.splitext(os.path.basename(file_path))[0].split("_")[0]
+        try:
+            records = load_records(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        for video in records:
+            if "summary_en" not in video and "summary_hu" not in video:
+                continue
+            channel = channel_key(video.get("channel_handle") or default_channel)
+            channels[channel].append(_summary_row(video))
+    return dict(channels)
+
+
+def _mean_sentiment(videos):
+    scores = []
+    for video in videos:
+        try:
+            scores.append(float(video.get("sentiment_score")))
+        except (TypeError, ValueError):
+            pass
+    return sum(scores) / len(scores) if scores else None
+
+
+def build_site(data_dir=DATA_DIR, site_dir=SITE_DIR, force=False):
+    """
+    Builds the static dashboard. Only day shards whose input files changed since
+    the last build are regenerated, plus the channel-month shards they feed.
+    """
+    state_path = os.path.join(site_dir, STATE_FILE)
+    state = {"days": {}, "summary": {}}
+    if not force and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    days = _day_files(data_dir)
+    changed_days = []
+    for date_key, file_paths in days.items():
+        day_hash = _day_hash(file_paths)
+        if state["days"].get(date_key) != day_hash:
+            changed_days.append(date_key)
+            state["days"][date_key] = day_hash
+    removed_days = [d for d in state["days"] if d not in days]
+
+    touched_months = set()
+    for date_key in removed_days:
+        del state["days"][date_key]
+        for channel in state["summary"].pop(date_key, {}).get("channels", {}):
+            touched_months.add((channel, date_key[:7]))
+        day_shard = os.path.join(site_dir, "shards", "day", f"{date_key}.json")
+        if os.path.exists(day_shard):
+            os.remove(day_shard)
+
+    for date_key in sorted(changed_days):
+        channels = _day_videos(days[date_key])
+        old_channels = state["summary"].get(date_key, {}).get("channels", {})
+        _write_json(os.path.join(site_dir, "shards", "day", f"{date_key}.json"), {"date": date_key, "channels": channels})
+
+        all_videos = [v for videos in channels.values() for v in videos]
+        state["summary"][date_key] = {
+            "videos": len(all_videos),
+            "mean_sentiment": _mean_sentiment(all_videos),
+            "channels": {c: len(v) for c, v in channels.items()},
+        }
+        for channel in set(channels) | set(old_channels):
+            touched_months.add((channel, date_key[:7]))
+
+    # Channel shards are per month so a channel page never loads years of history at once.
+    for channel, month in sorted(touched_months):
+        month_days = sorted(d for d in state["summary"] if d.startswith(month) and channel in state["summary"][d]["channels"])
+        videos = []
+        for date_key in month_days:
+            with open(os.path.join(site_dir, "shards", "day", f"{date_key}.json"), "r", encoding="utf-8") as f:
+                for video in json.load(f)["channels"].get(channel, []):
+                    videos.append(dict(video, date=date_key))
+        shard_path = os.path.join(site_dir, "shards", "channel", channel, f"{month}.json")
+        if videos:
+            _write_json(shard_path, {"channel": channel, "month": month, "videos": videos})
+        elif os.path.exists(shard_path):
+            os.remove(shard_path)
+
+    manifest = {"days": {}, "channels": {}}
+    channel_months = defaultdict(set)
+    channel_counts = defaultdict(int)
+    for date_key, summary in sorted(state["summary"].items()):
+        if not summary["videos"]:
+            continue
+        manifest["days"][date_key] = {"videos": summary["videos"], "mean_sentiment": summary["mean_sentiment"]}
+        for channel, count in summary["channels"].items():
+            channel_months[channel].add(date_key[:7])
+            channel_counts[channel] += count
+    for channel in sorted(channel_months):
+        manifest["channels"][channel] = {"videos": channel_counts[channel], "months": sorted(channel_months[channel])}
+
+    _write_json(os.path.join(site_dir, "manifest.json"), manifest)
+    write_if_changed(os.path.join(site_dir, "index.html"), INDEX_HTML)
+    _write_json(state_path, state)
+
+    print(f"Dashboard built in {site_dir}/: {len(changed_days)} day shards rebuilt, "
+          f"{len(touched_months)} channel shards rebuilt, {len(removed_days)} days removed.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static dashboard from data/.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+    parser.add_argument("--out", type=str, default=SITE_DIR, help="Output directory.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every shard.")
+
+    args = parser.parse_args(argv)
+    build_site(args.dir, args.out, args.force)
+
+
+if __name__ == "__main__":
+    main()
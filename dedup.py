@@ -0,0 +1,337 @@
+import os
+import json
+import base64
+import struct
+import hashlib
+import argparse
+from collections import defaultdict
+
+from storage import DATA_DIR, iter_data_files, load_json, load_records, merge_videos, save_json, write_if_changed
+from preprocess import clean_transcript, estimate_tokens, PROMPT_CHAR_LIMIT
+
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+INDEX_FILE = os.path.join(INDEX_DIR, "minhash.json")
+
+# MinHash signature: NUM_HASHES 32-bit values over word shingles, split into
+# LSH_BANDS bands. Two transcripts become candidates when any band matches,
+# which happens with probability 1 - (1 - J^rows)^bands (~0.98 at J = 0.8).
+NUM_HASHES = 64
+LSH_BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // LSH_BANDS
+SHINGLE_WORDS = 5
+
+# Estimated Jaccard similarity above which an existing summary is reused.
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+
+# Fields copied from the original video to its near-duplicate.
+SUMMARY_KEYS = [
+    "summary_hu", "summary_en", "crypto_sentiment", "sentiment_score",
+    "key_points_hu", "key_points_en", "main_topics", "summary_model",
+]
+
+_EMPTY_BIN = 0xFFFFFFFF
+_shared_index = None
+
+
+def minhash_signature(text):
+    """
+    One-permutation MinHash: every shingle is hashed once, the low bits pick
+    one of NUM_HASHES bins and each bin keeps its minimum. Empty bins borrow
+    the next filled bin's value, so short transcripts still band correctly.
+    Returns the packed signature (bytes) or None for empty text.
+    """
+    words = clean_transcript(text or "").lower().split()
+    if not words:
+        return None
+
+    bins = [_EMPTY_BIN] * NUM_HASHES
+    for i in range(max(len(words) - SHINGLE_WORDS + 1, 1)):
+        shingle = " ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little")
+        slot, value = h % NUM_HASHES, (h // NUM_HASHES) & 0xFFFFFFFE
+        if value < bins[slot]:
+            bins[slot] = value
+
+    for slot in range(NUM_HASHES):
+        if bins[slot] == _EMPTY_BIN:
+            for distance in range(1, NUM_HASHES):
+                donor = bins[(slot + distance) % NUM_HASHES]
+                if donor != _EMPTY_BIN:
+                    bins[slot] = ((donor + distance) % _EMPTY_BIN) | 1
+                    break
+    return struct.pack(f"<{NUM_HASHES}I", *bins)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two packed signatures."""
+    a = struct.unpack(f"<{NUM_HASHES}I", sig_a)
+    b = struct.unpack(f"<{NUM_HASHES}I", sig_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_HASHES
+
+
+def _bands(signature):
+    step = ROWS_PER_BAND * 4
+    return [(band, signature[band * step:(band + 1) * step]) for band in range(LSH_BANDS)]
+
+
+def _file_signature(file_path):
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _file_entries(file_path):
+    """(video_id, packed signature) for every summarized video in one data file."""
+    entries = []
+    for video in load_records(file_path):
+        if not video.get("video_id") or not (video.get("summary_en") or video.get("summary_hu")):
+            continue
+        signature = minhash_signature(video.get("transcript"))
+        if signature:
+            entries.append((video["video_id"], signature))
+    return entries
+
+
+def _add(index, video_id, signature, location):
+    if video_id in index["videos"]:
+        return
+    index["videos"][video_id] = dict(location, minhash=signature)
+    for key in _bands(signature):
+        index["buckets"][key].append(video_id)
+
+
+def load_dedup_index():
+    """Loads the signature store and rebuilds the in-memory LSH buckets."""
+    stored = {"files": {}, "videos": {}}
+    if os.path.exists(INDEX_FILE):
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            try:
+                stored = json.load(f)
+            except json.JSONDecodeError:
+                pass
+
+    index = {"files": stored["files"], "videos": {}, "buckets": defaultdict(list)}
+    for video_id, entry in stored["videos"].items():
+        _add(index, video_id, base64.b64decode(entry["minhash"]), {"file": entry["file"]})
+    return index
+
+
+def save_dedup_index(index):
+    """Stores only signatures of indexed data files, not videos remembered in memory."""
+    videos = {}
+    for video_id, entry in index["videos"].items():
+        if "file" in entry:
+            videos[video_id] = {"file": entry["file"], "minhash": base64.b64encode(entry["minhash"]).decode("ascii")}
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    stored = {"files": index["files"], "videos": videos}
+    write_if_changed(INDEX_FILE, json.dumps(stored, ensure_ascii=False, sort_keys=True, separators=(",", ":")))
+
+
+def update_dedup_index(data_dir=DATA_DIR, rebuild=False):
+    """Signs the transcripts of new or changed data files, like topic_index.update_index."""
+    index = {"files": {}, "videos": {}, "buckets": defaultdict(list)} if rebuild else load_dedup_index()
+    files = index["files"]
+
+    current = {}
+    for file_path in iter_data_files(data_dir):
+        current[os.path.relpath(file_path, data_dir)] = file_path
+
+    changed = [rel for rel, path in current.items()
+               if rel not in files or files[rel]["sig"] != _file_signature(path)]
+    removed = [rel for rel in files if rel not in current]
+
+    stale_ids = set()
+    for rel in changed + removed:
+        if rel in files:
+            stale_ids.update(files[rel]["videos"])
+            del files[rel]
+    if stale_ids:
+        for video_id in stale_ids:
+            index["videos"].pop(video_id, None)
+        for key in list(index["buckets"]):
+            index["buckets"][key] = [v for v in index["buckets"][key] if v not in stale_ids]
+
+    for rel in changed:
+        try:
+            entries = _file_entries(current[rel])
+        except Exception as e:
+            print(f"  Error signing {current[rel]}: {e}")
+            continue
+        files[rel] = {"sig": _file_signature(current[rel]), "videos": [video_id for video_id, _ in entries]}
+        for video_id, signature in entries:
+            _add(index, video_id, signature, {"file": rel})
+
+    if changed or removed or rebuild:
+        save_dedup_index(index)
+        print(f"Duplicate index updated: {len(changed)} changed, {len(removed)} removed files.")
+    return index
+
+
+def shared_index():
+    """Process-wide index, brought up to date from data/ on first use."""
+    global _shared_index
+    if _shared_index is None:
+        _shared_index = update_dedup_index()
+    return _shared_index
+
+
+def _candidates(index, signature):
+    seen = set()
+    for key in _bands(signature):
+        for video_id in index["buckets"].get(key, ()):
+            if video_id not in seen:
+                seen.add(video_id)
+                yield video_id
+
+
+def _stored_summary(entry, video_id, data_dir=DATA_DIR):
+    if "summary" in entry:
+        return entry["summary"]
+    for video in load_records(os.path.join(data_dir, entry["file"])):
+        if video.get("video_id") == video_id:
+            return {k: video[k] for k in SUMMARY_KEYS if k in video}
+    return None
+
+
+def find_duplicate(transcript, video_id=None, index=None, threshold=DUPLICATE_THRESHOLD):
+    """
+    Looks for an already summarized near-duplicate of a transcript. Only
+    videos sharing an LSH bucket are compared, so the lookup does not scan
+    the history. Returns {"video_id", "similarity", "summary"} or None.
+    """
+    index = index if index is not None else shared_index()
+    signature = minhash_signature(transcript)
+    if not signature:
+        return None
+
+    best_id, best_score = None, threshold
+    for candidate in _candidates(index, signature):
+        if candidate == video_id:
+            continue
+        score = similarity(signature, index["videos"][candidate]["minhash"])
+        if score >= best_score:
+            best_id, best_score = candidate, score
+    if best_id is None:
+        return None
+
+    try:
+        summary = _stored_summary(index["videos"][best_id], best_id)
+    except Exception as e:
+        print(f"  -> Could not read the summary of {best_id}: {e}")
+        return None
+    if not summary:
+        return None
+    return {"video_id": best_id, "similarity": best_score, "summary": summary}
+
+
+def remember(video, index=None):
+    """Makes a video summarized in this run available to find_duplicate."""
+    index = index if index is not None else shared_index()
+    signature = minhash_signature(video.get("transcript"))
+    if signature and video.get("video_id"):
+        _add(index, video["video_id"], signature, {"summary": {k: video[k] for k in SUMMARY_KEYS if k in video}})
+
+
+def duplicate_groups(index, threshold=DUPLICATE_THRESHOLD):
+    """Pairs of stored videos at or above the threshold."""
+    pairs = []
+    for video_id, entry in sorted(index["videos"].items()):
+        for candidate in _candidates(index, entry["minhash"]):
+            if candidate > video_id:
+                score = similarity(entry["minhash"], index["videos"][candidate]["minhash"])
+                if score >= threshold:
+                    pairs.append((score, video_id, candidate))
+    return sorted(pairs, reverse=True)
+
+
+def summary_tokens(video):
+    """Estimated prompt + completion tokens that were paid for a video's summary (0 if it has none)."""
+    if not any(video.get(field) for field in SUMMARY_KEYS):
+        return 0
+    output = json.dumps({k: video[k] for k in SUMMARY_KEYS if k in video}, ensure_ascii=False)
+    return estimate_tokens((video.get("transcript") or "")[:PROMPT_CHAR_LIMIT]) + estimate_tokens(output)
+
+
+def compact_tree(data_dir=DATA_DIR, apply=False):
+    """
+    Finds records stored more than once under the same video_id. Within a
+    file they are merged like the writer does (newest fields win). Across
+    files the first copy in date order is kept and only gains the fields it
+    lacks. Files are only rewritten (or removed when emptied) with apply=True.
+    """
+    files, first_seen = {}, {}
+    in_file = across = wasted = 0
+    for file_path in iter_data_files(data_dir):
+        try:
+            data = load_json(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        records = data if isinstance(data, list) else [data]
+        seen_here = set()
+        for video in records:
+            if video.get("video_id") in seen_here:
+                wasted += summary_tokens(video)
+            seen_here.add(video.get("video_id"))
+        records, merged = merge_videos(records, [])
+        in_file += merged
+
+        kept = []
+        for video in records:
+            video_id = video.get("video_id")
+            if video_id in first_seen:
+                original_path, position = first_seen[video_id]
+                original = files[original_path]["records"][position]
+                for key, value in video.items():
+                    original.setdefault(key, value)
+                files[original_path]["changed"] = True
+                across += 1
+                wasted += summary_tokens(video)
+                print(f"  {video_id}: {file_path} repeats {original_path}")
+                continue
+            if video_id:
+                first_seen[video_id] = (file_path, len(kept))
+            kept.append(video)
+        files[file_path] = {"records": kept, "single": isinstance(data, dict),
+                            "changed": merged > 0 or len(kept) < len(records)}
+
+    changed = [path for path, entry in files.items() if entry["changed"]]
+    print(f"{in_file + across} duplicate records ({in_file} within files, {across} across files) in "
+          f"{len(changed)} files; about {wasted} tokens were spent summarizing them.")
+    if not apply:
+        if changed:
+            print("Dry run; use --apply to rewrite the files.")
+        return in_file + across
+
+    for path in changed:
+        records = files[path]["records"]
+        if not records:
+            os.remove(path)
+        elif files[path]["single"]:
+            save_json(path, records[0])
+        else:
+            save_json(path, records)
+    print(f"Rewrote {len(changed)} files.")
+    return in_file + across
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MinHash near-duplicate index over stored transcripts.")
+    parser.add_argument("command", choices=["update", "rebuild", "pairs", "compact"])
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="Minimum estimated similarity.")
+    parser.add_argument("--apply", action="store_true", help="compact: rewrite the data files (default: report only).")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command == "compact":
+        compact_tree(args.dir, args.apply)
+        return
+    index = update_dedup_index(args.dir, rebuild=args.command == "rebuild")
+    if args.command == "pairs":
+        for score, a, b in duplicate_groups(index, args.threshold):
+            print(f"  {score:.2f}  {index['videos'][a]['file']}  ~  {index['videos'][b]['file']}")
+    size = os.path.getsize(INDEX_FILE) if os.path.exists(INDEX_FILE) else 0
+    print(f"{len(index['videos'])} signatures, {size / 1024:.0f} KB on disk.")
+
+
+if __name__ == "__main__":
+    main()
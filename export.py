@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import argparse
+
+from storage import DATA_DIR, FEED_DIR, iter_data_files, iter_feed, load_records, record_feed
+
+
+def _find_record(records, entry):
+    for position, video in enumerate(records):
+        key = video.get("video_id") or f"{entry['file']}#{position}"
+        if key == entry["key"]:
+            return video
+    return None
+
+
+def iter_changes(since=0, transcripts=False, data_dir=DATA_DIR, feed_dir=FEED_DIR):
+    """
+    Yields {"seq", "file", "video"} for every video written after cursor
+    `since`, oldest first. A video changed several times is only yielded
+    once, at its latest sequence number, with its current content.
+    """
+    latest = {}
+    for entry in iter_feed(since, feed_dir):
+        latest.pop(entry["key"], None)
+        latest[entry["key"]] = entry
+
+    loaded = {}
+    for entry in latest.values():
+        if entry["file"] not in loaded:
+            path = os.path.join(data_dir, *entry["file"].split("/"))
+            try:
+                loaded[entry["file"]] = load_records(path)
+            except (OSError, ValueError):
+                loaded[entry["file"]] = []
+        video = _find_record(loaded[entry["file"]], entry)
+        if video is None:
+            continue
+        if not transcripts:
+            video = {k: v for k, v in video.items() if k != "transcript"}
+        yield {"seq": entry["seq"], "file": entry["file"], "video": video}
+
+
+def export_ndjson(out, since=0, transcripts=False, data_dir=DATA_DIR):
+    """Writes the changes after `since` as NDJSON. Returns (records, new cursor)."""
+    count, cursor = 0, since
+    for change in iter_changes(since, transcripts, data_dir):
+        out.write(json.dumps(change, ensure_ascii=False) + "\n")
+        count, cursor = count + 1, change["seq"]
+    return count, cursor
+
+
+def seed_feed(data_dir=DATA_DIR):
+    """Adds every stored video that is not in the feed yet, in date order."""
+    added = 0
+    for file_path in iter_data_files(data_dir):
+        try:
+            added += record_feed(file_path, load_records(file_path), data_dir)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}", file=sys.stderr)
+    print(f"Added {added} videos to the change feed.", file=sys.stderr)
+
+
+def _read_cursor(path):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            value = f.read().strip()
+        return int(value) if value else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream new and changed videos as NDJSON.")
+    parser.add_argument("command", nargs="?", choices=["export", "seed"], default="export")
+    parser.add_argument("--since", type=int, help="Sequence number of the last record already synced.")
+    parser.add_argument("--cursor-file", type=str, help="Read the cursor from and store the new one in this file.")
+    parser.add_argument("--transcripts", action="store_true", help="Include full transcripts.")
+    parser.add_argument("--out", type=str, help="Output file (default: stdout).")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command == "seed":
+        seed_feed(args.dir)
+        return
+
+    since = args.since if args.since is not None else _read_cursor(args.cursor_file)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            count, cursor = export_ndjson(f, since, args.transcripts, args.dir)
+    else:
+        count, cursor = export_ndjson(sys.stdout, since, args.transcripts, args.dir)
+
+    if args.cursor_file:
+        with open(args.cursor_file, "w", encoding="utf-8") as f:
+            f.write(f"{cursor}\n")
+    print(f"Exported {count} records after cursor {since}; cursor is now {cursor}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
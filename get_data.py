@@ -2,34 +2,22 @@ import os
 import json
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from googleapiclient.discovery import build
-# Fontos: A te verziód szerint importáljuk, feltételezve, hogy a library támogatja a fetch/objektum modellt
-from youtube_transcript_api import YouTubeTranscriptApi
 from dotenv import load_dotenv
+from clients import youtube_client
+from storage import append_videos, load_id_history, save_id_history
+from topic_index import update_index
+from channels import load_channels, channel_url, resolve_channel_id, due_channels, load_poll_state, save_poll_state, mark_polled
 
 load_dotenv()
 API_KEY = os.getenv("YOUTUBE_API_KEY")
 
-CHANNELS = [
-    "https://www.youtube.com/@IvanOnTech",
-
-]
-
 HISTORY_FILE = os.path.join("data", "processed_videos.json")
 
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            try:
-                return set(json.load(f))
-            except json.JSONDecodeError:
-                return set()
-    return set()
+    return load_id_history(HISTORY_FILE)
 
 def save_history(history_set):
-    os.makedirs("data", exist_ok=True)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(history_set), f, indent=4)
+    save_id_history(HISTORY_FILE, history_set)
 
 def get_channel_id(youtube, handle_url):
     handle = handle_url.split("/")[-1]
@@ -58,6 +46,8 @@ def get_videos_and_transcripts(youtube, channel_id, processed_ids, days_back=30)
     new_data = []
 
     # 1. Instantiate the class (A te kódod alapján)
+    # Fontos: A te verziód szerint importáljuk, feltételezve, hogy a library támogatja a fetch/objektum modellt
+    from youtube_transcript_api import YouTubeTranscriptApi
     yt_api = YouTubeTranscriptApi()
 
     for item in video_items:
@@ -101,19 +91,24 @@ def main():
         print("HIBA: Nincs YOUTUBE_API_KEY!")
         return
 
-    youtube = build("youtube", "v3", developerKey=API_KEY)
+    youtube = youtube_client(API_KEY)
     processed_ids = load_history()
     original_count = len(processed_ids)
     
-    for url in CHANNELS:
+    channels = load_channels()
+    poll_state = load_poll_state()
+
+    for channel in due_channels(channels, poll_state):
+        url = channel_url(channel)
         print(f"\n--- Csatorna vizsgálata: {url} ---")
-        channel_id = get_channel_id(youtube, url)
+        channel_id = resolve_channel_id(youtube, channel, channels)
         if not channel_id: continue
         
-        channel_name = url.split("@")[-1]
+        channel_name = channel["handle"]
         
         # 14 napos visszatekintés
         videos = get_videos_and_transcripts(youtube, channel_id, processed_ids, days_back=14)
+        mark_polled(poll_state, channel)
         
         if not videos:
             print("Nincs új mentendő videó.")
@@ -129,24 +124,17 @@ def main():
             
             file_path = os.path.join(folder_path, f"{channel_name}.json")
             
-            existing_data = []
-            if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        existing_data = json.load(f)
-                    except:
-                        existing_data = []
-            
-            final_data = existing_data + video_list
+            duplicates = append_videos(file_path, video_list)
             
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(final_data, f, ensure_ascii=False, indent=4)
-            
-            print(f" >> Mentve: {file_path} ({len(video_list)} új videó)")
+            print(f" >> Mentve: {file_path} ({len(video_list) - duplicates} új videó)")
+
+    save_poll_state(poll_state)
 
     if len(processed_ids) > original_count:
         save_history(processed_ids)
         print("\nHistory frissítve.")
 
+    update_index()
+
 if __name__ == "__main__":
     main()
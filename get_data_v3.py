@@ -1,13 +1,25 @@
 import os
-import json
 import time
+import argparse
+import queue
 import logging
+import threading
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from googleapiclient.discovery import build
-from youtube_transcript_api import YouTubeTranscriptApi
 from dotenv import load_dotenv
-from openai import OpenAI
+from clients import youtube_client
+from llm import chat_json
+from storage import append_videos, load_id_history, save_id_history
+from preprocess import preprocess_transcript
+from languages import split_summaries, summarize_split, record_combined_usage, spent_tokens
+from summary_schema import checked_summary
+from dedup import find_duplicate, remember
+from transcript_quality import check_transcript, print_check, transcript_for_prompt
+from topic_index import update_index
+from runs import open_run, stage_done, stage_result, commit_stage, videos_at_stage, finish_run
+from planner import (new_budget, try_spend, new_candidate, fetch_video_details, plan_videos, recheck_group, print_plan,
+                     by_channel, load_deferred, save_deferred, SEARCH_UNITS)
+from channels import load_channels, channel_url, resolve_channel_id, due_channels, load_poll_state, save_poll_state, mark_polled, lookback_hours
 
 load_dotenv()
 
@@ -21,42 +33,28 @@ YOUTUBE_API_KEYS = [k for k in YOUTUBE_API_KEYS if k]
 
 OPENAI_API_KEY = os.getenv("OPENAI") or os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 MODEL_NAME = "gpt-4o-mini"
 
-CHANNELS = [
-    "https://www.youtube.com/@IvanOnTech",
-    "https://www.youtube.com/@alessiorastani",
-    "https://www.youtube.com/@CoinBureau",
-    "https://www.youtube.com/@coingecko",
-    "https://www.youtube.com/@DataDispatch",
-    "https://www.youtube.com/@FelixFriends",
-    "https://www.youtube.com/@TomNashTV",
-    "https://www.youtube.com/@DavidCarbutt",
-    "https://www.youtube.com/@CTOLARSSON",
-    "https://www.youtube.com/@elliotrades_official"
-]
+# How many transcripts may be fetched ahead of the summarizer (0 = serial).
+PREFETCH_DEPTH = int(os.getenv("TRANSCRIPT_PREFETCH", "2"))
 
 HISTORY_FILE = os.path.join("data", "processed_videos_v3.json")
 
+# search.list returns at most 50 items per page; a long lookback window
+# (after skipped runs) is paged through, up to this many pages.
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "4"))
+
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            try:
-                return set(json.load(f))
-            except json.JSONDecodeError:
-                return set()
-    return set()
+    return load_id_history(HISTORY_FILE)
 
 def save_history(history_set):
-    os.makedirs("data", exist_ok=True)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(history_set), f, indent=4)
+    save_id_history(HISTORY_FILE, history_set)
 
 def get_youtube_client(key_index=0):
     if key_index >= len(YOUTUBE_API_KEYS):
         return None
-    return build("youtube", "v3", developerKey=YOUTUBE_API_KEYS[key_index])
+    return youtube_client(YOUTUBE_API_KEYS[key_index])
 
 def get_channel_id(youtube, handle_url):
     handle = handle_url.split("/")[-1]
@@ -71,6 +69,8 @@ def get_channel_id(youtube, handle_url):
 
 def get_transcript(video_id):
     """Fetches transcript using youtube_transcript_api."""
+    from youtube_transcript_api import YouTubeTranscriptApi
+
     try:
         # Based on get_data.py usage if it works there
         # Regular usage is usually YouTubeTranscriptApi.get_transcript(video_id)
@@ -89,17 +89,73 @@ def get_transcript(video_id):
         # print(f"  -> Transcript Error for {video_id}: {e}")
         return None
 
+def iter_transcripts(items, prefetch=PREFETCH_DEPTH):
+    """
+    Yields (item, transcript_text) for each search item, in order.
+    A background thread fetches transcripts ahead of the consumer through a queue
+    of at most `prefetch` entries, so a slow summarizer blocks the fetcher instead
+    of piling transcripts up in memory. prefetch=0 fetches serially.
+    """
+    if prefetch <= 0:
+        for item in items:
+            yield item, get_transcript(item["id"]["videoId"])
+        return
+
+    buffer = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                try:
+                    text = get_transcript(item["id"]["videoId"])
+                except Exception:
+                    text = None
+                if not put((item, text)):
+                    return
+        finally:
+            put(done)
+
+    worker = threading.Thread(target=producer, daemon=True)
+    worker.start()
+    try:
+        while True:
+            entry = buffer.get()
+            if entry is done:
+                break
+            yield entry
+    finally:
+        stop.set()
+        worker.join(timeout=1)
+
 def summarize_transcript(title: str, transcript: str):
     """Sends the transcript to OpenAI for summarization."""
     if not OPENAI_API_KEY:
         return None
 
+    if split_summaries():
+        return summarize_split(OPENAI_API_KEY, MODEL_NAME, title, transcript)
+
+    prompt_transcript, _ = preprocess_transcript(transcript)
+
     prompt = f"""
 Analyze the following YouTube video transcript and provide a direct analysis in BOTH Hungarian (HU) and English (EN).
 Video Title: {title}
 
 Transcript:
-{transcript[:30000]}
+{prompt_transcript}
 
 STYLE GUIDELINES (MANDATORY):
 - Dive IMMEDIATELY into the facts and analysis. 
@@ -118,144 +174,315 @@ Return the result as a raw JSON object:
 }}
 """
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
-        return json.loads(content)
+        content, usage, model = chat_json(OPENAI_API_KEY, MODEL_NAME, [
+            {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+            {"role": "user", "content": prompt}
+        ])
+        record_combined_usage(model, usage, content)
+        return checked_summary(content, model=model)
     except Exception as e:
-        print(f"      OpenAI Error: {e}")
+        print(f"      LLM Error: {e}")
         return None
 
-def get_videos_and_transcripts(youtube, channel_id, processed_ids, hours_back=30):
+def search_new_videos(youtube, channel_id, processed_ids, hours_back=30, budget=None):
+    """
+    Search results of a channel that are not processed yet and not shorts,
+    paged through the whole window. Pages after the first are booked against
+    the budget, if one is given. Returns (items, quota_error, complete);
+    complete is False when the page limit or the budget cut the window short.
+    """
     since = (datetime.now(timezone.utc) - timedelta(hours=hours_back)).isoformat().replace("+00:00", "Z")
 
-    try:
-        request = youtube.search().list(
-            part="snippet",
-            channelId=channel_id,
-            publishedAfter=since,
-            maxResults=15, 
-            order="date",
-            type="video"
-        )
-        response = request.execute()
-    except Exception as e:
-        print(f"  -> YouTube API Error: {e}")
-        return [], True # Return True to indicate potential quota error
+    video_items, page_token = [], None
+    for page in range(SEARCH_MAX_PAGES):
+        if page and budget is not None and not try_spend(budget, "youtube", SEARCH_UNITS):
+            print(f"  -> YouTube budget reached after {page} result pages.")
+            break
+        try:
+            request = youtube.search().list(
+                part="snippet",
+                channelId=channel_id,
+                publishedAfter=since,
+                maxResults=SEARCH_PAGE_SIZE,
+                order="date",
+                type="video",
+                pageToken=page_token
+            )
+            response = request.execute()
+        except Exception as e:
+            print(f"  -> YouTube API Error: {e}")
+            return [], True, False # Return True to indicate potential quota error
 
-    video_items = response.get("items", [])
-    new_data = []
+        video_items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    else:
+        print(f"  -> Stopped after {SEARCH_MAX_PAGES} result pages; older videos in the window are not seen.")
 
+    candidates = []
     for item in video_items:
         video_id = item["id"]["videoId"]
         title = item["snippet"]["title"]
-        publish_raw = item["snippet"]["publishedAt"]
-        publish_date = publish_raw.split("T")[0]
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
 
         if video_id in processed_ids:
             continue
 
         if "#shorts" in title.lower():
             continue
-        
+
+        candidates.append(item)
+    return candidates, False, not page_token
+
+def get_videos_and_transcripts(youtube, channel_id, processed_ids, hours_back=30, prefetch=PREFETCH_DEPTH, expected_language=None,
+                               run=None, channel_name=None):
+    candidates, quota_error, complete = search_new_videos(youtube, channel_id, processed_ids, hours_back)
+    if quota_error:
+        return [], True, False
+    return process_items(candidates, processed_ids, prefetch, expected_language, run, channel_name), False, complete
+
+def process_items(candidates, processed_ids, prefetch=PREFETCH_DEPTH, expected_language=None, run=None, channel_name=None):
+    """Fetches transcripts for search items and summarizes them. Returns the video entries to save."""
+    new_data = []
+
+    # Transcripts for the next videos are fetched while the current one is being summarized.
+    for item, transcript_text in iter_transcripts(candidates, prefetch):
+        video_id = item["id"]["videoId"]
+        title = item["snippet"]["title"]
+        publish_raw = item["snippet"]["publishedAt"]
+        publish_date = publish_raw.split("T")[0]
+        video_url = f"https://www.youtube.com/watch?v={video_id}"
+
         print(f"Processing [{publish_date}]: {title}")
-        
-        transcript_text = get_transcript(video_id)
+
         if not transcript_text:
             print(f"  -> No transcript found. Skipping.")
             continue
 
-        print(f"  -> Summarizing with AI...")
-        summary_data = summarize_transcript(title, transcript_text)
-        
+        video_entry = {
+            "video_id": video_id,
+            "title": title,
+            "published_at": publish_raw,
+            "sort_date": publish_date,
+            "url": video_url,
+            "transcript": transcript_text
+        }
+
+        check = check_transcript(transcript_text, expected_language)
+        print_check(check)
+        video_entry["transcript_check"] = check
+        if check["action"] == "skip":
+            # Saved without a summary so the reason is on record, but not added to the history:
+            # captions are often incomplete right after upload, so the video is checked again
+            # while it is still in the channel's search window.
+            new_data.append(video_entry)
+            continue
+
+        checkpointed = stage_result(run, channel_name, video_id, "summary")
+        if checkpointed:
+            print(f"  -> Reusing the summary from run {run['id']}.")
+            summary_data = checkpointed["summary"]
+            duplicate = {"video_id": checkpointed["duplicate_of"]} if checkpointed["duplicate_of"] else None
+        else:
+            duplicate = find_duplicate(transcript_text, video_id)
+            if duplicate:
+                print(f"  -> Near-duplicate of {duplicate['video_id']} ({duplicate['similarity']:.0%}), reusing its summary.")
+                summary_data = duplicate["summary"]
+            else:
+                print(f"  -> Summarizing with AI...")
+                summary_data = summarize_transcript(title, transcript_for_prompt(transcript_text, check))
+            if summary_data:
+                commit_stage(run, channel_name, video_id, "summary",
+                             {"summary": summary_data, "duplicate_of": duplicate["video_id"] if duplicate else None})
+
         if summary_data:
-            video_entry = {
-                "video_id": video_id,
-                "title": title,
-                "published_at": publish_raw,
-                "sort_date": publish_date,
-                "url": video_url,
-                "transcript": transcript_text
-            }
             video_entry.update(summary_data)
+            if duplicate:
+                video_entry["duplicate_of"] = duplicate["video_id"]
+            else:
+                remember(video_entry)
             new_data.append(video_entry)
             processed_ids.add(video_id)
             print("  -> SUCCESS: Saved with summary.")
         else:
             print("  -> ERROR: Summary failed. Skipping save.")
             
-    return new_data, False
+    return new_data
+
+def save_videos(channel_name, videos):
+    """Appends new videos to their per-day channel files."""
+    videos_by_date = defaultdict(list)
+    for v in videos:
+        videos_by_date[v['sort_date']].append(v)
+    
+    for date_key, video_list in videos_by_date.items():
+        folder_path = os.path.join("data", date_key)
+        os.makedirs(folder_path, exist_ok=True)
+        file_path = os.path.join(folder_path, f"{channel_name}.json")
+        
+        duplicates = append_videos(file_path, video_list)
+        print(f" >> Saved: {file_path}" + (f" ({duplicates} already there, merged)" if duplicates else ""))
+
+def new_api_state():
+    """YouTube client plus the index of the API key it uses (for quota rotation)."""
+    return {"key_index": 0, "youtube": get_youtube_client(0)}
+
+def rotate_api_key(api):
+    if api["key_index"] + 1 >= len(YOUTUBE_API_KEYS):
+        return False
+    api["key_index"] += 1
+    print(f"Switching to API Key #{api['key_index'] + 1}")
+    api["youtube"] = get_youtube_client(api["key_index"])
+    return True
+
+def process_channel(api, channel, channels, poll_state, processed_ids, run=None):
+    """
+    Checks one registry channel, summarizes and saves its new videos. With a
+    run journal, every summary and save is committed as soon as it is done.
+    """
+    url = channel_url(channel)
+    print(f"\n--- Checking channel: {url} ---")
+    
+    channel_id = resolve_channel_id(api["youtube"], channel, channels)
+    
+    # Simple Quota rotation if channel_id fails or later search fails
+    if not channel_id and rotate_api_key(api):
+        channel_id = resolve_channel_id(api["youtube"], channel, channels)
+        
+    if not channel_id:
+        print(f"Could not get channel ID for {url}")
+        return []
+    
+    channel_name = channel["handle"]
+    
+    hours_back = lookback_hours(poll_state, channel, 30)
+    videos, quota_error, complete = get_videos_and_transcripts(api["youtube"], channel_id, processed_ids, hours_back=hours_back,
+                                              expected_language=channel["language"], run=run, channel_name=channel["handle"])
+    
+    if quota_error and api["key_index"] + 1 < len(YOUTUBE_API_KEYS):
+        print("Quota error.")
+        rotate_api_key(api)
+        videos, quota_error, complete = get_videos_and_transcripts(api["youtube"], channel_id, processed_ids, hours_back=hours_back,
+                                              expected_language=channel["language"], run=run, channel_name=channel["handle"])
+
+    # A failed or cut-short search keeps the old poll time, so the next window still covers the gap.
+    if complete:
+        mark_polled(poll_state, channel)
+
+    if videos:
+        save_videos(channel_name, videos)
+        for video in videos:
+            commit_stage(run, channel_name, video["video_id"], "saved")
+    commit_stage(run, channel_name, None, "done")
+    return videos
+
+def discover_channel(api, channel, channels, poll_state, processed_ids, run=None, budget=None):
+    """Search step of one channel (with key rotation). Returns its new search items, or None on failure."""
+    cached = stage_result(run, channel["handle"], None, "searched")
+    if cached is not None:
+        return [item for item in cached if item["id"]["videoId"] not in processed_ids]
+
+    url = channel_url(channel)
+    print(f"--- Checking channel: {url} ---")
+    channel_id = resolve_channel_id(api["youtube"], channel, channels)
+    if not channel_id and rotate_api_key(api):
+        channel_id = resolve_channel_id(api["youtube"], channel, channels)
+    if not channel_id:
+        print(f"Could not get channel ID for {url}")
+        return None
+
+    hours_back = lookback_hours(poll_state, channel, 30)
+    items, quota_error, complete = search_new_videos(api["youtube"], channel_id, processed_ids, hours_back, budget)
+    if quota_error and rotate_api_key(api):
+        print("Quota error.")
+        items, quota_error, complete = search_new_videos(api["youtube"], channel_id, processed_ids, hours_back, budget)
+    if quota_error:
+        return None
+
+    if complete:
+        mark_polled(poll_state, channel)
+    commit_stage(run, channel["handle"], None, "searched", items)
+    return items
+
+def collect_candidates(api, channels, poll_state, processed_ids, budget, run=None):
+    """
+    Searches every due channel (highest priority first) while the YouTube
+    budget lasts and returns all new videos as planner candidates.
+    """
+    by_handle = {c["handle"]: c for c in channels}
+    candidates = []
+    for channel in due_channels(channels, poll_state):
+        if stage_done(run, channel["handle"], None, "done"):
+            print(f"--- Skipping {channel['handle']}: done in run {run['id']} ---")
+            continue
+        searched = stage_done(run, channel["handle"], None, "searched")
+        if not searched and not try_spend(budget, "youtube", SEARCH_UNITS):
+            print(f"YouTube budget reached; {channel['handle']} and later channels wait for the next run.")
+            break
+        items = discover_channel(api, channel, channels, poll_state, processed_ids, run, budget)
+        if items is None:
+            continue
+        candidates.extend(new_candidate(item, by_handle[channel["handle"]]) for item in items)
+    save_poll_state(poll_state)
+    return candidates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch, summarize and save new videos via the YouTube Data API.")
+    parser.add_argument("--resume", action="store_true", help="Continue the newest (or --run-id) unfinished run.")
+    parser.add_argument("--run-id", type=str, help="Run ID to start or resume (default: a timestamp).")
+    args = parser.parse_args(argv)
 
-def main():
     if not YOUTUBE_API_KEYS:
         print("ERROR: YOUTUBE_API_KEY is missing!")
         return
 
+    run = open_run("v3", args.run_id, args.resume)
     processed_ids = load_history()
+    # Saved before a crash but possibly not yet in the history file.
+    processed_ids |= videos_at_stage(run, "saved")
     original_count = len(processed_ids)
     
-    current_key_index = 0
-    youtube = get_youtube_client(current_key_index)
+    api = new_api_state()
+    budget = new_budget()
 
-    for url in CHANNELS:
-        print(f"\n--- Checking channel: {url} ---")
-        
-        channel_id = get_channel_id(youtube, url)
-        
-        # Simple Quota rotation if channel_id fails or later search fails
-        if not channel_id:
-            if current_key_index + 1 < len(YOUTUBE_API_KEYS):
-                current_key_index += 1
-                print(f"Switching to API Key #{current_key_index + 1}")
-                youtube = get_youtube_client(current_key_index)
-                channel_id = get_channel_id(youtube, url)
-            
-        if not channel_id:
-            print(f"Could not get channel ID for {url}")
-            continue
-        
-        channel_name = url.split("@")[-1]
-        
-        videos, quota_error = get_videos_and_transcripts(youtube, channel_id, processed_ids, hours_back=30)
-        
-        if quota_error and current_key_index + 1 < len(YOUTUBE_API_KEYS):
-            current_key_index += 1
-            print(f"Quota error. Switching to API Key #{current_key_index + 1}")
-            youtube = get_youtube_client(current_key_index)
-            videos, _ = get_videos_and_transcripts(youtube, channel_id, processed_ids, hours_back=30)
+    channels = load_channels()
+    poll_state = load_poll_state()
+    by_handle = {c["handle"]: c for c in channels}
 
-        if not videos:
+    # Every candidate is collected first, so the budget goes to the most valuable videos
+    # across all channels instead of to whichever channels come first in the registry.
+    discovered = collect_candidates(api, channels, poll_state, processed_ids, budget, run)
+    known = {c["video_id"] for c in discovered}
+    candidates = discovered + [c for c in load_deferred(processed_ids) if c["video_id"] not in known and c["channel"] in by_handle]
+    fetch_video_details(api["youtube"], candidates, budget)
+    selected, deferred, dropped = plan_videos(candidates, budget)
+    print_plan(selected, deferred, dropped, budget)
+    save_deferred(deferred)
+    processed_ids.update(c["video_id"] for c in dropped)
+
+    tokens_at_start = spent_tokens()
+    for channel_name, group in by_channel(selected):
+        channel = by_handle[channel_name]
+        fits, over = recheck_group(group, budget, spent_tokens() - tokens_at_start)
+        deferred.extend(over)
+        if not fits:
             continue
+        print(f"\n--- {channel_name}: {len(fits)} videos ---")
+        count = len(processed_ids)
+        videos = process_items([c["item"] for c in fits], processed_ids, expected_language=channel["language"],
+                               run=run, channel_name=channel_name)
+        if videos:
+            save_videos(channel_name, videos)
+            for video in videos:
+                commit_stage(run, channel_name, video["video_id"], "saved")
+        # Committed per channel, so a crash later in the run loses nothing.
+        if len(processed_ids) > count:
+            save_history(processed_ids)
+    save_deferred(deferred)
+    for channel_name in {c["channel"] for c in discovered}:
+        commit_stage(run, channel_name, None, "done")
 
-        # Group by date and save
-        videos_by_date = defaultdict(list)
-        for v in videos:
-            videos_by_date[v['sort_date']].append(v)
-        
-        for date_key, video_list in videos_by_date.items():
-            folder_path = os.path.join("data", date_key)
-            os.makedirs(folder_path, exist_ok=True)
-            file_path = os.path.join(folder_path, f"{channel_name}.json")
-            
-            existing_data = []
-            if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        existing_data = json.load(f)
-                    except:
-                        existing_data = []
-            
-            final_data = existing_data + video_list
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(final_data, f, ensure_ascii=False, indent=4)
-            print(f" >> Saved: {file_path}")
+    save_poll_state(poll_state)
 
     if len(processed_ids) > original_count:
         save_history(processed_ids)
@@ -263,5 +490,8 @@ def main():
     else:
         print("\nHistory unchanged.")
 
+    update_index()
+    finish_run(run)
+
 if __name__ == "__main__":
     main()
@@ -1,12 +1,20 @@
 import os
-import json
 import time
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from googleapiclient.discovery import build
-from apify_client import ApifyClient
 from dotenv import load_dotenv
-from openai import OpenAI
+from clients import youtube_client, apify_client
+from llm import chat_json
+from storage import append_videos, load_json, save_json, load_id_history, save_id_history
+from preprocess import preprocess_transcript
+from languages import split_summaries, summarize_split, record_combined_usage, spent_tokens
+from summary_schema import checked_summary, required_languages
+from dedup import find_duplicate, remember
+from transcript_quality import check_transcript, print_check, stored_check, transcript_for_prompt
+from topic_index import update_index
+from channels import load_channels, channel_url, resolve_channel_id, due_channels, load_poll_state, save_poll_state, mark_polled, lookback_hours
+from planner import (new_budget, try_spend, new_candidate, fetch_video_details, plan_videos, recheck_group, print_plan,
+                     by_channel, load_deferred, save_deferred, SEARCH_UNITS, APIFY_UNITS_PER_TRANSCRIPT)
 
 import logging
 
@@ -19,37 +27,21 @@ API_KEY = os.getenv("YOUTUBE_API_KEY")
 APIFY_TOKEN = os.getenv("APIFY_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 MODEL_NAME = "gpt-4o-mini"
 
-CHANNELS = [
-    "https://www.youtube.com/@IvanOnTech",
-    "https://www.youtube.com/@alessiorastani",
-    "https://www.youtube.com/@CoinBureau",
-    "https://www.youtube.com/@coingecko",
-    "https://www.youtube.com/@DataDispatch",
-    "https://www.youtube.com/@FelixFriends",
-    "https://www.youtube.com/@TomNashTV",
-    "https://www.youtube.com/@DavidCarbutt",
-    "https://www.youtube.com/@CTOLARSSON",
-    "https://www.youtube.com/@elliotrades_official"
-]
-
 HISTORY_FILE = os.path.join("data", "processed_videos.json")
 
+# Videos this scraper deferred (its own file: it has its own history).
+DEFERRED_FILE = os.path.join("data", "deferred_videos_apify.json")
+
+# Compute units reported by the transcript actor runs of this process.
+_apify_usage = {"runs": 0, "units": 0.0}
+
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            try:
-                return set(json.load(f))
-            except json.JSONDecodeError:
-                return set()
-    return set()
+    return load_id_history(HISTORY_FILE)
 
 def save_history(history_set):
-    os.makedirs("data", exist_ok=True)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(history_set), f, indent=4)
+    save_id_history(HISTORY_FILE, history_set)
 
 def get_channel_id(youtube, handle_url):
     handle = handle_url.split("/")[-1]
@@ -65,7 +57,7 @@ def get_transcript_via_apify(video_url):
     if not APIFY_TOKEN:
         raise Exception("APIFY_TOKEN is missing in .env!")
 
-    client_apify = ApifyClient(APIFY_TOKEN)
+    client_apify = apify_client(APIFY_TOKEN)
 
     run_input = {
         "videoUrls": [video_url],
@@ -73,6 +65,8 @@ def get_transcript_via_apify(video_url):
 
     try:
         run = client_apify.actor("scrape-creators/best-youtube-transcripts-scraper").call(run_input=run_input)
+        _apify_usage["runs"] += 1
+        _apify_usage["units"] += (run.get("stats") or {}).get("computeUnits") or 0
         
         text_parts = []
         dataset_items = client_apify.dataset(run["defaultDatasetId"]).iterate_items()
@@ -102,12 +96,17 @@ def summarize_transcript(title: str, transcript: str):
         print("  -> SKIP: OPENAI_API_KEY missing.")
         return None
 
+    if split_summaries():
+        return summarize_split(OPENAI_API_KEY, MODEL_NAME, title, transcript)
+
+    prompt_transcript, _ = preprocess_transcript(transcript)
+
     prompt = f"""
 Analyze the following YouTube video transcript and provide a direct analysis in BOTH Hungarian (HU) and English (EN).
 Video Title: {title}
 
 Transcript:
-{transcript[:30000]}
+{prompt_transcript}
 
 STYLE GUIDELINES (MANDATORY):
 - Dive IMMEDIATELY into the facts and analysis. 
@@ -130,16 +129,15 @@ Return the result as a raw JSON object with the following keys:
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            content = response.choices[0].message.content
-            return json.loads(content)
+            content, usage, model = chat_json(OPENAI_API_KEY, MODEL_NAME, [
+                {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+                {"role": "user", "content": prompt}
+            ])
+            record_combined_usage(model, usage, content)
+            summary = checked_summary(content, model=model)
+            if summary is None and attempt < max_retries - 1:
+                continue  # Only malformed answers that cannot be repaired locally are re-requested.
+            return summary
         except Exception as e:
             if "429" in str(e):
                 wait_time = (2 ** attempt) * 10
@@ -150,20 +148,34 @@ Return the result as a raw JSON object with the following keys:
             break
     return None
 
-def get_videos_and_transcripts(youtube, channel_id, processed_ids, days_back=2):
+def search_videos(youtube, channel_id, days_back=2):
+    """Every search result of the window, page by page (raises on API errors)."""
     since = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat().replace("+00:00", "Z")
 
-    request = youtube.search().list(
-        part="snippet",
-        channelId=channel_id,
-        publishedAfter=since,
-        maxResults=10, 
-        order="date",
-        type="video"
-    )
-    response = request.execute()
-    video_items = response.get("items", [])
-    
+    video_items, page_token = [], None
+    while True:
+        request = youtube.search().list(
+            part="snippet",
+            channelId=channel_id,
+            publishedAfter=since,
+            maxResults=50,
+            order="date",
+            type="video",
+            pageToken=page_token
+        )
+        response = request.execute()
+        video_items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return video_items
+
+def new_items(video_items, processed_ids):
+    """Search results that are not processed yet and not shorts."""
+    return [item for item in video_items
+            if item["id"]["videoId"] not in processed_ids and "#shorts" not in item["snippet"]["title"].lower()]
+
+def process_items(video_items, processed_ids):
+    """Fetches transcripts (Apify) for search items and summarizes them. Returns the video entries to save."""
     new_data = []
 
     for item in video_items:
@@ -196,15 +208,30 @@ def get_videos_and_transcripts(youtube, channel_id, processed_ids, days_back=2):
                     "transcript": transcript_text
                 }
 
+                check = check_transcript(transcript_text)
+                print_check(check)
+                video_entry["transcript_check"] = check
+
                 # SUMMARIZATION
-                print(f"  -> Summarizing with AI...")
-                summary_data = summarize_transcript(title, transcript_text)
-                if summary_data:
-                    video_entry.update(summary_data)
-                    print("  -> SUCCESS: Summary generated.")
+                duplicate = find_duplicate(transcript_text, video_id) if check["action"] != "skip" else None
+                if check["action"] == "skip":
+                    print("  -> SKIP: Not summarized, reason recorded.")
+                elif duplicate:
+                    print(f"  -> Near-duplicate of {duplicate['video_id']} ({duplicate['similarity']:.0%}), reusing its summary.")
+                    video_entry.update(duplicate["summary"])
+                    video_entry["duplicate_of"] = duplicate["video_id"]
+                else:
+                    print(f"  -> Summarizing with AI...")
+                    summary_data = summarize_transcript(title, transcript_for_prompt(transcript_text, check))
+                    if summary_data:
+                        video_entry.update(summary_data)
+                        remember(video_entry)
+                        print("  -> SUCCESS: Summary generated.")
                 
                 new_data.append(video_entry)
-                processed_ids.add(video_id)
+                # Skipped transcripts are retried while the video is in the search window.
+                if check["action"] != "skip":
+                    processed_ids.add(video_id)
                 print("  -> SUCCESS: Transcript downloaded and summarized.")
             else:
                  print("  -> ERROR: Apify returned empty result (no transcript found?).")
@@ -239,11 +266,9 @@ def check_and_fix_summaries(days_back=10):
             modified = False
             
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    if not content.strip():
-                        continue
-                    videos = json.loads(content)
+                if os.path.getsize(file_path) == 0:
+                    continue
+                videos = load_json(file_path)
             except Exception as e:
                 print(f"  -> Error reading {file_path}: {e}")
                 continue
@@ -260,12 +285,15 @@ def check_and_fix_summaries(days_back=10):
                     continue
 
                 # Check if summary is missing
-                if "summary_hu" not in video or not video["summary_hu"]:
+                if any(not video.get(f"summary_{lang}") for lang in required_languages()):
                     transcript = video.get("transcript")
-                    
-                    if transcript:
+                    check = stored_check(video) if transcript else None
+
+                    if check and check["action"] == "skip":
+                        print(f"  -> SKIP: {title} ({check['reason']})")
+                    elif transcript:
                         print(f"  -> Missing summary for: {title} ({filename})")
-                        summary_data = summarize_transcript(title, transcript)
+                        summary_data = summarize_transcript(title, transcript_for_prompt(transcript, check))
                         if summary_data:
                             video.update(summary_data)
                             modified = True
@@ -276,8 +304,7 @@ def check_and_fix_summaries(days_back=10):
                         print(f"  -> SKIP: No transcript for {title} (cannot summarize)")
             
             if modified:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(videos, f, ensure_ascii=False, indent=4)
+                save_json(file_path, videos)
                 print(f"  -> UPDATED: {file_path}")
 
     print("--- Final summary check completed ---\n")
@@ -287,19 +314,54 @@ def main():
         print("ERROR: YOUTUBE_API_KEY is missing!")
         return
 
-    youtube = build("youtube", "v3", developerKey=API_KEY)
+    youtube = youtube_client(API_KEY)
     processed_ids = load_history()
     original_count = len(processed_ids)
+    budget = new_budget()
     
-    for url in CHANNELS:
+    channels = load_channels()
+    poll_state = load_poll_state()
+    by_handle = {c["handle"]: c for c in channels}
+
+    # Like get_data_v3.py: every candidate is collected first, so the YouTube quota, Apify
+    # compute and OpenAI tokens go to the most valuable videos across all channels.
+    discovered = []
+    for channel in due_channels(channels, poll_state):
+        url = channel_url(channel)
         print(f"\n--- Checking channel: {url} ---")
-        channel_id = get_channel_id(youtube, url)
+        channel_id = resolve_channel_id(youtube, channel, channels)
         if not channel_id: continue
-        
-        channel_name = url.split("@")[-1]
-        
-        videos = get_videos_and_transcripts(youtube, channel_id, processed_ids, days_back=2)
-        
+
+        if not try_spend(budget, "youtube", SEARCH_UNITS):
+            print(f"YouTube budget reached; {channel['handle']} and later channels wait for the next run.")
+            break
+        days_back = max(2, -(-lookback_hours(poll_state, channel, 48) // 24))
+        try:
+            video_items = search_videos(youtube, channel_id, days_back=days_back)
+        except Exception as e:
+            # Not marked as polled, so the next run searches the missed window too.
+            print(f"  -> YouTube API Error: {e}")
+            continue
+        mark_polled(poll_state, channel)
+        discovered.extend(new_candidate(item, channel, APIFY_UNITS_PER_TRANSCRIPT) for item in new_items(video_items, processed_ids))
+
+    known = {c["video_id"] for c in discovered}
+    candidates = discovered + [c for c in load_deferred(processed_ids, path=DEFERRED_FILE)
+                               if c["video_id"] not in known and c["channel"] in by_handle]
+    fetch_video_details(youtube, candidates, budget)
+    selected, deferred, dropped = plan_videos(candidates, budget)
+    print_plan(selected, deferred, dropped, budget)
+    processed_ids.update(c["video_id"] for c in dropped)
+
+    tokens_at_start = spent_tokens()
+    for channel_name, group in by_channel(selected):
+        fits, over = recheck_group(group, budget, spent_tokens() - tokens_at_start)
+        deferred.extend(over)
+        if not fits:
+            continue
+        print(f"\n--- {channel_name}: {len(fits)} videos ---")
+        videos = process_items([c["item"] for c in fits], processed_ids)
+
         if not videos:
             print("No new videos to save.")
             continue
@@ -313,18 +375,14 @@ def main():
             os.makedirs(folder_path, exist_ok=True)
             file_path = os.path.join(folder_path, f"{channel_name}.json")
             
-            existing_data = []
-            if os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    try:
-                        existing_data = json.load(f)
-                    except:
-                        existing_data = []
-            
-            final_data = existing_data + video_list
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(final_data, f, ensure_ascii=False, indent=4)
-            print(f" >> Saved: {file_path}")
+            duplicates = append_videos(file_path, video_list)
+            print(f" >> Saved: {file_path}" + (f" ({duplicates} already there, merged)" if duplicates else ""))
+
+    save_deferred(deferred, path=DEFERRED_FILE)
+    save_poll_state(poll_state)
+    if _apify_usage["runs"]:
+        print(f"\nApify: {_apify_usage['runs']} transcript runs, {_apify_usage['units']:.3f} compute units "
+              f"(planned ~{budget['spent']['apify']:.2f}).")
 
     if len(processed_ids) > original_count:
         save_history(processed_ids)
@@ -335,5 +393,7 @@ def main():
     # FINAL CHECK: Ensure everything in last 3 days has summaries
     check_and_fix_summaries(days_back=3)
 
+    update_index()
+
 if __name__ == "__main__":
     main()
@@ -1,33 +1,44 @@
 import os
 import requests
-import json
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-import yt_dlp
-from openai import OpenAI
+from clients import youtube_client
+from llm import chat_json
+from storage import load_records, save_json
+from preprocess import preprocess_transcript
+from languages import split_summaries, summarize_split, record_combined_usage
+from summary_schema import checked_summary
+from dedup import find_duplicate, remember
+from transcript_quality import check_transcript, print_check, transcript_for_prompt
+from topic_index import update_index
+from channels import load_channels, file_prefix, resolve_channel_id, due_channels, load_poll_state, save_poll_state, mark_polled, lookback_hours
 
 
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 YOUTUBE_API_KEY_2 = os.getenv("YOUTUBE_API_KEY_2")
 OPENAI_API_KEY = os.getenv("OPENAI")
-client = OpenAI(api_key=OPENAI_API_KEY)
 MODEL_NAME = "gpt-4o-mini"
 
+# search.list returns at most 50 items per page; a long lookback window
+# (after skipped polls) is paged through, up to this many pages.
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "4"))
 
-youtube_chanel_list = [{'name':'Ivan On Tech', 'id':'UCrYmtJBtLdtm2ov84ulV-yg', 'handle':'ivanontech'}, 
-                       {'name': 'Alessio Rastani', 'id':'UCnJjRjmthxPCoQaAL44tR6g', 'handle':'alessio'}
-                       ]
+# Registry handles this scraper polls (comma separated, "all" for the whole
+# registry). The nightly job has always covered these two channels; the
+# others are scraped by get_data_v3.
+YT_DATA_CHANNELS = os.getenv("YT_DATA_CHANNELS", "IvanOnTech,alessiorastani")
 
 
+def get_english_transcript(url, min_duration_minutes=5, languages=("en",)):
+    import yt_dlp
 
-def get_english_transcript(url):
     ydl_opts = {
         "skip_download": True,
         "writeautomaticsub": True,
         "writesubtitles": True,
-        "subtitleslangs": ["en"],
+        "subtitleslangs": list(languages),
         "subtitlesformat": "json3",
         "quiet": True,
         "extractor_args": {
@@ -43,15 +54,17 @@ def get_english_transcript(url):
         duration_seconds = info.get("duration", 0)
         duration_minutes = duration_seconds / 60
 
-        if duration_minutes < 5:
+        if duration_minutes < min_duration_minutes:
             return "rovid"
 
-        # először a manuális felirat
-        subtitles = info.get("subtitles", {}).get("en")
+        # először a manuális felirat, a megadott nyelvi sorrendben
+        subtitles = next((info.get("subtitles", {}).get(lang) for lang in languages
+                          if info.get("subtitles", {}).get(lang)), None)
 
         # ha nincs, akkor az automatikus
         if not subtitles:
-            subtitles = info.get("automatic_captions", {}).get("en")
+            subtitles = next((info.get("automatic_captions", {}).get(lang) for lang in languages
+                              if info.get("automatic_captions", {}).get(lang)), None)
 
         if not subtitles:
             return None
@@ -67,44 +80,46 @@ def get_english_transcript(url):
 
         return " ".join(text_parts).replace("\n", " ").strip()
 
-def get_recent_videos(channel_id, hours=120):
-    try:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-
-        since = (datetime.utcnow() - timedelta(hours=hours)).isoformat("T") + "Z"
-
+def _search_pages(api_key, channel_id, since):
+    """Every search result published after `since`, following nextPageToken. Returns (items, complete)."""
+    youtube = youtube_client(api_key)
+    items, page_token = [], None
+    for _ in range(SEARCH_MAX_PAGES):
         request = youtube.search().list(
             part="snippet",
             channelId=channel_id,
             publishedAfter=since,
-            maxResults=10,
+            maxResults=SEARCH_PAGE_SIZE,
             order="date",
-            type="video"
+            type="video",
+            pageToken=page_token
         )
         response = request.execute()
+        items.extend(response.get("items", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return items, True
+    print(f"Stopped after {SEARCH_MAX_PAGES} result pages; older videos in the window are not seen.")
+    return items, False
 
-        return response["items"]
 
-    except:
-        youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY_2)
-
-        since = (datetime.utcnow() - timedelta(hours=hours)).isoformat("T") + "Z"
-
-        request = youtube.search().list(
-            part="snippet",
-            channelId=channel_id,
-            publishedAfter=since,
-            maxResults=10,
-            order="date",
-            type="video"
-        )
-        response = request.execute()
-
-        return response["items"]
+def get_recent_videos(channel_id, hours=120):
+    """
+    Search results of the last `hours`, paged through the whole window.
+    Returns (items, complete); complete is False when the search failed on
+    both keys or hit the page limit, so the poll must not be recorded.
+    """
+    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat("T") + "Z"
+    for api_key in (YOUTUBE_API_KEY, YOUTUBE_API_KEY_2):
+        try:
+            return _search_pages(api_key, channel_id, since)
+        except Exception as e:
+            print(f"YouTube search error: {e}")
+    return [], False
 
 
 
-    youtube = build("youtube", "v3", developerKey=api_key)
+    youtube = youtube_client(api_key)
 
     request = youtube.search().list(
         part="snippet",
@@ -129,12 +144,17 @@ def summarize_transcript(title: str, transcript: str):
     if not OPENAI_API_KEY:
         return None
 
+    if split_summaries():
+        return summarize_split(OPENAI_API_KEY, MODEL_NAME, title, transcript)
+
+    prompt_transcript, _ = preprocess_transcript(transcript)
+
     prompt = f"""
     Analyze the following YouTube video transcript and provide a direct analysis in BOTH Hungarian (HU) and English (EN).
     Video Title: {title}
 
     Transcript:
-    {transcript[:30000]}
+    {prompt_transcript}
 
     STYLE GUIDELINES (MANDATORY):
     - Dive IMMEDIATELY into the facts and analysis. 
@@ -153,84 +173,134 @@ def summarize_transcript(title: str, transcript: str):
     }}
     """
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message.content
-        return json.loads(content)
+        content, usage, model = chat_json(OPENAI_API_KEY, MODEL_NAME, [
+            {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+            {"role": "user", "content": prompt}
+        ])
+        record_combined_usage(model, usage, content)
+        return checked_summary(content, model=model)
     except Exception as e:
-        print(f"      OpenAI Error: {e}")
+        print(f"      LLM Error: {e}")
         return None
 
 
 
 
-for channel in youtube_chanel_list:
-    print(channel['id'])
-    last_videos = get_recent_videos(channel['id'])  
-    # log message
-    print('\n\n\n')
-    print(f"Processing channel: {channel['name']}")
-    print(f"Total videos: {len(last_videos)}")
-
-
-    for video in last_videos:
-
-        #print(video['snippet']['title'])
-        # if short video skipp
-        if '#shorts' in video['snippet']['title']:
-            print (f"{video['snippet']['title']} shorts video I skipp!! \n")
+def already_processed(file_path):
+    """
+    True when the video's file exists, unless its transcript was skipped:
+    captions are often incomplete right after upload, so those videos are
+    fetched again while they are in the search window.
+    """
+    if not os.path.exists(file_path):
+        return False
+    try:
+        records = load_records(file_path)
+    except (OSError, ValueError):
+        return True
+    return not any((v.get('transcript_check') or {}).get('action') == 'skip' and not v.get('summary_en') for v in records)
+
+
+def selected_channels(channels, selection=YT_DATA_CHANNELS):
+    """Registry entries named in `selection` (handle or file prefix, any case)."""
+    if selection.strip().lower() == "all":
+        return channels
+    wanted = {name.strip().lower() for name in selection.split(",") if name.strip()}
+    selected = [c for c in channels if c['handle'].lower() in wanted or file_prefix(c).lower() in wanted]
+    unknown = wanted - {name.lower() for c in selected for name in (c['handle'], file_prefix(c))}
+    if unknown:
+        print(f"Not in the channel registry: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def main():
+    youtube_chanel_list = load_channels()
+    poll_state = load_poll_state()
+
+    for channel in due_channels(selected_channels(youtube_chanel_list), poll_state):
+        if not channel['id']:
+            resolve_channel_id(youtube_client(YOUTUBE_API_KEY), channel, youtube_chanel_list)
+        if not channel['id']:
+            print(f"Could not get channel ID for {channel['handle']}")
+            continue
+        print(channel['id'])
+        last_videos, complete = get_recent_videos(channel['id'], hours=lookback_hours(poll_state, channel, 120))
+        if complete:
+            mark_polled(poll_state, channel)
+        # log message
+        print('\n\n\n')
+        print(f"Processing channel: {channel['name']}")
+        print(f"Total videos: {len(last_videos)}")
+
+
+        for video in last_videos:
+
+            #print(video['snippet']['title'])
+            # if short video skipp
+            if '#shorts' in video['snippet']['title']:
+                print (f"{video['snippet']['title']} shorts video I skipp!! \n")
 
-        else:
-            #check if processed
-            os.makedirs('data', exist_ok=True)
-            os.makedirs(os.path.join('data', video['snippet']['publishedAt'].split('T')[0]), exist_ok=True)
+            else:
+                #check if processed
+                os.makedirs('data', exist_ok=True)
+                os.makedirs(os.path.join('data', video['snippet']['publishedAt'].split('T')[0]), exist_ok=True)
 
 
-            file_path = os.path.join('data', video['snippet']['publishedAt'].split('T')[0], f"{channel['handle']}_{video['id']['videoId']}.json")
+                file_path = os.path.join('data', video['snippet']['publishedAt'].split('T')[0], f"{file_prefix(channel)}_{video['id']['videoId']}.json")
 
-            if os.path.exists(file_path):
-                print(f"SKIPPING: ALREADY processed {video['snippet']['title']}")
-            else:
-                try:
-                    print('---------------------------------------------------------')
-                    print(f"Processing:  {video['snippet']['title']} with {video['id']}\n")
-                    transcript = get_english_transcript(f"https://www.youtube.com/watch?v={video['id']['videoId']}")
-
-                    if transcript and transcript!='rovid':
-                        video_json_data = {
-                            "channel_name": channel['name'],
-                            "channel_id": channel['id'],
-                            "channel_handle": channel['handle'],
-                            "video_id": video['id']['videoId'],
-                            "title": video['snippet']['title'],
-                            "published_at": video['snippet']['publishedAt'],
-                            "url": f"https://www.youtube.com/watch?v={video['id']}",
-                            "transcript": transcript,
-                            "sort_data": video['snippet']['publishedAt'].split('T')[0]
-                        }
-            
-                        print('summarize with ai')
-
-                        summary_data = summarize_transcript(video_json_data['title'], video_json_data['transcript'])
-                        video_json_data.update(summary_data)
-                        print(video_json_data)
-                        #save to file
-                        with open(file_path, 'a', encoding='utf-8') as f:
-                            json.dump(video_json_data, f, ensure_ascii=False, indent=4)
-                except Exception as e:
-                    print(f"Error: {e}")
-                    continue
-
-                        
-                    
+                if already_processed(file_path):
+                    print(f"SKIPPING: ALREADY processed {video['snippet']['title']}")
                 else:
-                    print("Transcript not available")
-                
-
-            
+                    try:
+                        print('---------------------------------------------------------')
+                        print(f"Processing:  {video['snippet']['title']} with {video['id']}\n")
+                        transcript = get_english_transcript(f"https://www.youtube.com/watch?v={video['id']['videoId']}", channel['min_duration_minutes'],
+                                                            languages=list(dict.fromkeys([channel['language'], 'en'])))
+
+                        if transcript and transcript!='rovid':
+                            video_json_data = {
+                                "channel_name": channel['name'],
+                                "channel_id": channel['id'],
+                                "channel_handle": channel['handle'],
+                                "video_id": video['id']['videoId'],
+                                "title": video['snippet']['title'],
+                                "published_at": video['snippet']['publishedAt'],
+                                "url": f"https://www.youtube.com/watch?v={video['id']['videoId']}",
+                                "transcript": transcript,
+                                "sort_date": video['snippet']['publishedAt'].split('T')[0]
+                            }
+
+                            check = check_transcript(transcript, channel['language'])
+                            print_check(check)
+                            video_json_data['transcript_check'] = check
+
+                            duplicate = find_duplicate(transcript, video['id']['videoId']) if check['action'] != 'skip' else None
+                            if check['action'] == 'skip':
+                                print('not summarized, reason recorded')
+                            elif duplicate:
+                                print(f"near-duplicate of {duplicate['video_id']} ({duplicate['similarity']:.0%}), reusing its summary")
+                                video_json_data.update(duplicate['summary'])
+                                video_json_data['duplicate_of'] = duplicate['video_id']
+                            else:
+                                print('summarize with ai')
+
+                                summary_data = summarize_transcript(video_json_data['title'], transcript_for_prompt(transcript, check))
+                                video_json_data.update(summary_data)
+                                remember(video_json_data)
+                            print(video_json_data)
+                            #save to file
+                            save_json(file_path, [video_json_data])
+                    except Exception as e:
+                        print(f"Error: {e}")
+                        continue
+
+
+
+                    else:
+                        print("Transcript not available")
+
+    save_poll_state(poll_state)
+    update_index()
+
+if __name__ == "__main__":
+    main()
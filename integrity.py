@@ -0,0 +1,283 @@
+"""
+Data-integrity scanner for the per-day files in data/.
+
+Every file is checked in parallel worker processes against the record
+schema below. Issues that can be fixed mechanically are repaired with
+--repair; the rest are reported. The scanner also writes a sha256sum-style
+checksum manifest (verify with `cd data && sha256sum -c MANIFEST.sha256`).
+
+Exit status is 1 while unrepaired errors remain, so the scan can gate the
+nightly commit.
+"""
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from storage import DATA_DIR, decompress_record, iter_data_files, merge_videos, parse_documents, save_json, write_if_changed
+from summary_schema import SUMMARY_SCHEMA, repair_video
+
+MANIFEST_FILE = os.path.join(DATA_DIR, "MANIFEST.sha256")
+
+WATCH_URL = "https://www.youtube.com/watch?v={}"
+DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+REQUIRED_FIELDS = ("video_id", "title", "published_at")
+
+# Issue kinds --repair fixes, and kinds that are only reported.
+REPAIRABLE = {
+    "concatenated": "several JSON documents in one file",
+    "dict-file": "single video dict instead of a list",
+    "sort-data": "legacy 'sort_data' key instead of 'sort_date'",
+    "missing-sort-date": "no sort_date",
+    "bad-url": "url does not match video_id",
+    "duplicate-id": "same video_id stored more than once",
+}
+ERRORS = {
+    "bad-json": "not valid JSON",
+    "not-a-record": "entry is not a video object",
+    "missing-field": "required field missing",
+    "bad-published-at": "published_at is not an ISO timestamp",
+}
+# Reported, but do not fail the scan.
+WARNINGS = {
+    "no-transcript": "no transcript stored",
+    "date-mismatch": "sort_date differs from the file's day directory",
+    "summary-fixable": "summary fixable without the LLM (review, then `cli.py repair`)",
+    "summary-invalid": "summary needs a new LLM call (`cli.py backfill`)",
+}
+
+
+def file_checksum(file_path):
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _published_day(video):
+    published = video.get("published_at")
+    if not isinstance(published, str):
+        return None
+    try:
+        datetime.fromisoformat(published.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return published.split("T")[0]
+
+
+def check_records(documents, day):
+    """
+    Validates parsed documents and returns (repaired records, issues), where
+    issues is a list of (kind, detail). The repaired list is what the file
+    should contain; it equals the input for a clean file.
+    """
+    issues = []
+    if len(documents) > 1:
+        issues.append(("concatenated", f"{len(documents)} documents"))
+
+    records = []
+    for document in documents:
+        if isinstance(document, dict):
+            issues.append(("dict-file", ""))
+            document = [document]
+        records.extend(document if isinstance(document, list) else [document])
+
+    videos = []
+    for position, video in enumerate(records):
+        if not isinstance(video, dict):
+            issues.append(("not-a-record", f"#{position}: {type(video).__name__}"))
+            continue
+        video = dict(video)
+        label = video.get("video_id") or f"#{position}"
+
+        missing = [field for field in REQUIRED_FIELDS if not video.get(field)]
+        if missing:
+            issues.append(("missing-field", f"{label}: {', '.join(missing)}"))
+        published_day = _published_day(video)
+        if video.get("published_at") and published_day is None:
+            issues.append(("bad-published-at", f"{label}: {video['published_at']!r}"))
+
+        if "sort_data" in video:
+            # Renamed in place so the key keeps its position in the file.
+            video = {("sort_date" if key == "sort_data" and "sort_date" not in video else key): value
+                     for key, value in video.items() if key != "sort_data" or "sort_date" not in video}
+            issues.append(("sort-data", label))
+        if not video.get("sort_date") and published_day:
+            video["sort_date"] = published_day
+            issues.append(("missing-sort-date", label))
+        if video.get("sort_date") and not DAY_RE.match(str(video["sort_date"])):
+            issues.append(("date-mismatch", f"{label}: {video['sort_date']!r}"))
+        elif video.get("sort_date") and DAY_RE.match(day) and video["sort_date"] != day:
+            issues.append(("date-mismatch", f"{label}: {video['sort_date']} in {day}"))
+
+        if video.get("video_id"):
+            url = WATCH_URL.format(video["video_id"])
+            if video.get("url") != url:
+                issues.append(("bad-url", f"{label}: {str(video.get('url'))[:60]}"))
+                video["url"] = url
+
+        if not video.get("transcript") and not video.get("transcript_zst"):
+            issues.append(("no-transcript", label))
+
+        if any(video.get(field) for field in SUMMARY_SCHEMA):
+            # Summary repairs change content, so they are only reported here.
+            changed, problems = repair_video(dict(video))
+            if problems:
+                issues.append(("summary-invalid", f"{label}: {'; '.join(problems)}"))
+            elif changed:
+                issues.append(("summary-fixable", label))
+        videos.append(video)
+
+    merged, duplicates = merge_videos([], videos)
+    if duplicates:
+        issues.append(("duplicate-id", f"{duplicates} merged"))
+    return merged, issues
+
+
+def scan_file(file_path):
+    """Checks one file (runs in a worker process). Never writes."""
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    result = {"path": file_path, "sha256": hashlib.sha256(raw).hexdigest(), "size": len(raw),
+              "records": 0, "issues": []}
+    try:
+        documents = parse_documents(raw.decode("utf-8"))
+    except ValueError as e:
+        result["issues"].append(("bad-json", str(e)))
+        return result
+    records, result["issues"] = check_records(documents, os.path.basename(os.path.dirname(file_path)))
+    result["records"] = len(records)
+    return result
+
+
+def repair_file(file_path):
+    """Rewrites a file with its repaired records. Returns True if it changed."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        documents = parse_documents(f.read())
+    records, _ = check_records(documents, os.path.basename(os.path.dirname(file_path)))
+    return save_json(file_path, [decompress_record(video) for video in records])
+
+
+def scan_tree(data_dir=DATA_DIR, workers=None):
+    paths = list(iter_data_files(data_dir))
+    chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scan_file, paths, chunksize=chunksize))
+
+
+def _manifest_path(file_path, data_dir):
+    return os.path.relpath(file_path, data_dir).replace(os.sep, "/")
+
+
+def read_manifest(path=MANIFEST_FILE):
+    """{relative path: sha256} from a manifest file ({} when there is none)."""
+    entries = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                checksum, _, name = line.rstrip("\n").partition("  ")
+                if name:
+                    entries[name] = checksum
+    return entries
+
+
+def write_manifest(results, data_dir=DATA_DIR, path=MANIFEST_FILE):
+    lines = sorted(f"{r['sha256']}  {_manifest_path(r['path'], data_dir)}\n" for r in results)
+    return write_if_changed(path, "".join(lines))
+
+
+def verify_manifest(results, data_dir=DATA_DIR, path=MANIFEST_FILE):
+    """
+    Compares the tree against the stored manifest. New files are expected
+    (new days); a changed or missing file is reported. Returns the number of
+    changed + missing files.
+    """
+    expected = read_manifest(path)
+    current = {_manifest_path(r["path"], data_dir): r["sha256"] for r in results}
+    changed = sorted(name for name in current if name in expected and expected[name] != current[name])
+    missing = sorted(name for name in expected if name not in current)
+    added = len(current.keys() - expected.keys())
+    for name in changed:
+        print(f"  changed: {name}")
+    for name in missing:
+        print(f"  missing: {name}")
+    print(f"Manifest: {len(current) - added - len(changed)} unchanged, {len(changed)} changed, "
+          f"{len(missing)} missing, {added} new.")
+    return len(changed) + len(missing)
+
+
+def print_issues(results, verbose=False):
+    counts = Counter()
+    for result in results:
+        for kind, detail in result["issues"]:
+            counts[kind] += 1
+            if verbose or kind not in REPAIRABLE:
+                print(f"  {result['path']}: {kind}{f' ({detail})' if detail else ''}")
+    for group, descriptions in (("repairable", REPAIRABLE), ("errors", ERRORS), ("warnings", WARNINGS)):
+        found = [(kind, counts[kind]) for kind in descriptions if counts[kind]]
+        if found:
+            print(f"{group.capitalize()}:")
+            for kind, count in found:
+                print(f"  {count:>6}  {kind}: {descriptions[kind]}")
+    return counts
+
+
+def run_scan(data_dir=DATA_DIR, repair=False, manifest=True, verify=False, workers=None, verbose=False):
+    """Scans the tree; returns the number of errors left after repairs."""
+    started = time.perf_counter()
+    results = scan_tree(data_dir, workers)
+    records = sum(r["records"] for r in results)
+    size = sum(r["size"] for r in results)
+    print(f"Scanned {len(results)} files, {records} records, {size / 1024 / 1024:.1f} MiB "
+          f"in {time.perf_counter() - started:.1f}s.")
+    counts = print_issues(results, verbose)
+
+    manifest_path = os.path.join(data_dir, os.path.basename(MANIFEST_FILE))
+    mismatches = verify_manifest(results, data_dir, manifest_path) if verify else 0
+
+    to_repair = [r for r in results if any(kind in REPAIRABLE for kind, _ in r["issues"])]
+    if repair and to_repair:
+        rewritten = 0
+        for result in to_repair:
+            try:
+                rewritten += repair_file(result["path"])
+            except Exception as e:
+                print(f"  Error repairing {result['path']}: {e}")
+                continue
+            # Errors and warnings of a repaired file stay; re-hash for the manifest.
+            result["issues"] = [(kind, detail) for kind, detail in result["issues"] if kind not in REPAIRABLE]
+            result["sha256"] = file_checksum(result["path"])
+        print(f"Repaired {rewritten} of {len(to_repair)} files.")
+    elif to_repair:
+        print(f"{len(to_repair)} files can be repaired with --repair.")
+
+    if manifest and not verify and write_manifest(results, data_dir, manifest_path):
+        print(f"Wrote {manifest_path}.")
+
+    errors = sum(1 for r in results for kind, _ in r["issues"] if kind in ERRORS)
+    unrepaired = 0 if repair else sum(counts[kind] for kind in REPAIRABLE)
+    return errors + unrepaired + mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate data/ files, repair schema drift and write a checksum manifest.")
+    parser.add_argument("--repair", action="store_true", help="Rewrite files with repairable issues.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Compare checksums with the stored manifest instead of rewriting it.")
+    parser.add_argument("--no-manifest", action="store_true", help="Do not write the manifest.")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    parser.add_argument("--verbose", action="store_true", help="List every issue, not only errors.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    problems = run_scan(args.dir, args.repair, not args.no_manifest, args.verify, args.workers, args.verbose)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
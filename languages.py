@@ -0,0 +1,344 @@
+import os
+import json
+import atexit
+import hashlib
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from llm import chat_json, Usage
+from storage import DATA_DIR, iter_data_files, load_json, save_json, write_if_changed
+from preprocess import preprocess_transcript, estimate_tokens, PROMPT_CHAR_LIMIT
+from summary_schema import SUMMARY_LANGUAGES, SUMMARY_MODE, CANONICAL_LANGUAGE, checked_summary, schema_for
+
+load_dotenv()
+
+LANGUAGE_NAMES = {"en": "English", "hu": "Hungarian", "de": "German", "es": "Spanish", "fr": "French"}
+
+# Translation is a much easier task than the analysis, so it can use a cheaper model.
+TRANSLATION_MODEL = os.getenv("TRANSLATION_MODEL", "gpt-4o-mini")
+
+# Cached translations in monthly shards data/index/translations/YYYY-MM.json
+# (new entries go to the current month), plus the legacy single file, which
+# is only read. A nightly commit then touches one small shard.
+TRANSLATION_CACHE_FILE = os.path.join(DATA_DIR, "index", "translations.json")
+TRANSLATION_CACHE_DIR = os.path.join(DATA_DIR, "index", "translations")
+
+# USD per 1M input / output tokens.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# Fixed prompt overhead used by the offline estimate (instructions + JSON keys).
+PROMPT_OVERHEAD_TOKENS = 350
+
+_usage = defaultdict(lambda: {"calls": 0, "input": 0, "output": 0, "cost": 0.0})
+# Summaries and translations are recorded from worker threads.
+_usage_lock = threading.Lock()
+_report_registered = False
+_translation_cache = None
+# Backfill and batch summarizers translate from several threads at once.
+_translation_lock = threading.Lock()
+
+
+def split_summaries():
+    """True when summaries are made one language at a time instead of hu+en in one call."""
+    return SUMMARY_MODE != "combined" or set(SUMMARY_LANGUAGES) != {"hu", "en"}
+
+
+def translation_languages():
+    return [lang for lang in SUMMARY_LANGUAGES if lang != CANONICAL_LANGUAGE]
+
+
+def token_cost(model, input_tokens, output_tokens):
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+def record_usage(language, model, usage):
+    """Adds one completion's token usage to the per-language tally printed at exit."""
+    global _report_registered
+    if usage is None:
+        return
+    cost = token_cost(model, usage.prompt_tokens, usage.completion_tokens)
+    with _usage_lock:
+        if not _report_registered:
+            atexit.register(print_cost_report)
+            _report_registered = True
+        entry = _usage[language]
+        entry["calls"] += 1
+        entry["input"] += usage.prompt_tokens
+        entry["output"] += usage.completion_tokens
+        entry["cost"] += cost
+
+
+def record_combined_usage(model, usage, content, languages=("hu", "en")):
+    """
+    Splits the usage of one call that returned several languages by each
+    language's share of the answer text (<field>_<language> keys; shared
+    fields count as English), so the per-language report stays comparable
+    with split mode. An unparseable answer is split evenly.
+    """
+    if usage is None:
+        return
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        data = None
+    sizes = dict.fromkeys(languages, 1)
+    if isinstance(data, dict):
+        for field, value in data.items():
+            language = field.rsplit("_", 1)[-1]
+            language = language if language in sizes else CANONICAL_LANGUAGE
+            if language in sizes:
+                sizes[language] += len(json.dumps(value, ensure_ascii=False))
+    total = sum(sizes.values())
+    prompt_left, completion_left = usage.prompt_tokens, usage.completion_tokens
+    for i, language in enumerate(languages):
+        if i == len(languages) - 1:
+            prompt, completion = prompt_left, completion_left
+        else:
+            prompt = round(usage.prompt_tokens * sizes[language] / total)
+            completion = round(usage.completion_tokens * sizes[language] / total)
+        prompt_left, completion_left = prompt_left - prompt, completion_left - completion
+        record_usage(language, model, Usage(prompt, completion))
+
+
+def spent_tokens():
+    """Prompt + completion tokens recorded so far in this process."""
+    with _usage_lock:
+        return sum(entry["input"] + entry["output"] for entry in _usage.values())
+
+
+def print_cost_report():
+    with _usage_lock:
+        usage = {language: dict(entry) for language, entry in _usage.items()}
+    if not usage:
+        return
+    print("\n--- LLM cost per language ---")
+    print(f"{'language':<10}{'calls':>7}{'input':>10}{'output':>10}{'USD':>10}")
+    for language, entry in sorted(usage.items()):
+        print(f"{language:<10}{entry['calls']:>7}{entry['input']:>10}{entry['output']:>10}{entry['cost']:>10.4f}")
+
+
+def summarize_english(api_key, model, title, transcript, preprocessed=False):
+    """The canonical analysis: every language-independent field plus the English texts."""
+    prompt_transcript = transcript if preprocessed else preprocess_transcript(transcript)[0]
+
+    prompt = f"""
+Analyze the following YouTube video transcript and provide a direct analysis in English.
+Video Title: {title}
+
+Transcript:
+{prompt_transcript}
+
+STYLE GUIDELINES (MANDATORY):
+- Dive IMMEDIATELY into the facts and analysis.
+- NO INTROS: Never start with "The video...", "In this video...", "This transcript...", etc.
+- TONE: You are an expert analyst.
+
+Return the result as a raw JSON object:
+{{
+  "summary_en": "8-12 sentence analytical summary in English.",
+  "crypto_sentiment": "Bullish, Bearish, or Neutral",
+  "sentiment_score": 0-100,
+  "key_points_en": ["Point 1", "Point 2", "Point 3"],
+  "main_topics": ["Topic 1", "Topic 2"]
+}}
+"""
+    try:
+        content, usage, model = chat_json(api_key, model, [
+            {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+            {"role": "user", "content": prompt}
+        ])
+        record_usage(CANONICAL_LANGUAGE, model, usage)
+        return checked_summary(content, [CANONICAL_LANGUAGE], model=model)
+    except Exception as e:
+        print(f"      LLM Error: {e}")
+        return None
+
+
+def _read_cache_file(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                pass
+    return {}
+
+
+def _shard_path():
+    return os.path.join(TRANSLATION_CACHE_DIR, datetime.now(timezone.utc).strftime("%Y-%m") + ".json")
+
+
+def _load_translation_cache():
+    """Every cached translation; call with _translation_lock held."""
+    global _translation_cache
+    if _translation_cache is None:
+        _translation_cache = _read_cache_file(TRANSLATION_CACHE_FILE)
+        if os.path.isdir(TRANSLATION_CACHE_DIR):
+            for filename in sorted(os.listdir(TRANSLATION_CACHE_DIR)):
+                if filename.endswith(".json"):
+                    _translation_cache.update(_read_cache_file(os.path.join(TRANSLATION_CACHE_DIR, filename)))
+    return _translation_cache
+
+
+def _cache_translation(key, translated):
+    """Adds one translation to the cache and the current month's shard."""
+    with _translation_lock:
+        _load_translation_cache()[key] = translated
+        os.makedirs(TRANSLATION_CACHE_DIR, exist_ok=True)
+        path = _shard_path()
+        shard = _read_cache_file(path)
+        shard[key] = translated
+        write_if_changed(path, json.dumps(shard, ensure_ascii=False, sort_keys=True, indent=1))
+
+
+def translate_summary(api_key, summary, language, model=TRANSLATION_MODEL):
+    """
+    Translates summary_en / key_points_en into `language`. Results are cached
+    by the English text, so re-uploads and re-runs translate only once.
+    """
+    source = {"summary": summary["summary_en"], "key_points": summary["key_points_en"]}
+    key = hashlib.sha1(json.dumps([language, source], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    with _translation_lock:
+        cached = _load_translation_cache().get(key)
+    if cached is not None:
+        return cached
+
+    name = LANGUAGE_NAMES.get(language, language)
+    prompt = f"""
+Translate this crypto market analysis into {name}. Keep numbers, tickers, names and the analytical tone.
+Do not add an introduction such as "The video...".
+
+{json.dumps(source, ensure_ascii=False, indent=2)}
+
+Return a raw JSON object:
+{{
+  "summary_{language}": "the summary in {name}",
+  "key_points_{language}": ["the key points in {name}"]
+}}
+"""
+    try:
+        content, usage, model = chat_json(api_key, model, [
+            {"role": "system", "content": "You are a financial translator who outputs only valid JSON."},
+            {"role": "user", "content": prompt}
+        ])
+        record_usage(language, model, usage)
+        translated = checked_summary(content, [language], shared=False)
+    except Exception as e:
+        print(f"      LLM Error: {e}")
+        return None
+    if translated is None:
+        return None
+
+    translated = {field: translated[field] for field in schema_for([language], shared=False)}
+    try:
+        _cache_translation(key, translated)
+    except OSError as e:
+        # The translation itself is fine; it is only not cached for next time.
+        print(f"      Could not cache the translation: {e}")
+    return translated
+
+
+def summarize_split(api_key, model, title, transcript, preprocessed=False):
+    """
+    English analysis plus one translation call per other configured language
+    (none in lazy mode). Returns None if any step fails, like a failed
+    combined call.
+    """
+    summary = summarize_english(api_key, model, title, transcript, preprocessed)
+    if summary is None or SUMMARY_MODE == "lazy":
+        return summary
+    for language in translation_languages():
+        print(f"  -> Translating summary to {LANGUAGE_NAMES.get(language, language)}...")
+        translated = translate_summary(api_key, summary, language)
+        if translated is None:
+            return None
+        summary.update(translated)
+    return summary
+
+
+def translate_missing(language, data_dir=DATA_DIR, since=None, api_key=None):
+    """Fills in `language` for stored videos that only have the English summary."""
+    api_key = api_key or os.getenv("OPENAI") or os.getenv("OPENAI_API_KEY")
+    translated_videos = 0
+    for file_path in iter_data_files(data_dir):
+        if since and os.path.basename(os.path.dirname(file_path)) < since:
+            continue
+        data = load_json(file_path)
+        records = data if isinstance(data, list) else [data]
+        changed = False
+        for video in records:
+            if video.get(f"summary_{language}") or not video.get("summary_en") or not video.get("key_points_en"):
+                continue
+            print(f"  Translating: {video.get('title')}")
+            translated = translate_summary(api_key, video, language)
+            if translated:
+                video.update(translated)
+                changed = True
+                translated_videos += 1
+        if changed:
+            save_json(file_path, data)
+    print(f"Translated {translated_videos} summaries to {LANGUAGE_NAMES.get(language, language)}.")
+    return translated_videos
+
+
+def estimate_costs(data_dir=DATA_DIR, model="gpt-4o-mini", translation_model=TRANSLATION_MODEL):
+    """
+    Estimated cost per language over the stored summaries, for the combined
+    hu+en call versus an English analysis plus a translation pass.
+    """
+    videos = transcript_tokens = 0
+    output_tokens = defaultdict(int)
+    for file_path in iter_data_files(data_dir):
+        try:
+            records = load_json(file_path)
+        except Exception:
+            continue
+        for video in records if isinstance(records, list) else [records]:
+            if not (video.get("summary_en") and video.get("summary_hu")):
+                continue
+            videos += 1
+            transcript_tokens += estimate_tokens((video.get("transcript") or "")[:PROMPT_CHAR_LIMIT])
+            for language in ("en", "hu"):
+                text = video[f"summary_{language}"] + " ".join(video.get(f"key_points_{language}") or [])
+                output_tokens[language] += estimate_tokens(text)
+            output_tokens["shared"] += estimate_tokens(json.dumps(video.get("main_topics") or []) + "Bearish 50")
+
+    if not videos:
+        print("No videos with both languages to estimate from.")
+        return
+    prompt_tokens = transcript_tokens + PROMPT_OVERHEAD_TOKENS * videos
+    combined = token_cost(model, prompt_tokens, output_tokens["en"] + output_tokens["hu"] + output_tokens["shared"])
+    english = token_cost(model, prompt_tokens, output_tokens["en"] + output_tokens["shared"])
+    hungarian = token_cost(translation_model, output_tokens["en"] + PROMPT_OVERHEAD_TOKENS * videos, output_tokens["hu"])
+
+    print(f"Estimate over {videos} videos ({model}, translations with {translation_model}):")
+    print(f"  combined hu+en call:        ${combined:.4f}  (${combined / videos:.5f}/video)")
+    print(f"  English analysis only:      ${english:.4f}  (${english / videos:.5f}/video)")
+    print(f"  + Hungarian translation:    ${hungarian:.4f}  (${hungarian / videos:.5f}/video)")
+    print(f"  Output tokens: en {output_tokens['en']}, hu {output_tokens['hu']}, shared {output_tokens['shared']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-language summaries: on-demand translation and cost estimate.")
+    parser.add_argument("command", choices=["translate", "estimate"])
+    parser.add_argument("--lang", type=str, default="hu", help="Target language for translate.")
+    parser.add_argument("--since", type=str, help="Only translate days from this date (YYYY-MM-DD).")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command == "translate":
+        translate_missing(args.lang, args.dir, args.since)
+    else:
+        estimate_costs(args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Summarizer backends.
+
+Every summary / translation / rollup call goes through chat_json(), which
+sends the chat messages to the active backend and returns the JSON text:
+
+  openai - the OpenAI API (default).
+  local  - an OpenAI-compatible server on this machine, e.g. llama.cpp's
+           `llama-server -m model.gguf --parallel 4 --port 8081`. Calls use
+           only the standard library.
+
+With LLM_FALLBACK=local, a run switches to the local backend for good once
+OpenAI reports that the quota or budget is exhausted, instead of stopping.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import statistics
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_state
+from clients import openai_client
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_FALLBACK = os.getenv("LLM_FALLBACK", "")
+
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8081/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local")
+# Concurrent requests sent to the local server; match its --parallel slots so
+# they are decoded in one continuous batch.
+LOCAL_LLM_PARALLEL = int(os.getenv("LOCAL_LLM_PARALLEL", "4"))
+# CPU generation of a long summary can take minutes.
+LOCAL_LLM_TIMEOUT = int(os.getenv("LOCAL_LLM_TIMEOUT", "900"))
+
+# Error texts that mean the OpenAI account can't be used any more today.
+EXHAUSTED_MARKERS = ("insufficient_quota", "billing", "budget")
+
+Usage = namedtuple("Usage", "prompt_tokens completion_tokens")
+
+
+def openai_chat(api_key, model, messages):
+    response = openai_client(api_key).chat.completions.create(
+        model=model,
+        messages=messages,
+        response_format={"type": "json_object"}
+    )
+    return response.choices[0].message.content, response.usage, model
+
+
+def local_chat(api_key, model, messages):
+    body = json.dumps({
+        "model": LOCAL_LLM_MODEL,
+        "messages": messages,
+        "response_format": {"type": "json_object"},
+        "temperature": 0.2,
+    }).encode("utf-8")
+    request = urllib.request.Request(f"{LOCAL_LLM_URL.rstrip('/')}/chat/completions", data=body,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=LOCAL_LLM_TIMEOUT) as response:
+        result = json.load(response)
+    usage = result.get("usage") or {}
+    return (result["choices"][0]["message"]["content"],
+            Usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)),
+            LOCAL_LLM_MODEL)
+
+
+BACKENDS = {"openai": openai_chat, "local": local_chat}
+
+
+def set_backend(name):
+    """Forces a backend for the rest of the process (None restores LLM_BACKEND)."""
+    if name is not None and name not in BACKENDS:
+        raise ValueError(f"unknown LLM backend {name!r} (choose from {', '.join(BACKENDS)})")
+    llm_state.override = name
+
+
+def mark_exhausted(name, reason=""):
+    """Stops using a backend for the rest of the run; later calls go to LLM_FALLBACK."""
+    with llm_state.lock:
+        if name in llm_state.exhausted:
+            return
+        llm_state.exhausted.add(name)
+    target = f"switching to the {LLM_FALLBACK} backend" if LLM_FALLBACK else "no LLM_FALLBACK configured"
+    print(f"      {name} backend exhausted{f' ({reason})' if reason else ''}, {target}.")
+
+
+def active_backend():
+    name = llm_state.override or LLM_BACKEND
+    if name in llm_state.exhausted and LLM_FALLBACK:
+        return LLM_FALLBACK
+    return name
+
+
+def concurrency():
+    """How many summaries callers may request at once from the active backend."""
+    return LOCAL_LLM_PARALLEL if active_backend() == "local" else 1
+
+
+def chat_json(api_key, model, messages):
+    """
+    Sends chat messages to the active backend in JSON mode. Returns
+    (content, usage, model actually used); usage has prompt_tokens and
+    completion_tokens like the OpenAI response.
+    """
+    name = active_backend()
+    try:
+        return BACKENDS[name](api_key, model, messages)
+    except Exception as e:
+        if LLM_FALLBACK and name != LLM_FALLBACK and any(m in str(e).lower() for m in EXHAUSTED_MARKERS):
+            mark_exhausted(name, type(e).__name__)
+            return BACKENDS[LLM_FALLBACK](api_key, model, messages)
+        raise
+
+
+def _sample_videos(data_dir, sample_size, seed):
+    from storage import iter_data_files, load_records
+
+    videos = []
+    for file_path in iter_data_files(data_dir):
+        try:
+            videos.extend(v for v in load_records(file_path) if v.get("summary_en") and v.get("transcript"))
+        except Exception:
+            continue
+    random.Random(seed).shuffle(videos)
+    return videos[:sample_size]
+
+
+def compare_backends(backends, data_dir="data", sample_size=8, workers=None, seed=0):
+    """
+    Summarizes the same sample of stored videos with each backend and prints
+    latency, throughput, schema-valid rate and agreement with the stored
+    summary.
+    """
+    from summarize_transcripts import summarize_transcript
+
+    videos = _sample_videos(data_dir, sample_size, seed)
+    if not videos:
+        print("No summarized videos with transcripts to compare on.")
+        return
+
+    def timed(video):
+        started = time.perf_counter()
+        summary = summarize_transcript(video.get("title", "Unknown"), video["transcript"])
+        return video, summary, time.perf_counter() - started
+
+    rows = []
+    for name in backends:
+        set_backend(name)
+        parallel = workers or concurrency()
+        print(f"--- {name}: {len(videos)} videos, {parallel} concurrent ---")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            results = list(pool.map(timed, videos))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(seconds for _, _, seconds in results)
+        valid = [(video, summary) for video, summary, _ in results if summary]
+        same_label = sum(1 for video, summary in valid if summary["crypto_sentiment"] == video.get("crypto_sentiment"))
+        diffs = []
+        for video, summary in valid:
+            try:
+                diffs.append(abs(float(video["sentiment_score"]) - float(summary["sentiment_score"])))
+            except (KeyError, TypeError, ValueError):
+                pass
+        rows.append((name, parallel, statistics.median(latencies), latencies[int(0.9 * (len(latencies) - 1))],
+                     60 * len(videos) / wall, len(valid), same_label, statistics.mean(diffs) if diffs else None))
+    set_backend(None)
+
+    print(f"\n{'backend':<8}{'conc':>5}{'p50 s':>8}{'p90 s':>8}{'videos/min':>12}{'valid':>7}{'same label':>12}{'|score diff|':>14}")
+    for name, parallel, p50, p90, per_minute, valid, same_label, diff in rows:
+        diff_text = f"{diff:.1f}" if diff is not None else "-"
+        print(f"{name:<8}{parallel:>5}{p50:>8.1f}{p90:>8.1f}{per_minute:>12.1f}{valid:>4}/{len(videos):<2}"
+              f"{same_label:>9}/{valid:<2}{diff_text:>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarizer backends: throughput/latency comparison on stored videos.")
+    parser.add_argument("command", choices=["compare"])
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS),
+                        help="Backend to include (repeatable, default: all).")
+    parser.add_argument("--sample", type=int, default=8, help="Number of stored videos to summarize.")
+    parser.add_argument("--workers", type=int, help="Concurrent requests (default: 1 for openai, LOCAL_LLM_PARALLEL for local).")
+    parser.add_argument("--seed", type=int, default=0, help="Sample seed.")
+    parser.add_argument("--dir", type=str, default="data", help="Data directory.")
+
+    args = parser.parse_args(argv)
+    compare_backends(args.backend or list(BACKENDS), args.dir, args.sample, args.workers, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Run-wide LLM backend state: the backend forced with llm.set_backend() and
+the backends exhausted during this run.
+
+It lives outside llm.py because `python llm.py` runs that file as
+__main__, a different module object from the `llm` the summarizers import.
+Both import this module, so they see the same state.
+"""
+import threading
+
+override = None
+exhausted = set()
+lock = threading.Lock()
@@ -0,0 +1,224 @@
+import os
+import re
+import json
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from storage import DATA_DIR, write_if_changed
+from preprocess import CHARS_PER_TOKEN, PROMPT_CHAR_LIMIT
+from languages import PROMPT_OVERHEAD_TOKENS
+
+# Per-run budgets (0 = unlimited). YouTube units cover search.list (100 per
+# channel) and videos.list (1 per 50 videos); OpenAI tokens are prompt +
+# completion tokens of the summaries; Apify compute units are spent by the
+# transcript actor of get_data_with_apify.py.
+YOUTUBE_QUOTA_BUDGET = int(os.getenv("YOUTUBE_QUOTA_BUDGET", "0"))
+OPENAI_TOKEN_BUDGET = int(os.getenv("OPENAI_TOKEN_BUDGET", "0"))
+APIFY_COMPUTE_BUDGET = float(os.getenv("APIFY_COMPUTE_BUDGET", "0"))
+
+# Estimated compute units of one transcript actor run.
+APIFY_UNITS_PER_TRANSCRIPT = float(os.getenv("APIFY_UNITS_PER_TRANSCRIPT", "0.02"))
+
+DEFERRED_FILE = os.path.join(DATA_DIR, "deferred_videos.json")
+# Deferred videos older than this are dropped instead of carried forward.
+DEFERRED_MAX_DAYS = 7
+
+SEARCH_UNITS = 100
+DETAILS_UNITS = 1
+DETAILS_BATCH = 50
+
+# Value of a video: priority weight x recency x length x reach.
+PRIORITY_WEIGHTS = {1: 1.0, 2: 0.8, 3: 0.6, 4: 0.4, 5: 0.25}
+RECENCY_HALF_LIFE_HOURS = 48
+FULL_VALUE_MINUTES = 10
+
+# Spoken transcripts run at about 150 words (200 tokens) per minute.
+TOKENS_PER_MINUTE = 200
+SUMMARY_OUTPUT_TOKENS = 600
+UNKNOWN_DURATION_MINUTES = 20
+
+DURATION_RE = re.compile(r"^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$")
+
+
+def parse_duration(value):
+    """Minutes in an ISO 8601 duration such as PT1H2M30S, or None."""
+    match = DURATION_RE.match(value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(g or 0) for g in match.groups())
+    return days * 1440 + hours * 60 + minutes + seconds / 60
+
+
+def new_budget(youtube_units=YOUTUBE_QUOTA_BUDGET, openai_tokens=OPENAI_TOKEN_BUDGET, apify_units=APIFY_COMPUTE_BUDGET):
+    return {"limits": {"youtube": youtube_units, "openai": openai_tokens, "apify": apify_units},
+            "spent": {"youtube": 0, "openai": 0, "apify": 0}}
+
+
+def remaining(budget, kind):
+    limit = budget["limits"][kind]
+    return math.inf if not limit else limit - budget["spent"][kind]
+
+
+def try_spend(budget, kind, amount):
+    """Books `amount` if it fits the budget; returns False (and books nothing) otherwise."""
+    if amount > remaining(budget, kind):
+        return False
+    budget["spent"][kind] += amount
+    return True
+
+
+def try_spend_all(budget, costs):
+    """Books every {kind: amount} in costs if all of them fit, otherwise nothing."""
+    if any(amount > remaining(budget, kind) for kind, amount in costs.items()):
+        return False
+    for kind, amount in costs.items():
+        budget["spent"][kind] += amount
+    return True
+
+
+def new_candidate(item, channel, apify_units=0):
+    """A search result as a planner candidate; apify_units is its estimated transcript cost, if any."""
+    return {
+        "video_id": item["id"]["videoId"],
+        "channel": channel["handle"],
+        "priority": channel["priority"],
+        "min_duration_minutes": channel["min_duration_minutes"],
+        "published_at": item["snippet"]["publishedAt"],
+        "item": item,
+        "duration_minutes": None,
+        "views": None,
+        "apify_units": apify_units,
+    }
+
+
+def fetch_video_details(youtube, candidates, budget):
+    """Fills in duration and view count (videos.list, 1 unit per 50 videos) where the budget allows."""
+    missing = [c for c in candidates if c["duration_minutes"] is None]
+    for start in range(0, len(missing), DETAILS_BATCH):
+        batch = missing[start:start + DETAILS_BATCH]
+        if not try_spend(budget, "youtube", DETAILS_UNITS):
+            print("YouTube budget reached, planning the rest without duration/views.")
+            return
+        try:
+            response = youtube.videos().list(
+                part="contentDetails,statistics",
+                id=",".join(c["video_id"] for c in batch),
+                maxResults=DETAILS_BATCH
+            ).execute()
+        except Exception as e:
+            print(f"  -> YouTube API Error (video details): {e}")
+            return
+        details = {item["id"]: item for item in response.get("items", [])}
+        for candidate in batch:
+            item = details.get(candidate["video_id"], {})
+            candidate["duration_minutes"] = parse_duration(item.get("contentDetails", {}).get("duration"))
+            candidate["views"] = int(item.get("statistics", {}).get("viewCount", 0))
+
+
+def estimated_tokens(candidate):
+    minutes = candidate["duration_minutes"] or UNKNOWN_DURATION_MINUTES
+    prompt = min(minutes * TOKENS_PER_MINUTE, PROMPT_CHAR_LIMIT // CHARS_PER_TOKEN)
+    return int(prompt + PROMPT_OVERHEAD_TOKENS + SUMMARY_OUTPUT_TOKENS)
+
+
+def video_value(candidate, now=None):
+    now = now or datetime.now(timezone.utc)
+    published = datetime.fromisoformat(candidate["published_at"].replace("Z", "+00:00"))
+    age_hours = max((now - published).total_seconds() / 3600, 0)
+    recency = 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+    minutes = candidate["duration_minutes"]
+    length = 1.0 if minutes is None else min(1.0, minutes / FULL_VALUE_MINUTES)
+    reach = 1 + math.log10(1 + (candidate["views"] or 0)) / 6
+    return PRIORITY_WEIGHTS.get(candidate["priority"], PRIORITY_WEIGHTS[5]) * recency * length * reach
+
+
+def plan_videos(candidates, budget, now=None):
+    """
+    Ranks candidates by value and books their estimated tokens (and Apify
+    compute, for Apify transcripts) against the budget, best first; whatever
+    doesn't fit is deferred. Videos shorter than their channel's minimum are
+    dropped. Returns (selected, deferred, dropped), each sorted by value.
+    """
+    dropped, ranked = [], []
+    for candidate in candidates:
+        minutes = candidate["duration_minutes"]
+        if minutes is not None and minutes < candidate["min_duration_minutes"]:
+            dropped.append(candidate)
+            continue
+        candidate["value"] = round(video_value(candidate, now), 4)
+        candidate["tokens"] = estimated_tokens(candidate)
+        ranked.append(candidate)
+    ranked.sort(key=lambda c: (-c["value"], c["video_id"]))
+
+    selected, deferred = [], []
+    for candidate in ranked:
+        costs = {"openai": candidate["tokens"]}
+        if candidate.get("apify_units"):
+            costs["apify"] = candidate["apify_units"]
+        (selected if try_spend_all(budget, costs) else deferred).append(candidate)
+    return selected, deferred, dropped
+
+
+def recheck_group(group, budget, spent_tokens):
+    """
+    Splits one channel's selected videos into (fits, deferred) against the
+    tokens actually spent so far in the run plus the group's own estimates,
+    since earlier estimates can be off.
+    """
+    limit = budget["limits"]["openai"]
+    fits, deferred, planned = [], [], 0
+    for candidate in group:
+        if limit and spent_tokens + planned + candidate["tokens"] > limit:
+            deferred.append(candidate)
+        else:
+            fits.append(candidate)
+            planned += candidate["tokens"]
+    return fits, deferred
+
+
+def print_plan(selected, deferred, dropped, budget):
+    print("\n--- Video plan ---")
+    print(f"{'value':>7}{'tokens':>8}{'min':>6}{'views':>9}  {'channel':<22}decision")
+    for decision, group in (("summarize", selected), ("defer", deferred)):
+        for c in group:
+            minutes = f"{c['duration_minutes']:.0f}" if c["duration_minutes"] is not None else "?"
+            print(f"{c['value']:>7.3f}{c['tokens']:>8}{minutes:>6}{c['views'] or 0:>9}  {c['channel']:<22}{decision}: {c['item']['snippet']['title'][:50]}")
+    limits = budget["limits"]
+    apify = (f", Apify ~{budget['spent']['apify']:.2f}/{limits['apify'] or 'unlimited'} CU"
+             if budget["spent"]["apify"] or limits["apify"] else "")
+    print(f"{len(selected)} to summarize, {len(deferred)} deferred, {len(dropped)} too short. "
+          f"Budget: YouTube {budget['spent']['youtube']}/{limits['youtube'] or 'unlimited'} units, "
+          f"OpenAI ~{budget['spent']['openai']}/{limits['openai'] or 'unlimited'} tokens{apify}.\n")
+
+
+def by_channel(candidates):
+    """Groups candidates per channel, channels with the most valuable video first."""
+    groups = defaultdict(list)
+    for candidate in candidates:
+        groups[candidate["channel"]].append(candidate)
+    return sorted(groups.items(), key=lambda kv: -max(c["value"] for c in kv[1]))
+
+
+def load_deferred(processed_ids=(), now=None, path=DEFERRED_FILE):
+    """Deferred candidates that are still unprocessed and recent enough."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            candidates = json.load(f)
+        except json.JSONDecodeError:
+            return []
+    now = now or datetime.now(timezone.utc)
+    fresh = []
+    for candidate in candidates:
+        published = datetime.fromisoformat(candidate["published_at"].replace("Z", "+00:00"))
+        if candidate["video_id"] not in processed_ids and (now - published).days <= DEFERRED_MAX_DAYS:
+            fresh.append(candidate)
+    return fresh
+
+
+def save_deferred(candidates, path=DEFERRED_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    candidates = sorted(candidates, key=lambda c: c["video_id"])
+    write_if_changed(path, json.dumps(candidates, ensure_ascii=False, indent=1, sort_keys=True))
@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import random
+import argparse
+
+from storage import iter_data_files, load_records
+
+# Set TRANSCRIPT_PREPROCESS=0 to send the raw caption text to the LLM.
+PREPROCESS_ENABLED = os.getenv("TRANSCRIPT_PREPROCESS", "1") != "0"
+
+# Only the first N characters of the (cleaned) transcript are sent to the model.
+PROMPT_CHAR_LIMIT = 30000
+
+# Rough OpenAI tokenizer ratio for English text.
+CHARS_PER_TOKEN = 4
+
+# Longest repeated word run (in words) that rolling auto-captions produce.
+MAX_REPEAT_WORDS = 20
+MIN_REPEAT_WORDS = 2
+
+CAPTION_TAG_RE = re.compile(r"\[[^\]]{0,40}\]|\([^)]{0,20}(?:music|applause|laughter)[^)]{0,20}\)", re.IGNORECASE)
+SPEAKER_MARK_RE = re.compile(r"(?:>>|&gt;&gt;|&gt;)")
+HTML_ENTITY_RE = re.compile(r"&(?:amp|quot|#39|nbsp);")
+FILLER_RE = re.compile(r"\b(?:u+h+|u+m+|e+r+m+|h+m+|a+h+)\b[,.]?\s*", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+
+HTML_ENTITIES = {"&amp;": "&", "&quot;": '"', "&#39;": "'", "&nbsp;": " "}
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def collapse_repeats(words):
+    """
+    Drops word runs that immediately repeat the preceding run, e.g. rolling
+    captions like "so the market is the market is down" -> "so the market is down".
+    """
+    result = []
+    lowered = []
+    for word in words:
+        result.append(word)
+        lowered.append(word.lower())
+        last = lowered[-1]
+        for size in range(MIN_REPEAT_WORDS, min(MAX_REPEAT_WORDS, len(lowered) // 2) + 1):
+            if lowered[-1 - size] != last:
+                continue
+            if lowered[-size:] == lowered[-2 * size:-size]:
+                del result[-size:]
+                del lowered[-size:]
+                break
+    return result
+
+
+def clean_transcript(text):
+    """Normalizes raw caption text before it is sent to the LLM."""
+    if not text:
+        return text
+
+    text = HTML_ENTITY_RE.sub(lambda m: HTML_ENTITIES[m.group(0)], text)
+    text = CAPTION_TAG_RE.sub(" ", text)
+    text = SPEAKER_MARK_RE.sub(" ", text)
+    text = FILLER_RE.sub(" ", text)
+    text = WHITESPACE_RE.sub(" ", text).strip()
+
+    return " ".join(collapse_repeats(text.split(" ")))
+
+
+def preprocess_transcript(text, report=True):
+    """
+    Cleans a transcript for the summarization prompt and returns
+    (prompt_text, stats). The stored transcript is never modified.
+    """
+    raw_prompt = (text or "")[:PROMPT_CHAR_LIMIT]
+    if not PREPROCESS_ENABLED or not text:
+        tokens = estimate_tokens(raw_prompt)
+        return raw_prompt, {"tokens_before": tokens, "tokens_after": tokens, "tokens_saved": 0}
+
+    cleaned = clean_transcript(text)[:PROMPT_CHAR_LIMIT]
+    stats = {
+        "tokens_before": estimate_tokens(raw_prompt),
+        "tokens_after": estimate_tokens(cleaned),
+    }
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+
+    if report:
+        print(f"  -> Preprocessed transcript: {stats['tokens_before']} -> {stats['tokens_after']} tokens (saved {stats['tokens_saved']})")
+    return cleaned, stats
+
+
+def corpus_report(data_dir):
+    """Prints how much of the stored transcript text the cleaner removes."""
+    raw_chars = clean_chars = raw_tokens = clean_tokens = videos = 0
+    for file_path in iter_data_files(data_dir):
+        try:
+            records = load_records(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        for video in records:
+            transcript = video.get("transcript") or ""
+            cleaned = clean_transcript(transcript)
+            raw_chars += len(transcript)
+            clean_chars += len(cleaned)
+            raw_tokens += estimate_tokens(transcript[:PROMPT_CHAR_LIMIT])
+            clean_tokens += estimate_tokens(cleaned[:PROMPT_CHAR_LIMIT])
+            videos += 1
+
+    if not videos:
+        print("No transcripts found.")
+        return
+
+    print(f"Videos: {videos}")
+    print(f"Transcript text: {raw_chars} -> {clean_chars} chars ({100 * (1 - clean_chars / raw_chars):.1f}% removed)")
+    print(f"Prompt tokens: {raw_tokens} -> {clean_tokens} ({(raw_tokens - clean_tokens) / videos:.0f} saved per video)")
+
+
+def compare_summaries(data_dir, sample_size, seed=0):
+    """
+    Re-summarizes a sample of already summarized videos from the cleaned
+    transcript and compares the result with the stored summary.
+    """
+    from summarize_transcripts import summarize_transcript
+
+    videos = []
+    for file_path in iter_data_files(data_dir):
+        try:
+            videos.extend(v for v in load_records(file_path) if "sentiment_score" in v and v.get("transcript"))
+        except Exception:
+            continue
+
+    random.Random(seed).shuffle(videos)
+    same_label = 0
+    score_diffs = []
+    topic_overlaps = []
+    checked = 0
+
+    for video in videos[:sample_size]:
+        summary = summarize_transcript(video.get("title", "Unknown"), video["transcript"])
+        if not summary:
+            continue
+        checked += 1
+
+        old_label = str(video.get("crypto_sentiment", "")).strip().lower()
+        new_label = str(summary.get("crypto_sentiment", "")).strip().lower()
+        same_label += old_label == new_label
+        try:
+            score_diffs.append(abs(float(video["sentiment_score"]) - float(summary.get("sentiment_score"))))
+        except (TypeError, ValueError):
+            pass
+
+        old_topics = {t.lower() for t in video.get("main_topics", [])}
+        new_topics = {t.lower() for t in summary.get("main_topics", [])}
+        if old_topics | new_topics:
+            topic_overlaps.append(len(old_topics & new_topics) / len(old_topics | new_topics))
+
+        print(f"  {video.get('video_id')}: {old_label} -> {new_label}, score {video.get('sentiment_score')} -> {summary.get('sentiment_score')}")
+
+    if not checked:
+        print("Nothing compared.")
+        return
+
+    print(f"Compared {checked} videos")
+    print(f"Same crypto_sentiment: {same_label}/{checked}")
+    if score_diffs:
+        print(f"Mean |sentiment_score diff|: {sum(score_diffs) / len(score_diffs):.1f}")
+    if topic_overlaps:
+        print(f"Mean main_topics Jaccard: {sum(topic_overlaps) / len(topic_overlaps):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcript preprocessing report.")
+    parser.add_argument("--dir", type=str, default="data", help="Data directory.")
+    parser.add_argument("--compare", type=int, default=0, help="Re-summarize N stored videos and compare with the stored summaries.")
+    parser.add_argument("--show", type=str, help="Print the cleaned transcript of a video_id.")
+
+    args = parser.parse_args(argv)
+    if args.show:
+        for file_path in iter_data_files(args.dir):
+            for video in load_records(file_path):
+                if video.get("video_id") == args.show:
+                    print(json.dumps(clean_transcript(video.get("transcript", "")), ensure_ascii=False))
+    elif args.compare:
+        compare_summaries(args.dir, args.compare)
+    else:
+        corpus_report(args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import linecache
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# Each profiled run writes into its own REPORT_DIR/<timestamp>-<name>/.
+REPORT_DIR = os.getenv("PROFILE_DIR", "reports")
+
+# Wall-clock stack sampling interval. Sampling sees time spent waiting on the
+# network too, which cProfile attributes poorly.
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Frames kept per tracemalloc allocation (more is slower).
+TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+def _stop_tracing_in_child():
+    # Forked worker processes (backfill, dedup) would otherwise keep the
+    # profiler hook and allocation tracing with nobody collecting the
+    # results, slowing them down several times.
+    sys.setprofile(None)
+    threading.setprofile(None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_stop_tracing_in_child)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of every thread (worker pools included) every
+    SAMPLE_INTERVAL seconds and counts them in the collapsed "a;b;c count"
+    format read by flamegraph.pl and speedscope. Each stack starts with its
+    thread's name.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(f"thread:{names.get(thread_id, thread_id)}")
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadProfiles:
+    """
+    cProfile only sees the thread that enabled it. While installed, every
+    thread started through `threading` gets its own profiler on its first
+    call; merged_stats() combines them with the main profiler's.
+    """
+
+    def __init__(self):
+        self.profilers = []
+        self._lock = threading.Lock()
+
+    def _start_thread_profiler(self, frame, event, arg):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()  # replaces this hook for the thread
+        except ValueError:
+            # Python 3.12+: the main profiler already covers every thread.
+            sys.setprofile(None)
+            return
+        with self._lock:
+            self.profilers.append(profiler)
+
+    def install(self):
+        threading.setprofile(self._start_thread_profiler)
+
+    def uninstall(self):
+        threading.setprofile(None)
+
+    def merged_stats(self, profiler):
+        stats = pstats.Stats(profiler)
+        with self._lock:
+            for thread_profiler in self.profilers:
+                stats.add(thread_profiler)
+        return stats
+
+
+def write_allocations(snapshot, path, peak, limit=TOP_ALLOCATIONS):
+    """Top allocation sites still alive at the end of the run, by size."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    stats = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in stats)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Allocated at exit: {total / 1024 / 1024:.1f} MiB, peak: {peak / 1024 / 1024:.1f} MiB\n\n")
+        for i, stat in enumerate(stats[:limit], 1):
+            frame = stat.traceback[0]
+            f.write(f"#{i}: {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            line = linecache.getline(frame.filename, frame.lineno).strip()
+            if line:
+                f.write(f"    {line}\n")
+
+
+def write_function_report(stats, path, limit=TOP_FUNCTIONS):
+    with open(path, "w", encoding="utf-8") as f:
+        stats.stream = f
+        stats.sort_stats("cumulative").print_stats(limit)
+        stats.sort_stats("tottime").print_stats(limit)
+
+
+@contextmanager
+def profiled(name, report_dir=REPORT_DIR):
+    """
+    Runs the block under cProfile (in every thread it starts), tracemalloc
+    and a wall-clock stack sampler, then writes into a new run directory:
+      profile.pstats  - raw cProfile data (snakeviz, pstats)
+      profile.txt     - top functions by cumulative and own time
+      stacks.folded   - sampled stacks for flamegraph.pl / speedscope
+      allocations.txt - top live allocations and the peak
+    """
+    run_dir = os.path.join(report_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{name}")
+    os.makedirs(run_dir, exist_ok=True)
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    sampler = StackSampler()
+    threads = ThreadProfiles()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    sampler.start()
+    threads.install()
+    profiler.enable()
+    try:
+        yield run_dir
+    finally:
+        profiler.disable()
+        threads.uninstall()
+        sampler.stop()
+        elapsed = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = threads.merged_stats(profiler)
+        stats.dump_stats(os.path.join(run_dir, "profile.pstats"))
+        write_function_report(stats, os.path.join(run_dir, "profile.txt"))
+        sampler.write_folded(os.path.join(run_dir, "stacks.folded"))
+        write_allocations(snapshot, os.path.join(run_dir, "allocations.txt"), peak)
+        print(f"Profile of '{name}': {elapsed:.1f}s, {len(threads.profilers) + 1} threads profiled, "
+              f"{sampler.samples} stack samples, peak {peak / 1024 / 1024:.1f} MiB traced -> {run_dir}")
@@ -0,0 +1,290 @@
+import os
+import json
+import hashlib
+import argparse
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from dotenv import load_dotenv
+
+from llm import chat_json
+from storage import DATA_DIR, iter_data_files, load_records, write_if_changed
+from preprocess import estimate_tokens
+from topic_index import video_terms
+from summary_schema import CANONICAL_LANGUAGE, checked_summary
+from languages import record_usage, token_cost
+
+load_dotenv()
+
+ROLLUP_FILE = os.path.join(DATA_DIR, "index", "rollups.json")
+
+# Rollups read short digests, not transcripts, so a small model is enough.
+ROLLUP_MODEL = os.getenv("ROLLUP_MODEL", "gpt-4o-mini")
+
+# Per video in a daily digest: the first sentence of the summary and this many key points.
+POINTS_PER_VIDEO = 3
+
+# Rough size of one weekly/monthly summary, for estimates.
+SUMMARY_TOKENS = 600
+
+LEVELS = ("week", "month")
+CHILD_LEVEL = {"week": "day", "month": "week"}
+
+
+def _hash(value):
+    return hashlib.sha1(json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _score(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_sentence(text):
+    text = (text or "").strip()
+    end = text.find(". ")
+    return text[:end + 1] if end > 0 else text
+
+
+def week_key(day):
+    """ISO week of a YYYY-MM-DD date, e.g. 2024-W07."""
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_month(key):
+    """A week belongs to the month its Thursday falls in (the ISO rule)."""
+    year, week = key.split("-W")
+    return date.fromisocalendar(int(year), int(week), 4).strftime("%Y-%m")
+
+
+def period_start(day, level):
+    """
+    First day of the week containing `day`, or for level "month" of the
+    first week of that week's month, so a period is never built from part
+    of its days.
+    """
+    monday = date.fromisoformat(day) - timedelta(days=date.fromisoformat(day).weekday())
+    if level == "month":
+        first = date.fromisoformat(week_month(week_key(monday.isoformat())) + "-01")
+        monday = first + timedelta(days=(3 - first.weekday()) % 7) - timedelta(days=3)
+    return monday.isoformat()
+
+
+def daily_digest(day, file_paths):
+    """
+    Local (no LLM) digest of one day: sentiment mix, top topics and, per
+    summarized video, the first summary sentence and a few key points.
+    """
+    items, topics = [], Counter()
+    for file_path in sorted(file_paths):
+        default_channel = os.path.splitext(os.path.basename(file_path))[0].split("_")[0]
+        try:
+            records = load_records(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        for video in records:
+            if not video.get("summary_en"):
+                continue
+            topics.update(video_terms(video))
+            items.append({
+                "channel": video.get("channel_handle") or default_channel,
+                "title": video.get("title"),
+                "sentiment": video.get("crypto_sentiment"),
+                "score": _score(video.get("sentiment_score")),
+                "summary": _first_sentence(video["summary_en"]),
+                "points": (video.get("key_points_en") or [])[:POINTS_PER_VIDEO],
+            })
+    scores = [item["score"] for item in items if item["score"] is not None]
+    return {
+        "date": day,
+        "videos": len(items),
+        "mean_sentiment": round(sum(scores) / len(scores), 1) if scores else None,
+        "sentiment": dict(Counter(item["sentiment"] for item in items if item["sentiment"])),
+        "top_topics": [term for term, _ in topics.most_common(10)],
+        "items": items,
+    }
+
+
+def render_day(digest):
+    lines = [f"{digest['date']}: {digest['videos']} videos, mean sentiment {digest['mean_sentiment']} "
+             f"{digest['sentiment']}; topics: {', '.join(digest['top_topics'])}"]
+    for item in digest["items"]:
+        lines.append(f"- [{item['channel']}] {item['title']} ({item['sentiment']} {item['score']}): "
+                     f"{item['summary']} " + " ".join(f"* {p}" for p in item["points"]))
+    return "\n".join(lines)
+
+
+def render_summary(key, summary):
+    points = "\n".join(f"- {p}" for p in summary["key_points_en"])
+    return (f"{key}: {summary['crypto_sentiment']} ({summary['sentiment_score']}); "
+            f"topics: {', '.join(summary['main_topics'])}\n{summary['summary_en']}\n{points}")
+
+
+def period_prompt(level, key, children):
+    return f"""
+Below are the {CHILD_LEVEL[level]}ly digests of crypto YouTube analysts for the {level} {key}.
+Write the {level}'s overview: the dominant narratives, how sentiment moved over the {level},
+where the analysts disagreed, and the assets and events that mattered most.
+
+STYLE GUIDELINES (MANDATORY):
+- Dive IMMEDIATELY into the facts and analysis.
+- NO INTROS: Never start with "The video...", "This week...", "In this period...", etc.
+- Only use what is in the digests.
+
+{children}
+
+Return the result as a raw JSON object:
+{{
+  "summary_en": "8-12 sentence analytical summary of the {level} in English.",
+  "crypto_sentiment": "Bullish, Bearish, or Neutral",
+  "sentiment_score": 0-100,
+  "key_points_en": ["Point 1", "Point 2", "Point 3", "Point 4", "Point 5"],
+  "main_topics": ["Topic 1", "Topic 2"]
+}}
+"""
+
+
+def summarize_period(api_key, level, key, children, model=ROLLUP_MODEL):
+    try:
+        content, usage, model = chat_json(api_key, model, [
+            {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+            {"role": "user", "content": period_prompt(level, key, children)}
+        ])
+        record_usage(f"{level} rollup", model, usage)
+        return checked_summary(content, [CANONICAL_LANGUAGE], model=model)
+    except Exception as e:
+        print(f"      LLM Error: {e}")
+        return None
+
+
+def load_rollups(path=ROLLUP_FILE):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                pass
+    return {"day": {}, "week": {}, "month": {}}
+
+
+def save_rollups(cache, path=ROLLUP_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_if_changed(path, json.dumps(cache, ensure_ascii=False, sort_keys=True, indent=1))
+
+
+def children_hash(children):
+    return _hash([[child_key, h] for child_key, h, _ in children])
+
+
+def _rollup_level(cache, level, groups, render_child, api_key, dry_run):
+    """
+    Builds every period of `level` whose children changed since its cached
+    summary. groups is {key: [(child key, child hash, child or None)]}; a
+    None child has not been summarized yet. Returns (llm calls, estimated
+    prompt tokens).
+    """
+    calls = tokens = 0
+    for key, children in sorted(groups.items()):
+        child_hash = children_hash(children)
+        cached = cache[level].get(key)
+        if cached and cached["hash"] == child_hash:
+            continue
+        missing = [child_key for child_key, _, child in children if child is None]
+        if missing and not dry_run:
+            print(f"  Skipping {level} {key}: no summary for {', '.join(missing)}.")
+            continue
+        text = "\n\n".join(render_child(child_key, child) for child_key, _, child in children if child is not None)
+        prompt_tokens = estimate_tokens(period_prompt(level, key, text)) + SUMMARY_TOKENS * len(missing)
+        calls, tokens = calls + 1, tokens + prompt_tokens
+        if dry_run:
+            print(f"  would summarize {level} {key} ({len(children)} {CHILD_LEVEL[level]}s, ~{prompt_tokens} tokens)")
+            continue
+        print(f"  Summarizing {level} {key} ({len(children)} {CHILD_LEVEL[level]}s, ~{prompt_tokens} tokens)...")
+        summary = summarize_period(api_key, level, key, text)
+        if summary is None:
+            # Left stale (or missing); retried on the next run.
+            continue
+        cache[level][key] = {"hash": child_hash, "children": [c for c, _, _ in children], "summary": summary}
+        save_rollups(cache)
+    return calls, tokens
+
+
+def build_rollups(data_dir=DATA_DIR, since=None, until_level="month", dry_run=False, api_key=None):
+    """
+    Daily digests (local) -> weekly summaries -> monthly summaries. Each
+    period is cached with the hash of its children and only re-summarized
+    when one of them changed, so a month costs about five small calls once
+    and nothing afterwards.
+    """
+    api_key = api_key or os.getenv("OPENAI") or os.getenv("OPENAI_API_KEY")
+    cache = load_rollups()
+    if since and period_start(since, until_level) != since:
+        since = period_start(since, until_level)
+        print(f"--since widened to {since}, the start of its {until_level}.")
+
+    day_files = defaultdict(list)
+    for file_path in iter_data_files(data_dir):
+        day = os.path.basename(os.path.dirname(file_path))
+        if not since or day >= since:
+            day_files[day].append(file_path)
+
+    weeks = defaultdict(list)
+    for day, file_paths in sorted(day_files.items()):
+        digest = daily_digest(day, file_paths)
+        if not digest["videos"]:
+            continue
+        cache["day"][day] = {"hash": _hash(digest), "digest": digest}
+        weeks[week_key(day)].append((day, cache["day"][day]["hash"], digest))
+    if not dry_run:
+        save_rollups(cache)
+
+    totals = _rollup_level(cache, "week", weeks, lambda _, digest: render_day(digest), api_key, dry_run)
+    if until_level == "month":
+        months = defaultdict(list)
+        for key, days in sorted(weeks.items()):
+            week = cache["week"].get(key)
+            week_hash = children_hash(days)
+            summary = week["summary"] if week and week["hash"] == week_hash else None
+            months[week_month(key)].append((key, week_hash, summary))
+        month_totals = _rollup_level(cache, "month", months, render_summary, api_key, dry_run)
+        totals = (totals[0] + month_totals[0], totals[1] + month_totals[1])
+
+    calls, tokens = totals
+    verb = "Would make" if dry_run else "Made"
+    print(f"{verb} {calls} rollup calls (~{tokens} prompt tokens, ~${token_cost(ROLLUP_MODEL, tokens, SUMMARY_TOKENS * calls):.4f}) "
+          f"over {len(day_files)} days, {len(weeks)} weeks.")
+    return calls
+
+
+def show_rollup(key):
+    level = "week" if "-W" in key else "month"
+    entry = load_rollups()[level].get(key)
+    if not entry:
+        print(f"No {level} rollup for {key} yet (run `rollups.py build`).")
+        return
+    print(render_summary(key, entry["summary"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weekly and monthly rollups built from stored summaries.")
+    parser.add_argument("command", choices=["build", "show"])
+    parser.add_argument("key", nargs="?", help="Week (2024-W07) or month (2024-02) for show.")
+    parser.add_argument("--level", choices=LEVELS, default="month", help="Highest level to build.")
+    parser.add_argument("--since", type=str, help="Only rebuild from this date (YYYY-MM-DD), widened to the start of its week or month.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which periods would be summarized.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command == "show":
+        if not args.key:
+            parser.error("show needs a week or month key")
+        show_rollup(args.key)
+    else:
+        build_rollups(args.dir, args.since, args.level, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import json
+from datetime import datetime
+
+# Same directory as the backfill checkpoints.
+RUN_DIR = "checkpoints"
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def run_path(name, run_id, run_dir=RUN_DIR):
+    return os.path.join(run_dir, f"run-{name}-{run_id}.ndjson")
+
+
+def latest_run_id(name, run_dir=RUN_DIR):
+    """ID of the newest unfinished run of `name` (finished runs are deleted), or None."""
+    prefix, suffix = f"run-{name}-", ".ndjson"
+    if not os.path.isdir(run_dir):
+        return None
+    ids = [f[len(prefix):-len(suffix)] for f in os.listdir(run_dir) if f.startswith(prefix) and f.endswith(suffix)]
+    return max(ids) if ids else None
+
+
+def _read_journal(path):
+    stages = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut off by the crash.
+                continue
+            stages[(entry["channel"], entry["video_id"], entry["stage"])] = entry.get("data")
+    return stages
+
+
+def open_run(name, run_id=None, resume=False, run_dir=RUN_DIR):
+    """
+    Starts (or with resume=True continues) a run journal: an append-only
+    NDJSON file with one line per completed (channel, video, stage). Resuming
+    without a run_id picks the newest unfinished run.
+    """
+    if resume and run_id is None:
+        run_id = latest_run_id(name, run_dir)
+        if run_id is None:
+            print(f"No unfinished '{name}' run to resume, starting a new one.")
+    run_id = run_id or new_run_id()
+    path = run_path(name, run_id, run_dir)
+    stages = _read_journal(path) if os.path.exists(path) else {}
+    if stages:
+        print(f"Resuming run {run_id}: {len(stages)} completed stages in {path}.")
+    else:
+        print(f"Run {run_id} (journal {path}).")
+    return {"name": name, "id": run_id, "path": path, "stages": stages}
+
+
+def stage_done(run, channel, video_id, stage):
+    return run is not None and (channel, video_id, stage) in run["stages"]
+
+
+def stage_result(run, channel, video_id, stage):
+    """The data committed with a stage, or None."""
+    if run is None:
+        return None
+    return run["stages"].get((channel, video_id, stage))
+
+
+def commit_stage(run, channel, video_id, stage, data=None):
+    """Durably records a completed stage before the run moves on."""
+    if run is None:
+        return
+    os.makedirs(os.path.dirname(run["path"]), exist_ok=True)
+    entry = {"channel": channel, "video_id": video_id, "stage": stage, "data": data,
+             "at": datetime.now().isoformat(timespec="seconds")}
+    with open(run["path"], "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    run["stages"][(channel, video_id, stage)] = data
+
+
+def videos_at_stage(run, stage):
+    if run is None:
+        return set()
+    return {video_id for (_, video_id, s) in run["stages"] if s == stage and video_id}
+
+
+def finish_run(run):
+    """A run that got to the end leaves nothing to resume."""
+    if run is not None and os.path.exists(run["path"]):
+        os.remove(run["path"])
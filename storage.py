@@ -0,0 +1,472 @@
+import os
+import re
+import json
+import base64
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DATA_DIR = "data"
+DICT_DIR = os.path.join(DATA_DIR, "zdict")
+CURRENT_DICT_FILE = os.path.join(DICT_DIR, "current")
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+
+# Append-only change feed: one NDJSON line per written video version, with a
+# monotonic sequence number, in monthly shards data/feed/YYYY-MM.ndjson.
+FEED_DIR = os.path.join(DATA_DIR, "feed")
+
+# Compressed records keep every summary field as plain JSON and replace
+# "transcript" with these two keys.
+COMPRESSED_KEY = "transcript_zst"
+DICT_ID_KEY = "transcript_dict"
+
+COMPRESSION_LEVEL = 19
+DICT_SIZE = 112 * 1024
+
+DATE_DIR_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_dict_cache = {}
+_feed_state = None
+_feed_lock = threading.Lock()
+
+
+def compression_enabled():
+    """Opt-in switch: TRANSCRIPT_COMPRESSION=zstd in the environment / .env."""
+    return os.getenv("TRANSCRIPT_COMPRESSION", "").lower() == "zstd"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("zstandard is not installed (pip install zstandard)")
+    return zstandard
+
+
+def _load_dict(dict_id):
+    if not dict_id:
+        return None
+    if dict_id not in _dict_cache:
+        zstd = _zstd()
+        path = os.path.join(DICT_DIR, f"{dict_id}.zdict")
+        with open(path, "rb") as f:
+            _dict_cache[dict_id] = zstd.ZstdCompressionDict(f.read())
+    return _dict_cache[dict_id]
+
+
+def current_dict_id():
+    if not os.path.exists(CURRENT_DICT_FILE):
+        return 0
+    with open(CURRENT_DICT_FILE, "r", encoding="utf-8") as f:
+        value = f.read().strip()
+    return int(value) if value else 0
+
+
+def compress_record(video):
+    """Returns a copy of the record with the transcript zstd-compressed."""
+    transcript = video.get("transcript")
+    if not isinstance(transcript, str):
+        return video
+
+    zstd = _zstd()
+    dict_id = current_dict_id()
+    zdict = _load_dict(dict_id)
+    if zdict is not None:
+        compressor = zstd.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=zdict)
+    else:
+        compressor = zstd.ZstdCompressor(level=COMPRESSION_LEVEL)
+
+    packed = compressor.compress(transcript.encode("utf-8"))
+    # Rebuilt in order, so compress + decompress leaves the file byte-identical.
+    result = {}
+    for key, value in video.items():
+        if key == "transcript":
+            result[COMPRESSED_KEY] = base64.b64encode(packed).decode("ascii")
+            result[DICT_ID_KEY] = dict_id
+        elif key not in (COMPRESSED_KEY, DICT_ID_KEY):
+            result[key] = value
+    return result
+
+
+def decompress_record(video):
+    """Returns a copy of the record with a plain "transcript" field."""
+    if not isinstance(video, dict) or COMPRESSED_KEY not in video:
+        return video
+
+    zstd = _zstd()
+    zdict = _load_dict(video.get(DICT_ID_KEY, 0))
+    if zdict is not None:
+        decompressor = zstd.ZstdDecompressor(dict_data=zdict)
+    else:
+        decompressor = zstd.ZstdDecompressor()
+
+    raw = decompressor.decompress(base64.b64decode(video[COMPRESSED_KEY]))
+    # "transcript" goes where the compressed field was, keeping the key order.
+    result = {}
+    for key, value in video.items():
+        if key == COMPRESSED_KEY:
+            result["transcript"] = raw.decode("utf-8")
+        elif key not in (DICT_ID_KEY, "transcript"):
+            result[key] = value
+    return result
+
+
+def _map_records(data, fn):
+    if isinstance(data, list):
+        return [fn(v) for v in data]
+    if isinstance(data, dict):
+        return fn(data)
+    return data
+
+
+def load_json(file_path):
+    """
+    Reads a data file (list of videos or a single video dict) and transparently
+    decompresses any compressed transcripts.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return _map_records(data, decompress_record)
+
+
+def load_records(file_path):
+    """Like load_json, but always returns a list of video dicts."""
+    data = load_json(file_path)
+    if isinstance(data, dict):
+        return [data]
+    return data if isinstance(data, list) else []
+
+
+def write_if_changed(file_path, content):
+    """
+    Writes text to a file unless the file already has exactly this content,
+    so unchanged files keep their mtime and never show up in git diffs.
+    Returns True if the file was written.
+    """
+    new_bytes = content.encode("utf-8")
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as f:
+            if hashlib.sha1(f.read()).digest() == hashlib.sha1(new_bytes).digest():
+                return False
+    with open(file_path, "wb") as f:
+        f.write(new_bytes)
+    return True
+
+
+def save_json(file_path, data, compress=None):
+    """
+    Writes a data file. Transcripts are compressed when compress=True, or when
+    compress is None and TRANSCRIPT_COMPRESSION=zstd is set.
+    Returns False when the file already had identical content.
+    """
+    if compress is None:
+        compress = compression_enabled()
+    logical = data
+
+    data = _map_records(data, decompress_record)
+    if compress:
+        data = _map_records(data, compress_record)
+
+    written = write_if_changed(file_path, json.dumps(data, ensure_ascii=False, indent=4))
+    if written:
+        record_feed(file_path, logical)
+    return written
+
+
+def merge_videos(existing, videos):
+    """
+    Merges `videos` into `existing` by video_id: a video already present is
+    updated in place, field by field, so the newer summary wins while fields
+    only the older record has are kept. Duplicates inside `existing` are
+    collapsed the same way. Records without a video_id are appended.
+    Returns (merged list, number of records merged into an earlier one).
+    """
+    merged, positions, duplicates = [], {}, 0
+    for video in list(existing) + list(videos):
+        video_id = video.get("video_id")
+        if video_id and video_id in positions:
+            merged[positions[video_id]].update(video)
+            duplicates += 1
+            continue
+        if video_id:
+            positions[video_id] = len(merged)
+        merged.append(dict(video))
+    return merged, duplicates
+
+
+def parse_documents(text):
+    """
+    The JSON documents in a file's text: normally one, more when records were
+    appended to an existing file. Raises ValueError on anything else.
+    """
+    try:
+        return [json.loads(text)]
+    except json.JSONDecodeError:
+        pass
+    decoder = json.JSONDecoder()
+    documents, position = [], 0
+    while True:
+        while position < len(text) and text[position].isspace():
+            position += 1
+        if position == len(text):
+            return documents
+        document, position = decoder.raw_decode(text, position)
+        documents.append(document)
+
+
+def append_videos(file_path, videos):
+    """
+    Adds videos to a per-day channel file, merging by video_id instead of
+    blindly appending. Files holding several concatenated JSON documents are
+    read in full; a file that can't be parsed raises instead of being
+    overwritten. Returns the number of videos that were already there.
+    """
+    existing = []
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            documents = parse_documents(f.read())
+        for document in documents:
+            existing.extend(document if isinstance(document, list) else [document])
+        existing = [decompress_record(video) for video in existing if isinstance(video, dict)]
+    merged, duplicates = merge_videos(existing, videos)
+    save_json(file_path, merged)
+    return duplicates
+
+
+def _read_id_list(file_path):
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return []
+
+
+def _history_shard_dir(history_file):
+    name = os.path.splitext(os.path.basename(history_file))[0]
+    return os.path.join(HISTORY_DIR, name)
+
+
+def load_id_history(history_file):
+    """
+    Processed video IDs: the legacy flat history file (read-only) plus its
+    monthly shards under data/history/<name>/YYYY-MM.json.
+    """
+    ids = set(_read_id_list(history_file))
+    shard_dir = _history_shard_dir(history_file)
+    if os.path.isdir(shard_dir):
+        for filename in sorted(os.listdir(shard_dir)):
+            if filename.endswith(".json"):
+                ids.update(_read_id_list(os.path.join(shard_dir, filename)))
+    return ids
+
+
+def save_id_history(history_file, ids):
+    """
+    Adds IDs that are not stored yet to the current month's shard, sorted.
+    Older shards and the legacy file are never rewritten, so each nightly
+    commit only touches one small file.
+    """
+    new_ids = set(ids) - load_id_history(history_file)
+    if not new_ids:
+        return False
+
+    shard_dir = _history_shard_dir(history_file)
+    os.makedirs(shard_dir, exist_ok=True)
+    shard_path = os.path.join(shard_dir, datetime.now(timezone.utc).strftime("%Y-%m") + ".json")
+    shard_ids = sorted(set(_read_id_list(shard_path)) | new_ids)
+    return write_if_changed(shard_path, json.dumps(shard_ids, indent=4))
+
+
+def _record_hash(video):
+    return hashlib.sha1(json.dumps(video, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _feed_key(video, rel_path, position):
+    return video.get("video_id") or f"{rel_path}#{position}"
+
+
+def iter_feed(since=0, feed_dir=FEED_DIR):
+    """
+    Yields feed entries with seq > since, oldest first. Shards are read
+    newest first and only as far back as needed.
+    """
+    if not os.path.isdir(feed_dir):
+        return
+    shards = []
+    for filename in sorted(os.listdir(feed_dir), reverse=True):
+        if not filename.endswith(".ndjson"):
+            continue
+        with open(os.path.join(feed_dir, filename), "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        shards.append(entries)
+        if entries and entries[0]["seq"] <= since:
+            break
+    for entries in reversed(shards):
+        for entry in entries:
+            if entry["seq"] > since:
+                yield entry
+
+
+@contextmanager
+def _feed_file_lock(feed_dir):
+    """
+    Exclusive lock on the feed across processes (a scraper, the daemon and
+    `export.py seed` may write at the same time). Without fcntl (Windows)
+    only threads of this process are serialized.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(feed_dir, exist_ok=True)
+    with open(os.path.join(feed_dir, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_feed_state(feed_dir):
+    """
+    The last sequence number and the hash per key, brought up to date with
+    the lines appended since the last call, by this or any other process.
+    Call with the feed lock held.
+    """
+    global _feed_state
+    if _feed_state is None or _feed_state["dir"] != feed_dir:
+        _feed_state = {"dir": feed_dir, "seq": 0, "hashes": {}, "offsets": {}}
+    state = _feed_state
+    if not os.path.isdir(feed_dir):
+        return state
+    for filename in sorted(os.listdir(feed_dir)):
+        if not filename.endswith(".ndjson"):
+            continue
+        offset = state["offsets"].get(filename, 0)
+        with open(os.path.join(feed_dir, filename), "rb") as f:
+            f.seek(offset)
+            appended = f.read()
+        complete = appended.rfind(b"\n") + 1
+        for line in appended[:complete].decode("utf-8").splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                state["seq"] = max(state["seq"], entry["seq"])
+                state["hashes"][entry["key"]] = entry["hash"]
+        state["offsets"][filename] = offset + complete
+    return state
+
+
+def record_feed(file_path, data, data_dir=DATA_DIR, feed_dir=FEED_DIR):
+    """
+    Assigns the next sequence numbers to the videos of a data file whose
+    content changed since they were last recorded. Files outside
+    data/YYYY-MM-DD/ are ignored. Returns the number of new entries.
+    """
+    rel_path = os.path.relpath(file_path, data_dir)
+    date_key = os.path.dirname(rel_path)
+    if rel_path.startswith("..") or not DATE_DIR_RE.match(date_key):
+        return 0
+    records = data if isinstance(data, list) else [data]
+
+    with _feed_lock, _feed_file_lock(feed_dir):
+        state = _load_feed_state(feed_dir)
+        lines = []
+        for position, video in enumerate(records):
+            if not isinstance(video, dict):
+                continue
+            key = _feed_key(video, rel_path, position)
+            digest = _record_hash(video)
+            if state["hashes"].get(key) == digest:
+                continue
+            state["seq"] += 1
+            state["hashes"][key] = digest
+            entry = {"seq": state["seq"], "key": key, "file": rel_path.replace(os.sep, "/"), "hash": digest}
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        if lines:
+            os.makedirs(feed_dir, exist_ok=True)
+            shard_path = os.path.join(feed_dir, datetime.now(timezone.utc).strftime("%Y-%m") + ".ndjson")
+            with open(shard_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+    return len(lines)
+
+
+def iter_data_files(data_dir=DATA_DIR):
+    """Yields every per-day JSON file (data/YYYY-MM-DD/*.json) in date order."""
+    if not os.path.exists(data_dir):
+        return
+    for date_key in sorted(os.listdir(data_dir)):
+        folder_path = os.path.join(data_dir, date_key)
+        if not DATE_DIR_RE.match(date_key) or not os.path.isdir(folder_path):
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            if filename.endswith(".json"):
+                yield os.path.join(folder_path, filename)
+
+
+def train_dictionary(data_dir=DATA_DIR, dict_size=DICT_SIZE):
+    """Trains a shared zstd dictionary on every stored transcript."""
+    zstd = _zstd()
+    samples = []
+    for file_path in iter_data_files(data_dir):
+        try:
+            for video in load_records(file_path):
+                transcript = video.get("transcript")
+                if isinstance(transcript, str) and transcript:
+                    samples.append(transcript.encode("utf-8"))
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+
+    if not samples:
+        print("No transcripts found, dictionary not trained.")
+        return 0
+
+    zdict = zstd.train_dictionary(dict_size, samples)
+    dict_id = zdict.dict_id()
+
+    os.makedirs(DICT_DIR, exist_ok=True)
+    with open(os.path.join(DICT_DIR, f"{dict_id}.zdict"), "wb") as f:
+        f.write(zdict.as_bytes())
+    with open(CURRENT_DICT_FILE, "w", encoding="utf-8") as f:
+        f.write(str(dict_id))
+
+    print(f"Trained dictionary {dict_id} on {len(samples)} transcripts.")
+    return dict_id
+
+
+def convert_tree(data_dir=DATA_DIR, compress=True):
+    """Rewrites every data file with compressed (or plain) transcripts."""
+    before = after = 0
+    for file_path in iter_data_files(data_dir):
+        try:
+            data = load_json(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        before += os.path.getsize(file_path)
+        save_json(file_path, data, compress=compress)
+        after += os.path.getsize(file_path)
+
+    print(f"Data files: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcript storage maintenance.")
+    parser.add_argument("command", choices=["train", "compress", "decompress"])
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        train_dictionary(args.dir)
+    elif args.command == "compress":
+        convert_tree(args.dir, compress=True)
+    else:
+        convert_tree(args.dir, compress=False)
+
+
+if __name__ == "__main__":
+    main()
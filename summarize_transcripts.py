@@ -1,27 +1,42 @@
 import os
-import json
 import time
 import argparse
 from typing import List, Dict
 from dotenv import load_dotenv
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from llm import chat_json, concurrency
+from storage import load_records, save_json
+from preprocess import preprocess_transcript
+from languages import split_summaries, summarize_split, record_combined_usage
+from summary_schema import checked_summary, repair_summary, repair_video
+from topic_index import update_index
+from transcript_quality import stored_check, transcript_for_prompt
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Using gpt-4o-mini as the requested "nano"-like model
 MODEL_NAME = "gpt-4o-mini"
 
-def summarize_transcript(title: str, transcript: str) -> Dict:
-    """Sends the transcript to OpenAI for summarization with direct narrative style."""
+def summarize_transcript(title: str, transcript: str, preprocessed: bool = False) -> Dict:
+    """
+    Sends the transcript to OpenAI for summarization with direct narrative
+    style. preprocessed=True means the text already went through
+    preprocess_transcript (backfill does that in its worker processes).
+    """
+    if split_summaries():
+        return summarize_split(OPENAI_API_KEY, MODEL_NAME, title, transcript, preprocessed)
+
+    prompt_transcript = transcript if preprocessed else preprocess_transcript(transcript)[0]
+
     prompt = f"""
 Analyze the following YouTube video transcript and provide a direct analysis in BOTH Hungarian (HU) and English (EN).
 Video Title: {title}
 
 Transcript:
-{transcript[:30000]}
+{prompt_transcript}
 
 STYLE GUIDELINES (MANDATORY):
 - Dive IMMEDIATELY into the facts and analysis. 
@@ -45,17 +60,16 @@ Return the result as a raw JSON object with the following keys:
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
+            content, usage, model = chat_json(OPENAI_API_KEY, MODEL_NAME, [
+                {"role": "system", "content": "You are a direct, analytical narrator who outputs only valid JSON."},
+                {"role": "user", "content": prompt}
+            ])
+
+            record_combined_usage(model, usage, content)
+            summary = checked_summary(content, model=model)
+            if summary is None and attempt < max_retries - 1:
+                continue  # Only malformed answers that cannot be repaired locally are re-requested.
+            return summary
         except Exception as e:
             if "429" in str(e):
                 wait_time = (2 ** attempt) * 10
@@ -67,11 +81,35 @@ Return the result as a raw JSON object with the following keys:
                 
     return None
 
+def needs_summary(video: Dict, force: bool = False) -> bool:
+    """
+    True when a stored video has no usable summary (or force is set).
+    Summaries that summary_schema can repair locally do not count, nor do
+    transcripts that transcript_quality routes to skip.
+    """
+    if force:
+        return True
+    _, problems = repair_summary(video)
+    return bool(problems) and stored_check(video)["action"] != "skip"
+
+def summarize_video(video: Dict):
+    summary_data = summarize_transcript(video.get('title', 'Unknown'), transcript_for_prompt(video.get('transcript', ''), stored_check(video)))
+    if concurrency() == 1:
+        time.sleep(1) # Small delay
+    return summary_data
+
 def process_directory(directory: str, force: bool):
-    """Processes all JSON files in the given directory."""
+    """
+    Processes all JSON files in the given directory. The summaries a
+    directory needs are requested as one batch, concurrently when the
+    backend allows it (see llm.concurrency).
+    """
     if not os.path.exists(directory):
         print(f"Directory {directory} does not exist.")
-        return
+        return 0
+
+    files = {}
+    pending = []
 
     for filename in os.listdir(directory):
         if filename.endswith(".json"):
@@ -79,43 +117,53 @@ def process_directory(directory: str, force: bool):
             print(f"Processing {filename}...")
             
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = load_records(file_path)
             except Exception as e:
                 print(f"  Error reading {filename}: {e}")
                 continue
             
-            updated = False
+            files[file_path] = {"data": data, "updated": False}
             for video in data:
-                # Force update to get the new narrative style and ensure sentiment_score is accurate
-                hu_summary = video.get("summary_hu", "").lower()
-                en_summary = video.get("summary_en", "").lower()
-                
-                bad_starts = ["a videó", "ez a videó", "ebben a videó", "the video", "this video", "in this video"]
-                has_bad_start = any(hu_summary.startswith(s) for s in bad_starts) or any(en_summary.startswith(s) for s in bad_starts)
-                
-                if force or "sentiment_score" not in video or has_bad_start:
+                if not force:
+                    repaired, _ = repair_video(video)
+                    if repaired:
+                        files[file_path]["updated"] = True
+                        print(f"  Repaired locally: {video.get('title')}")
+                if needs_summary(video, force):
                     print(f"  Summarizing/Refining (Narrative Style): {video['title']}")
-                    summary_data = summarize_transcript(video.get('title', 'Unknown'), video.get('transcript', ''))
-                    if summary_data:
-                        video.update(summary_data)
-                        updated = True
-                        print(f"    Successfully updated.")
-                        time.sleep(1) # Small delay
-                    else:
-                        print(f"    Failed to get summary for {video['title']}")
-            
-            if updated:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
-                print(f"  Updated {filename}")
+                    pending.append((file_path, video))
+
+    with ThreadPoolExecutor(max_workers=concurrency()) as pool:
+        summaries = pool.map(summarize_video, [video for _, video in pending])
+        for (file_path, video), summary_data in zip(pending, summaries):
+            if summary_data:
+                video.update(summary_data)
+                files[file_path]["updated"] = True
+                print(f"    Successfully updated: {video['title']}")
             else:
-                print(f"  No changes for {filename}")
+                print(f"    Failed to get summary for {video['title']}")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Summarize YouTube transcripts using OpenAI API.")
+    updated_files = 0
+    for file_path, entry in files.items():
+        filename = os.path.basename(file_path)
+        if entry["updated"]:
+            save_json(file_path, entry["data"])
+            updated_files += 1
+            print(f"  Updated {filename}")
+        else:
+            print(f"  No changes for {filename}")
+
+    return updated_files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize YouTube transcripts with the configured LLM backend.")
     parser.add_argument("--dir", type=str, required=True, help="Directory containing JSON files.")
     parser.add_argument("--force", action="store_true", help="Force overwrite existing summaries.")
     
-    args = parser.parse_args()
-    process_directory(args.dir, args.force)
+    args = parser.parse_args(argv)
+    if process_directory(args.dir, args.force):
+        update_index()
+
+
+if __name__ == "__main__":
+    main()
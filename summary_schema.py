@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import argparse
+
+from storage import DATA_DIR, iter_data_files, load_json, save_json
+
+SENTIMENTS = ("Bullish", "Bearish", "Neutral")
+
+# Languages stored for every video. The analysis itself is always English.
+SUMMARY_LANGUAGES = [lang.strip() for lang in os.getenv("SUMMARY_LANGUAGES", "hu,en").split(",") if lang.strip()]
+CANONICAL_LANGUAGE = "en"
+
+# combined: one call returns every language (hu+en only).
+# split: English analysis, then a cheaper translation call per other language.
+# lazy: English only; other languages on demand via `languages.py translate`.
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "combined")
+
+# Openings the prompt forbids ("A videó...", "The video..."), lower-cased.
+BAD_STARTS = ["a videó", "ez a videó", "ebben a videó", "the video", "this video", "in this video"]
+
+# "The video claims that X..." / "A videó szerint X..." -> "X...".
+INTRO_CLAUSE_RE = re.compile(
+    r"^(?:(?:in )?(?:the|this) video\b[^.]{0,60}?\bthat|according to (?:the|this) video,?"
+    r"|(?:a|ez a|ebben a) videó(?:ban)?\b[^.]{0,60}?(?:,? hogy|\bszerint,?))\s+",
+    re.IGNORECASE,
+)
+LIST_SPLIT_RE = re.compile(r"\n|;")
+BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def _has_bad_start(text):
+    return any(text.lower().startswith(s) for s in BAD_STARTS)
+
+
+def _capitalize(text):
+    return text[:1].upper() + text[1:]
+
+
+def strip_intro(text):
+    """
+    Removes a forbidden "The video claims that..." lead-in when a full
+    sentence follows it. Returns None for any other forbidden opening:
+    dropping whole sentences leaves summaries that start mid-thought, so
+    those go back to the model.
+    """
+    if not _has_bad_start(text):
+        return text
+    match = INTRO_CLAUSE_RE.match(text)
+    if match:
+        return _capitalize(text[match.end():])
+    return None
+
+
+def _summary_text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("missing or empty")
+    text = strip_intro(value.strip())
+    if text is None:
+        raise ValueError("starts with an intro phrase")
+    return text
+
+
+def _sentiment_label(value):
+    label = str(value or "").strip().lower()
+    if "bull" in label or label in ("positive", "optimistic"):
+        return "Bullish"
+    if "bear" in label or label in ("negative", "pessimistic"):
+        return "Bearish"
+    if label in ("neutral", "mixed", "sideways", "uncertain"):
+        return "Neutral"
+    raise ValueError(f"unknown sentiment {value!r}")
+
+
+def _score(value):
+    if isinstance(value, bool):
+        raise ValueError(f"not a score: {value!r}")
+    if isinstance(value, (int, float)):
+        score = float(value)
+    else:
+        match = NUMBER_RE.search(str(value or ""))
+        if not match:
+            raise ValueError(f"not a score: {value!r}")
+        score = float(match.group(0).replace(",", "."))
+    if not 0 <= score <= 100:
+        raise ValueError(f"score out of range: {value!r}")
+    return int(round(score))
+
+
+def _string_list(value):
+    if isinstance(value, str):
+        value = [BULLET_RE.sub("", part) for part in LIST_SPLIT_RE.split(value)]
+    if not isinstance(value, list):
+        raise ValueError(f"not a list: {type(value).__name__}")
+    items = [str(item).strip() for item in value if item is not None and str(item).strip()]
+    if not items:
+        raise ValueError("empty list")
+    return items
+
+
+# Field -> coercer. A coercer returns the repaired value or raises ValueError.
+SHARED_SCHEMA = {
+    "crypto_sentiment": _sentiment_label,
+    "sentiment_score": _score,
+    "main_topics": _string_list,
+}
+
+# Per-language fields, stored as <prefix>_<language>.
+LANGUAGE_SCHEMA = {
+    "summary": _summary_text,
+    "key_points": _string_list,
+}
+
+
+def schema_for(languages, shared=True):
+    schema = dict(SHARED_SCHEMA) if shared else {}
+    for language in languages:
+        for prefix, coerce in LANGUAGE_SCHEMA.items():
+            schema[f"{prefix}_{language}"] = coerce
+    return schema
+
+
+def required_languages():
+    """Languages every stored summary must have in the configured mode."""
+    if SUMMARY_MODE == "lazy":
+        return [CANONICAL_LANGUAGE]
+    return sorted(set(SUMMARY_LANGUAGES) | {CANONICAL_LANGUAGE})
+
+
+SUMMARY_SCHEMA = schema_for(["hu", "en"])
+
+# Video fields the read-only consumers (dashboard shards, query API) expose;
+# transcripts never leave data/.
+PUBLIC_FIELDS = [
+    "video_id", "title", "published_at", "url", "crypto_sentiment", "sentiment_score",
+    "summary_en", "summary_hu", "key_points_en", "key_points_hu", "main_topics", "summary_model",
+]
+
+
+def repair_summary(data, languages=None, shared=True):
+    """
+    Validates a summary (an LLM response or a stored video) against the
+    schema of the given languages (default: required_languages()) and
+    repairs it locally: type coercion, sentiment label normalization, intro
+    phrase stripping. Returns (repaired, problems); problems lists what
+    could not be repaired and needs a new LLM call. Other fields are kept.
+    """
+    if not isinstance(data, dict):
+        return None, ["not a JSON object"]
+
+    schema = schema_for(required_languages() if languages is None else languages, shared)
+    repaired = dict(data)
+    problems = {}
+    for field, coerce in schema.items():
+        try:
+            repaired[field] = coerce(data.get(field))
+        except ValueError as e:
+            problems[field] = f"{field}: {e}"
+
+    # The label can be recovered from the score. A missing score is never
+    # made up from the label: it feeds trends, correlation and rollups.
+    if shared and "crypto_sentiment" in problems and "sentiment_score" not in problems:
+        score = repaired["sentiment_score"]
+        repaired["crypto_sentiment"] = "Bullish" if score >= 60 else "Bearish" if score <= 40 else "Neutral"
+        del problems["crypto_sentiment"]
+
+    return repaired, list(problems.values())
+
+
+def checked_summary(content, languages=None, shared=True, model=None):
+    """
+    Parses an LLM response. Returns the repaired summary, or None (after
+    printing why) when it cannot be repaired locally. With `model`, the
+    model that wrote it is stored as summary_model.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError) as e:
+        print(f"      Invalid JSON from the model: {e}")
+        return None
+    summary, problems = repair_summary(data, languages, shared)
+    if problems:
+        print(f"      Unrepairable summary: {'; '.join(problems)}")
+        return None
+    if model:
+        summary["summary_model"] = model
+    return summary
+
+
+def repair_video(video):
+    """
+    Repairs a stored video's summary in place. Returns (changed, problems);
+    a video that was never summarized has problems and stays untouched.
+    """
+    repaired, problems = repair_summary(video)
+    if problems:
+        return False, problems
+    fields = schema_for(required_languages())
+    changed = any(video.get(field) != repaired[field] for field in fields)
+    if changed:
+        video.update({field: repaired[field] for field in fields})
+    return changed, []
+
+
+def repair_tree(data_dir=DATA_DIR, dry_run=False):
+    """Repairs every stored summary that can be fixed without the LLM."""
+    repaired = unrepairable = 0
+    for file_path in iter_data_files(data_dir):
+        try:
+            data = load_json(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        records = data if isinstance(data, list) else [data]
+        changed = 0
+        for video in records:
+            if not isinstance(video, dict) or not any(video.get(field) for field in SUMMARY_SCHEMA):
+                continue
+            video_changed, problems = repair_video(video)
+            changed += video_changed
+            if problems:
+                unrepairable += 1
+                print(f"  {file_path}: {video.get('title')}: {'; '.join(problems)}")
+        if changed and not dry_run:
+            save_json(file_path, data)
+        repaired += changed
+    print(f"Repaired {repaired} summaries locally, {unrepairable} need a new LLM call.")
+    return repaired
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and locally repair stored summaries.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report, do not rewrite files.")
+
+    args = parser.parse_args(argv)
+    repair_tree(args.dir, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import bisect
+import hashlib
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from storage import DATA_DIR, iter_data_files, load_records, write_if_changed
+
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+# Derived from data/ and rebuilt incrementally, so it is not committed (see .gitignore).
+INDEX_FILE = os.path.join(INDEX_DIR, "topics.json")
+
+# Canonical entity -> spellings seen in main_topics / key_points_en.
+ENTITY_ALIASES = {
+    "bitcoin": ["bitcoin", "btc", "bitcoins", "bitcoin's", "sats", "satoshi"],
+    "ethereum": ["ethereum", "eth", "ether", "ethereum's", "fusaka", "vitalik", "buterin"],
+    "solana": ["solana", "sol"],
+    "xrp": ["xrp", "ripple"],
+    "cardano": ["cardano", "ada"],
+    "dogecoin": ["dogecoin", "doge"],
+    "chainlink": ["chainlink"],
+    "bnb": ["bnb", "binance coin"],
+    "hyperliquid": ["hyperliquid"],
+    "stablecoins": ["stablecoin", "stablecoins", "usdt", "usdc", "tether", "genius act"],
+    "altcoins": ["altcoin", "altcoins", "alts", "altseason", "alt season"],
+    "crypto etfs": ["etf", "etfs", "spot etf", "ibit"],
+    "defi": ["defi", "decentralized finance"],
+    "regulation": ["regulation", "regulatory", "sec", "clarity act", "market structure bill"],
+    "federal reserve": ["federal reserve", "fed", "fomc", "powell", "fed chair", "interest rate", "interest rates", "rate cut", "rate cuts"],
+    "inflation": ["inflation", "cpi", "pce"],
+    "gold": ["gold", "precious metals", "metals"],
+    "silver": ["silver"],
+    "oil": ["oil", "crude", "opec"],
+    "stocks": ["stock market", "stocks", "s&p 500", "s&p", "nasdaq", "equities"],
+    "geopolitics": ["geopolitical", "geopolitics", "iran", "iranian", "israel", "middle east", "war", "tariff", "tariffs"],
+    "ai": ["ai", "artificial intelligence", "openai", "nvidia"],
+    "palantir": ["palantir", "pltr"],
+    "tesla": ["tesla", "tsla"],
+    "microstrategy": ["microstrategy", "strategy inc", "mstr", "saylor"],
+    "mining": ["mining", "miners", "hashrate", "hash rate"],
+    "liquidations": ["liquidation", "liquidations"],
+}
+
+# Words that describe *what about* a topic rather than the topic itself.
+TOPIC_MODIFIERS = {
+    "price", "prices", "analysis", "action", "movement", "movements", "dynamics", "outlook",
+    "prediction", "predictions", "performance", "trend", "trends", "update", "news", "and",
+    "the", "of", "in", "on", "for", "s", "current", "market", "status",
+}
+
+WORD_RE = re.compile(r"[a-z0-9&']+")
+
+
+def _build_alias_patterns():
+    lookup = {}
+    for entity, aliases in ENTITY_ALIASES.items():
+        lookup[entity] = entity
+        for alias in aliases:
+            lookup[alias] = entity
+    # Longest aliases first so "federal reserve" wins over "reserve".
+    ordered = sorted(lookup, key=len, reverse=True)
+    pattern = re.compile(r"(?<![a-z0-9])(" + "|".join(re.escape(a) for a in ordered) + r")(?![a-z0-9])")
+    return lookup, pattern
+
+
+ALIAS_LOOKUP, ALIAS_RE = _build_alias_patterns()
+
+
+def normalize_topic(topic):
+    """
+    Normalizes a free-text topic: lowercase, drop modifier words, and resolve
+    to a canonical entity when what remains is a known alias
+    ("BTC", "Bitcoin price analysis" -> "bitcoin").
+    """
+    words = WORD_RE.findall(str(topic).lower())
+    core = [w for w in words if w not in TOPIC_MODIFIERS]
+    key = " ".join(core) or " ".join(words)
+    return ALIAS_LOOKUP.get(key, key)
+
+
+def extract_entities(text):
+    """Returns the set of canonical entities mentioned in a piece of text."""
+    return {ALIAS_LOOKUP[m] for m in ALIAS_RE.findall(str(text).lower())}
+
+
+def video_terms(video):
+    terms = set()
+    for topic in video.get("main_topics") or []:
+        key = normalize_topic(topic)
+        if key:
+            terms.add(key)
+        terms |= extract_entities(topic)
+    for point in video.get("key_points_en") or []:
+        terms |= extract_entities(point)
+    return terms
+
+
+def _parse_score(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _file_signature(file_path):
+    # Content hash rather than mtime: a fresh git checkout must not look like a change.
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _file_postings(file_path):
+    """Returns (video_ids, [(term, posting), ...]) for one data file."""
+    date_key = os.path.basename(os.path.dirname(file_path))
+    default_channel = os.path.splitext(os.path.basename(file_path))[0]
+
+    video_ids = []
+    postings = []
+    for video in load_records(file_path):
+        if "main_topics" not in video and "key_points_en" not in video:
+            continue
+        video_id = video.get("video_id")
+        channel = video.get("channel_handle") or default_channel.split("_")[0]
+        date = video.get("sort_date") or video.get("sort_data") or date_key
+        score = _parse_score(video.get("sentiment_score"))
+        video_ids.append(video_id)
+        for term in video_terms(video):
+            postings.append((term, [date, channel, video_id, score]))
+    return video_ids, postings
+
+
+def load_index():
+    if os.path.exists(INDEX_FILE):
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                pass
+    return {"files": {}, "postings": {}}
+
+
+def save_index(index):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    for term in index["postings"]:
+        index["postings"][term].sort(key=lambda p: (p[0], p[1], p[2] or ""))
+    write_if_changed(INDEX_FILE, json.dumps(index, ensure_ascii=False, sort_keys=True, separators=(",", ":")))
+
+
+def _safe_file_postings(file_path):
+    try:
+        return _file_postings(file_path)
+    except Exception as e:
+        print(f"  Error indexing {file_path}: {e}")
+        return None
+
+
+def update_index(data_dir=DATA_DIR, rebuild=False, map_fn=map):
+    """
+    Brings the topic index up to date. Only data files whose content changed
+    since the last run are re-parsed. map_fn can be a process pool's
+    map to parse the changed files in parallel.
+    """
+    index = {"files": {}, "postings": {}} if rebuild else load_index()
+    files = index["files"]
+    postings = defaultdict(list, index["postings"])
+
+    current = {}
+    for file_path in iter_data_files(data_dir):
+        current[os.path.relpath(file_path, data_dir)] = file_path
+
+    changed = [rel for rel, path in current.items()
+               if rel not in files or files[rel]["sig"] != _file_signature(path)]
+    removed = [rel for rel in files if rel not in current]
+
+    stale_ids = set()
+    for rel in changed + removed:
+        if rel in files:
+            stale_ids.update(files[rel]["videos"])
+    if stale_ids:
+        for term in list(postings):
+            postings[term] = [p for p in postings[term] if p[2] not in stale_ids]
+            if not postings[term]:
+                del postings[term]
+    for rel in removed:
+        del files[rel]
+
+    for rel, result in zip(changed, map_fn(_safe_file_postings, [current[rel] for rel in changed])):
+        if result is None:
+            continue
+        video_ids, file_postings = result
+        files[rel] = {"sig": _file_signature(current[rel]), "videos": video_ids}
+        for term, posting in file_postings:
+            postings[term].append(posting)
+
+    index["postings"] = dict(postings)
+    if changed or removed or rebuild:
+        save_index(index)
+        print(f"Topic index updated: {len(changed)} changed, {len(removed)} removed files.")
+    return index
+
+
+def resolve_query(query):
+    """Maps a user query ("ETH", "bitcoin price") to the index term."""
+    entities = extract_entities(query)
+    key = normalize_topic(query)
+    if key in ALIAS_LOOKUP.values() or len(entities) != 1:
+        return key
+    return entities.pop()
+
+
+def topic_postings(index, topic, start=None, end=None, channels=None):
+    """Postings for a topic between two YYYY-MM-DD dates (inclusive)."""
+    items = index["postings"].get(resolve_query(topic), [])
+    dates = [p[0] for p in items]
+    lo = bisect.bisect_left(dates, start) if start else 0
+    hi = bisect.bisect_right(dates, end) if end else len(items)
+    result = items[lo:hi]
+    if channels:
+        wanted = {c.lower() for c in channels}
+        result = [p for p in result if p[1].lower() in wanted]
+    return result
+
+
+def sentiment_trend(index, topic, days=90, end=None, channels=None):
+    """Daily (date, mean sentiment_score, video count) for a topic."""
+    end = end or datetime.now().strftime("%Y-%m-%d")
+    start = (datetime.strptime(end, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+
+    by_date = defaultdict(list)
+    for date, channel, video_id, score in topic_postings(index, topic, start, end, channels):
+        if score is not None:
+            by_date[date].append(score)
+    return [(date, sum(scores) / len(scores), len(scores)) for date, scores in sorted(by_date.items())]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Topic / entity index over stored summaries.")
+    parser.add_argument("command", choices=["update", "rebuild", "trend", "topics"])
+    parser.add_argument("topic", nargs="?", help="Topic for the trend query, e.g. ETH.")
+    parser.add_argument("--days", type=int, default=90, help="Trend window in days.")
+    parser.add_argument("--end", type=str, help="Last day of the trend window (YYYY-MM-DD).")
+    parser.add_argument("--channel", action="append", help="Restrict the trend to a channel (repeatable).")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    if args.command in ("update", "rebuild"):
+        update_index(args.dir, rebuild=args.command == "rebuild")
+    elif args.command == "topics":
+        index = load_index()
+        for term, items in sorted(index["postings"].items(), key=lambda kv: -len(kv[1]))[:50]:
+            print(f"{len(items):5d}  {term}")
+    else:
+        if not args.topic:
+            parser.error("trend needs a topic")
+        index = load_index()
+        started = time.perf_counter()
+        trend = sentiment_trend(index, args.topic, args.days, args.end, args.channel)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"Sentiment trend for '{resolve_query(args.topic)}' ({elapsed:.2f} ms):")
+        for date, score, count in trend:
+            print(f"  {date}  {score:5.1f}  ({count} videos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import os
+import re
+import argparse
+from collections import Counter
+
+from storage import DATA_DIR, iter_data_files, load_records
+from preprocess import CAPTION_TAG_RE, clean_transcript, collapse_repeats
+
+# Most frequent function words per language. The share of a transcript's
+# words found in each list identifies the language without any model.
+STOPWORDS = {
+    "en": "the and to of a in that is it you i this for on we be so are what with have but not they can was at just like about if know there all my your do going one now right think get",
+    "hu": "a az és hogy nem is egy ez meg de van ha már csak mert vagy mint ami ezt azt itt még most lesz volt kell akkor nagyon így úgy amit pedig fel ki be el sem nincs",
+    "de": "der die und das ist nicht ich es sie zu den wir ein mit auch sich auf dass so eine von was hat im für aber man wenn noch dann schon jetzt hier",
+    "es": "de que el la y en los se no es un por las lo una con para del como más pero su al muy esto está hay ya porque también",
+    "fr": "de la le et les des est que un une en pas je il on ce qui dans du pour vous ça c'est sur au avec mais nous tout très plus",
+    "pt": "de que o a e do da em não um uma para é com os no na se por mais as dos como mas isso muito está também",
+    "it": "di che il la e non è un per una in sono mi si lo ma ha con le del questo della come anche più perché cosa",
+    "nl": "de het een en van is dat niet ik je op te zijn in die met wat voor maar er ook als dan nog wel naar",
+}
+STOPWORD_SETS = {lang: set(words.split()) for lang, words in STOPWORDS.items()}
+
+# Non-Latin scripts are identified by their Unicode ranges instead.
+SCRIPT_RANGES = {
+    "ru": re.compile(r"[Ѐ-ӿ]"),
+    "zh": re.compile(r"[一-鿿]"),
+    "ja": re.compile(r"[぀-ヿ]"),
+    "ko": re.compile(r"[가-힯]"),
+    "ar": re.compile(r"[؀-ۿ]"),
+    "hi": re.compile(r"[ऀ-ॿ]"),
+}
+
+TOKEN_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+# Only the beginning of a transcript is inspected.
+SAMPLE_WORDS = 3000
+
+# Share of stopwords in natural speech of a detected language; auto-captions
+# of the wrong language or machine-translated garbage fall well below it.
+EXPECTED_STOPWORD_SHARE = 0.30
+
+MIN_WORDS = int(os.getenv("TRANSCRIPT_MIN_WORDS", "150"))
+
+# Below SKIP_QUALITY the transcript is not summarized at all; below
+# DOWNGRADE_QUALITY (or in a language without a route) only the first
+# DOWNGRADE_CHAR_LIMIT characters go to the model.
+SKIP_QUALITY = float(os.getenv("TRANSCRIPT_SKIP_QUALITY", "0.35"))
+DOWNGRADE_QUALITY = float(os.getenv("TRANSCRIPT_DOWNGRADE_QUALITY", "0.6"))
+DOWNGRADE_CHAR_LIMIT = 8000
+
+# Transcript language -> action. The summary prompt reads English and
+# Hungarian transcripts equally well; other languages are downgraded.
+LANGUAGE_ROUTES = {"en": "summarize", "hu": "summarize"}
+DEFAULT_ROUTE = "downgrade"
+
+
+def _sample_words(text):
+    return TOKEN_RE.findall((text or "").lower())[:SAMPLE_WORDS]
+
+
+def detect_language(text):
+    """
+    Returns (language code, confidence 0..1) or (None, 0.0). Confidence is
+    the winning language's share of stopword hits.
+    """
+    sample = (text or "")[:SAMPLE_WORDS * 8]
+    letters = sum(1 for c in sample if c.isalpha())
+    if not letters:
+        return None, 0.0
+    for language, pattern in SCRIPT_RANGES.items():
+        if len(pattern.findall(sample)) > letters * 0.3:
+            return language, 1.0
+
+    words = _sample_words(text)
+    hits = {lang: sum(1 for w in words if w in stopwords) for lang, stopwords in STOPWORD_SETS.items()}
+    total = sum(hits.values())
+    if not total:
+        return None, 0.0
+    language = max(hits, key=hits.get)
+    return language, hits[language] / total
+
+
+def caption_quality(text, language=None):
+    """
+    Heuristic 0..1 quality of a (possibly automatic) caption track and the
+    signals behind it: stopword share in the detected language (fluency),
+    rolling-caption repetition, vocabulary diversity and caption tag noise.
+    """
+    words = _sample_words(text)
+    if not words:
+        return 0.0, {"words": 0}
+
+    raw_tokens = (text or "").split()[:SAMPLE_WORDS]
+    repeated = 1 - len(collapse_repeats(raw_tokens)) / max(len(raw_tokens), 1)
+    tags = len(CAPTION_TAG_RE.findall((text or "")[:SAMPLE_WORDS * 8]))
+    stopwords = STOPWORD_SETS.get(language, set())
+    share = sum(1 for w in words if w in stopwords) / len(words) if stopwords else EXPECTED_STOPWORD_SHARE
+    window = words[:1000]
+    diversity = len(set(window)) / len(window)
+
+    signals = {
+        "words": len((text or "").split()),
+        "stopword_share": round(share, 3),
+        "repetition": round(repeated, 3),
+        "diversity": round(diversity, 3),
+        "tags_per_100_words": round(100 * tags / len(raw_tokens), 2),
+    }
+    fluency = min(1.0, share / EXPECTED_STOPWORD_SHARE)
+    repetition = 1 - min(1.0, 2 * repeated)
+    variety = min(1.0, diversity / 0.25)
+    noise = 1 - min(1.0, signals["tags_per_100_words"] / 10)
+    return round(fluency * repetition * variety * noise, 3), signals
+
+
+def check_transcript(text, expected_language=None):
+    """
+    Language identification, quality score and routing decision for a fetched
+    transcript. Returns a dict stored with the video as "transcript_check";
+    action is "summarize", "downgrade" or "skip", with the reason.
+    """
+    language, confidence = detect_language(text)
+    quality, signals = caption_quality(text, language)
+    check = {
+        "language": language,
+        "language_confidence": round(confidence, 3),
+        "quality": quality,
+        "signals": signals,
+        "action": "summarize",
+        "reason": "",
+    }
+
+    route = LANGUAGE_ROUTES.get(language, DEFAULT_ROUTE)
+    if signals["words"] < MIN_WORDS:
+        check.update(action="skip", reason=f"too short ({signals['words']} words)")
+    elif language is None:
+        check.update(action="skip", reason="language not recognized")
+    elif quality < SKIP_QUALITY:
+        check.update(action="skip", reason=f"caption quality {quality:.2f} < {SKIP_QUALITY}")
+    elif route == "skip":
+        check.update(action="skip", reason=f"no route for language '{language}'")
+    elif route == "downgrade":
+        check.update(action="downgrade", reason=f"language '{language}' has no full route")
+    elif quality < DOWNGRADE_QUALITY:
+        check.update(action="downgrade", reason=f"caption quality {quality:.2f} < {DOWNGRADE_QUALITY}")
+    elif expected_language and language != expected_language:
+        check["reason"] = f"expected '{expected_language}', detected '{language}'"
+    return check
+
+
+def stored_check(video):
+    """The check saved with a video, or a fresh one for videos stored before checks existed."""
+    return video.get("transcript_check") or check_transcript(video.get("transcript"))
+
+
+def transcript_for_prompt(text, check):
+    """The part of the transcript worth paying for, given the routing decision."""
+    if check["action"] == "downgrade":
+        return clean_transcript(text)[:DOWNGRADE_CHAR_LIMIT]
+    return text
+
+
+def print_check(check):
+    line = f"  -> Transcript: {check['language'] or '?'} ({check['language_confidence']:.0%}), quality {check['quality']:.2f}"
+    if check["action"] != "summarize" or check["reason"]:
+        line += f", {check['action']}: {check['reason']}"
+    print(line)
+
+
+def corpus_report(data_dir=DATA_DIR):
+    """Language / quality / action breakdown of every stored transcript."""
+    languages, actions = Counter(), Counter()
+    qualities = []
+    for file_path in iter_data_files(data_dir):
+        try:
+            records = load_records(file_path)
+        except Exception as e:
+            print(f"  Error reading {file_path}: {e}")
+            continue
+        for video in records:
+            if not video.get("transcript"):
+                continue
+            check = check_transcript(video["transcript"])
+            languages[check["language"]] += 1
+            actions[check["action"]] += 1
+            qualities.append(check["quality"])
+            if check["action"] != "summarize":
+                print(f"  {check['action']:<9} {check['reason']:<45} {file_path}: {video.get('title')}")
+
+    if not qualities:
+        print("No transcripts found.")
+        return
+    qualities.sort()
+    print(f"\n{len(qualities)} transcripts. Languages: {dict(languages)}. Actions: {dict(actions)}.")
+    print(f"Quality p10 {qualities[len(qualities) // 10]:.2f}, median {qualities[len(qualities) // 2]:.2f}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcript language detection and caption quality.")
+    parser.add_argument("--dir", type=str, default=DATA_DIR, help="Data directory.")
+
+    args = parser.parse_args(argv)
+    corpus_report(args.dir)
+
+
+if __name__ == "__main__":
+    main()
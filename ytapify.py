@@ -3,41 +3,30 @@ import json
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 # CSAK ez az egy library kell
-from apify_client import ApifyClient
 from dotenv import load_dotenv
 import dateutil.parser # A dátumok könnyebb kezeléséhez (pip install python-dateutil)
+from clients import apify_client
+from storage import append_videos, load_id_history, save_id_history
+from topic_index import update_index
+from channels import load_channels, channel_url, due_channels, load_poll_state, save_poll_state, mark_polled, lookback_hours
+from transcript_quality import check_transcript
 
 load_dotenv()
 # Már csak ez az egy kulcs kell!
 APIFY_TOKEN = os.getenv("APIFY_TOKEN")
 
 
-CHANNELS = [
-    "https://www.youtube.com/@IvanOnTech",
-    "https://www.youtube.com/@alessiorastani",
-    "https://www.youtube.com/@CoinBureau",
-    "https://www.youtube.com/@coingecko",
-    "https://www.youtube.com/@DataDispatch",
-    "https://www.youtube.com/@FelixFriends",
-    "https://www.youtube.com/@TomNashTV",
-    "https://www.youtube.com/@DavidCarbutt"
-]
-
 HISTORY_FILE = os.path.join("data", "processed_videos.json")
 
+# A lista hossza a keresési ablakkal nő (csatornánként max. ennyi videó).
+LIST_RESULTS_PER_DAY = 10
+LIST_MAX_RESULTS = int(os.getenv("APIFY_LIST_MAX_RESULTS", "100"))
+
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            try:
-                return set(json.load(f))
-            except json.JSONDecodeError:
-                return set()
-    return set()
+    return load_id_history(HISTORY_FILE)
 
 def save_history(history_set):
-    os.makedirs("data", exist_ok=True)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(history_set), f, indent=4)
+    save_id_history(HISTORY_FILE, history_set)
 
 def get_channel_videos_apify(client, channel_url, max_results=20):
     """
@@ -48,7 +37,7 @@ def get_channel_videos_apify(client, channel_url, max_results=20):
     
     run_input = {
         "startUrls": [{"url": channel_url}],
-        "maxResults": max_results, # Elég az utolsó 20 videót csekkolni
+        "maxResults": max_results, # A keresési ablakhoz méretezve
         "downloadSubtitles": False, # Most még nem kell felirat, csak a lista
         "saveSubsToKvs": False,
     }
@@ -66,7 +55,7 @@ def get_channel_videos_apify(client, channel_url, max_results=20):
 
     except Exception as e:
         print(f"  -> Apify Lista Hiba: {e}")
-        return []
+        return None
 
 def get_transcript_apify(client, video_url):
     """
@@ -115,23 +104,31 @@ def main():
         print("HIBA: Nincs APIFY_TOKEN az .env fájlban!")
         return
 
-    client = ApifyClient(APIFY_TOKEN)
+    client = apify_client(APIFY_TOKEN)
     processed_ids = load_history()
     original_count = len(processed_ids)
     
     # Időablak (pl. elmúlt 14 nap)
     cutoff_date = datetime.now(timezone.utc) - timedelta(days=30)
 
-    for channel_url in CHANNELS:
-        channel_name = channel_name = channel_url.split("@")[-1]
+    poll_state = load_poll_state()
+
+    for channel in due_channels(load_channels(), poll_state):
+        channel_name = channel["handle"]
         print(f"\n--- Csatorna feldolgozása: {channel_name} ---")
         
-        # 1. Lekérjük a videók listáját (ez gyors)
-        video_list_items = get_channel_videos_apify(client, channel_url)
-        
+        # 1. Lekérjük a videók listáját (ez gyors); hosszabb kihagyás után többet
+        days_back = -(-lookback_hours(poll_state, channel, 48) // 24)
+        max_results = min(LIST_MAX_RESULTS, max(20, days_back * LIST_RESULTS_PER_DAY))
+        video_list_items = get_channel_videos_apify(client, channel_url(channel), max_results)
+
+        # Üres vagy hibás lista után nem jelöljük lekérdezettnek, így a következő futás az egész ablakot nézi.
         if not video_list_items:
             print("  -> Nem találtunk videókat (vagy hiba történt).")
             continue
+        mark_polled(poll_state, channel)
+        if len(video_list_items) >= max_results:
+            print(f"  -> Figyelem: a lista tele van ({max_results}), régebbi videók kimaradhatnak.")
 
         new_videos_to_save = []
         
@@ -172,7 +169,8 @@ def main():
                     "url": video_url,
                     "views": item.get("viewCount", 0), # Extra adat, amit az Apify ad!
                     "duration": item.get("duration", "N/A"), # Extra adat!
-                    "transcript": transcript_text
+                    "transcript": transcript_text,
+                    "transcript_check": check_transcript(transcript_text)
                 })
                 processed_ids.add(video_id)
                 print("  -> SIKER: Transcript lementve.")
@@ -190,18 +188,10 @@ def main():
                 os.makedirs(folder_path, exist_ok=True)
                 file_path = os.path.join(folder_path, f"{channel_name}.json")
                 
-                existing_data = []
-                if os.path.exists(file_path):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        try:
-                            existing_data = json.load(f)
-                        except:
-                            existing_data = []
-                
-                final_data = existing_data + video_list
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(final_data, f, ensure_ascii=False, indent=4)
-                print(f" >> Fájl frissítve: {file_path}")
+                duplicates = append_videos(file_path, video_list)
+                print(f" >> Fájl frissítve: {file_path}" + (f" ({duplicates} már megvolt, összefésülve)" if duplicates else ""))
+
+    save_poll_state(poll_state)
 
     # History mentése
     if len(processed_ids) > original_count:
@@ -210,5 +200,7 @@ def main():
     else:
         print("\nNincs új mentett videó.")
 
+    update_index()
+
 if __name__ == "__main__":
     main()